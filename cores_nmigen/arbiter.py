@@ -0,0 +1,128 @@
+from nmigen import *
+
+
+def _has_last(stream):
+    return 'last' in [name for name, width in stream.DATA_FIELDS]
+
+
+class StreamArbiter(Elaboratable):
+    """Merges the `inputs` streams into `output`.
+
+    The streams can be of any GenericStream type with the same total width.
+    A grant goes to one of the valid inputs and stays there until the
+    beat with `last` (every beat is a packet for streams without `last`),
+    so packets do not interleave. It is also kept while the output beat
+    waits for `ready`, so the output does not change before the
+    handshake. The winner is picked combinationally
+    in the cycle the previous packet ends, so back to back packets from
+    different inputs have no bubble between them.
+
+    With 'round_robin' the input after the last granted one comes first,
+    with 'priority' the lowest index always wins. `grant` is the input
+    currently selected.
+    """
+
+    SCHEMES = ('round_robin', 'priority')
+
+    def __init__(self, inputs, output, scheme='round_robin', domain='sync'):
+        assert scheme in self.SCHEMES, f'scheme must be one of {self.SCHEMES}'
+        assert all(i._total_width == output._total_width for i in inputs)
+        self.inputs = inputs
+        self.output = output
+        self.scheme = scheme
+        self.domain = domain
+        self.grant = Signal(range(len(inputs)))
+
+    def elaborate(self, platform):
+        m = Module()
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        valids = Cat(*[i.valid for i in self.inputs])
+
+        locked = Signal()
+        owner = Signal.like(self.grant)
+        first = Signal.like(self.grant)
+        comb += first.eq(self.pick(m, valids))
+        comb += self.grant.eq(Mux(locked, owner, first))
+
+        data = Array([i._flat_data for i in self.inputs])
+        comb += self.output.valid.eq(valids.bit_select(self.grant, 1))
+        comb += self.output.eq_from_flat(data[self.grant])
+        for k, i in enumerate(self.inputs):
+            comb += i.ready.eq(self.output.ready & (self.grant == k))
+
+        end = self.output.last if _has_last(self.output) else 1
+        with m.If(self.output.accepted()):
+            sync += [locked.eq(~end),
+                     owner.eq(self.grant),]
+        with m.Elif(self.output.valid):
+            sync += [locked.eq(1),
+                     owner.eq(self.grant),]
+
+        return m
+
+    def pick(self, m, valids):
+        n = len(self.inputs)
+        first = Signal.like(self.grant)
+        if self.scheme == 'priority':
+            for k in reversed(range(n)):
+                with m.If(valids[k]):
+                    m.d.comb += first.eq(k)
+            return first
+
+        # round robin: the search starts after the last grant
+        start = Signal.like(self.grant)
+        with m.If(self.output.accepted()):
+            m.d[self.domain] += start.eq(Mux(self.grant == n - 1, 0, self.grant + 1))
+        with m.Switch(start):
+            for s in range(n):
+                with m.Case(s):
+                    for k in reversed([(s + o) % n for o in range(n)]):
+                        with m.If(valids[k]):
+                            m.d.comb += first.eq(k)
+        return first
+
+
+class StreamRouter(Elaboratable):
+    """Steers the packets of `input` to one of the `outputs` streams.
+
+    `dest` is the output index, usually a field of the input stream. It is
+    taken on the first beat of every packet and kept until `last` (every
+    beat is a packet for streams without `last`). Packets for an index
+    with no output are dropped. The streams can be of any GenericStream
+    type with the same total width.
+    """
+
+    def __init__(self, input, outputs, dest, domain='sync'):
+        assert all(o._total_width == input._total_width for o in outputs)
+        assert len(outputs) <= 2**len(dest)
+        self.input = input
+        self.outputs = outputs
+        self.dest = dest
+        self.domain = domain
+        self.route = Signal(len(dest))
+
+    def elaborate(self, platform):
+        m = Module()
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        n = len(self.outputs)
+
+        locked = Signal()
+        held = Signal.like(self.route)
+        comb += self.route.eq(Mux(locked, held, self.dest))
+
+        readies = Array([o.ready for o in self.outputs] + [Const(1, 1)] * (2**len(self.route) - n))
+        comb += self.input.ready.eq(readies[self.route])
+        for k, o in enumerate(self.outputs):
+            comb += o.eq_from_flat(self.input._flat_data)
+            comb += o.valid.eq(self.input.valid & (self.route == k))
+
+        end = self.input.last if _has_last(self.input) else 1
+        with m.If(self.input.accepted()):
+            sync += [locked.eq(~end),
+                     held.eq(self.route),]
+
+        return m
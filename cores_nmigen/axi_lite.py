@@ -1,13 +1,43 @@
 from nmigen import *
-from .interfaces import AxiLite, RegistersInterface
+from nmigen.lib.fifo import SyncFIFO
+from .interfaces import AxiLite, AxiLiteCommandStream, RegistersInterface, DataStream
+from .skid_buffer import SkidBuffer
+from .operations import _mux_tree
+from math import log2, ceil
+
+
+def channel_skid_buffer(m, name, data, valid, ready, domain='sync'):
+    """Puts an AXI channel (`data`, `valid`, `ready`) through a SkidBuffer
+    that only registers ready, and returns the channel as a DataStream."""
+    comb = m.d.comb
+
+    channel_in = DataStream(len(data), 'sink', name=name + '_in', last=False)
+    channel_out = DataStream(len(data), 'source', name=name, last=False)
+    m.submodules[name + '_skid_buffer'] = SkidBuffer(channel_in, channel_out, domain=domain, registered=False)
+    comb += [channel_in.data.eq(data),
+             channel_in.valid.eq(valid),
+             ready.eq(channel_in.ready),]
+    return channel_out
 
 
 class AxiLiteDevice(Elaboratable):
-    def __init__(self, addr_w, data_w, registers, domain='sync'):
+    def __init__(self, addr_w, data_w, registers, domain='sync', pipelined=False, commit_addr=None):
         self.addr_w = addr_w
         self.data_w = data_w
-        self._regs = registers
+        self._regs = [reg for reg in registers if reg[1] != 'mem']
+        self._mems = [reg for reg in registers if reg[1] == 'mem']
         self.domain = domain
+        self.pipelined = pipelined
+        # 'rws' registers are shadowed: bus writes land in the shadow copy and
+        # a write to `commit_addr` moves all of them to the user side at once.
+        # 'pulse' registers drive their fields for a single cycle after each
+        # write and read back as zero.
+        self.commit_addr = commit_addr
+        if any([reg[1] == 'rws' for reg in self._regs]):
+            assert commit_addr is not None, 'Shadowed registers need a commit address'
+        if commit_addr is not None:
+            assert commit_addr < 2**addr_w, 'Commit address 0x{:x} not reachable. Increase address width!'.format(commit_addr)
+            assert commit_addr not in [reg[2] for reg in self._regs], 'Commit address 0x{:x} used by a register'.format(commit_addr)
         self.axi_lite = AxiLite(self.addr_w, self.data_w, 'slave', name='s_axi')
         self.registers = RegistersInterface(addr_w, data_w, registers)
 
@@ -16,40 +46,194 @@ class AxiLiteDevice(Elaboratable):
         ports += [self.registers[f] for f in self.registers.fields]
         return ports
 
+    @property
+    def addr_lsb(self):
+        # Registers are decoded by word index when they are all word aligned
+        word_bytes = self.data_w // 8
+        addrs = [addr for _, _, addr, _ in self._regs + self._mems]
+        if self.commit_addr is not None:
+            addrs.append(self.commit_addr)
+        if all([addr % word_bytes == 0 for addr in addrs]):
+            return int(log2(word_bytes))
+        assert not self._mems, 'Memory blocks must be word aligned'
+        return 0
+
     def elaborate(self, platform):
         m = Module()
-        sync = m.d[self.domain]
+
+        regfile, active, regs = self.elaborate_registers(m)
+        self.elaborate_memories(m)
+
+        if self.pipelined:
+            self.elaborate_pipelined(m, regfile, active, regs)
+        else:
+            self.elaborate_fsm(m, regfile, active, regs)
+
+        return m
+
+    @property
+    def write_addrs(self):
+        # slots of the register file: plain RW registers first, then pulse
+        # registers, shadowed registers last
+        return ([addr for _, r_dir, addr, _ in self._regs if r_dir == 'rw'] +
+                [addr for _, r_dir, addr, _ in self._regs if r_dir == 'pulse'] +
+                [addr for _, r_dir, addr, _ in self._regs if r_dir == 'rws'])
+
+    def elaborate_registers(self, m):
+        # RW registers are words of one wide register file. RO registers are
+        # just the concatenation of their fields. All the fields are wired in
+        # a single statement, which keeps elaboration fast on large maps.
+        # Shadowed registers take the last words of the register file, and
+        # their fields are driven by `active`, which is loaded on commit.
         comb = m.d.comb
 
-        # Registers
+        write_addrs = self.write_addrs
+        shadow_addrs = [addr for _, r_dir, addr, _ in self._regs if r_dir == 'rws']
+        regfile = Signal(self.data_w * len(write_addrs))
+        active = Signal(self.data_w * len(shadow_addrs))
 
         regs = {}
+        rw_fields, rw_values = [], []
         for _, r_dir, addr, r_fields in self._regs:
-            regs[addr] = Signal(self.data_w)
-            for name, size, offset in r_fields:
-                if r_dir == 'rw':
-                    comb += getattr(self.registers, name).eq(regs[addr][offset:offset+size])
+            if r_dir in ('rw', 'rws', 'pulse'):
+                regs[addr] = regfile.word_select(write_addrs.index(addr), self.data_w)
+                if r_dir == 'rws':
+                    word = active.word_select(shadow_addrs.index(addr), self.data_w)
                 else:
-                    comb += regs[addr][offset:offset+size].eq(getattr(self.registers, name))
+                    word = regs[addr]
+                if r_dir == 'pulse':
+                    regs[addr] = Const(0, self.data_w)
+                for name, size, offset in r_fields:
+                    rw_fields.append(getattr(self.registers, name))
+                    rw_values.append(word[offset:offset+size])
+            else:
+                pieces = []
+                position = 0
+                for name, size, offset in sorted(r_fields, key=lambda f: f[2]):
+                    if offset > position:
+                        pieces.append(Const(0, offset - position))
+                    pieces.append(getattr(self.registers, name))
+                    position = offset + size
+                if position < self.data_w:
+                    pieces.append(Const(0, self.data_w - position))
+                regs[addr] = Cat(*pieces)
+        if rw_fields:
+            comb += Cat(*rw_fields).eq(Cat(*rw_values))
+        return regfile, active, regs
+
+    def elaborate_memories(self, m):
+        self.memories = {}
+        for name, _, addr, depth in self._mems:
+            mem = Memory(width=self.data_w, depth=depth, name=name)
+            bus_wr = mem.write_port(domain=self.domain, granularity=8)
+            bus_rd = mem.read_port(domain=self.domain, transparent=False)
+            user_rd = mem.read_port(domain=self.domain)
+            m.submodules[name + '_bus_wr'] = bus_wr
+            m.submodules[name + '_bus_rd'] = bus_rd
+            m.submodules[name + '_user_rd'] = user_rd
+            m.d.comb += [user_rd.addr.eq(getattr(self.registers, name + '_addr')),
+                         getattr(self.registers, name + '_data').eq(user_rd.data),]
+            self.memories[name] = (addr >> self.addr_lsb, depth, bus_wr, bus_rd)
+
+    def write_registers(self, m, regfile, active, we, wr_addr, wr_data, wr_strb):
+        # A write to the register file is one indexed assignment per byte
+        # lane instead of one branch per register. Only the lanes enabled in
+        # `wr_strb` are written.
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        index = wr_addr[self.addr_lsb:]
+        write_addrs = self.write_addrs
+        n_bytes = self.data_w // 8
+
+        # pulse registers are cleared every cycle unless they are written
+        pulse_slots = [i for i, r_addr in enumerate(write_addrs)
+                       if r_addr in [addr for _, r_dir, addr, _ in self._regs if r_dir == 'pulse']]
+        if pulse_slots:
+            sync += regfile[pulse_slots[0]*self.data_w:(pulse_slots[-1]+1)*self.data_w].eq(0)
+
+        if write_addrs:
+            slot = Signal(range(len(write_addrs)))
+            hit = Signal()
+            with m.Switch(index):
+                for i, r_addr in enumerate(write_addrs):
+                    with m.Case(r_addr >> self.addr_lsb):
+                        comb += [slot.eq(i), hit.eq(1)]
+            for b in range(n_bytes):
+                with m.If(we & hit & wr_strb[b]):
+                    lane = Cat(Const(b, int(log2(n_bytes))), slot)
+                    sync += regfile.word_select(lane, 8).eq(wr_data[8*b:8*(b+1)])
+
+        if len(active):
+            with m.If(we & (index == self.commit_addr >> self.addr_lsb)):
+                sync += active.eq(regfile[-len(active):])
+
+        for base, depth, bus_wr, _ in self.memories.values():
+            comb += [bus_wr.addr.eq(index - base),
+                     bus_wr.data.eq(wr_data),
+                     bus_wr.en.eq(Mux(we & (index >= base) & (index < base + depth), wr_strb, 0)),]
+
+    def read_registers(self, m, regs, re, rd_addr, rd_data):
+        # The read data is a register loaded when `re` is set. Dense register
+        # maps are read through a balanced mux tree on the address bits,
+        # sparse ones through a Switch. Memory blocks are read through their
+        # own registered read port.
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        index = rd_addr[self.addr_lsb:]
+        reg_data = Signal(self.data_w)
+        entries = {r_addr >> self.addr_lsb: regs[r_addr] for _, _, r_addr, _ in self._regs}
+
+        with m.If(re):
+            if not entries:
+                sync += reg_data.eq(0)
+            elif 2 * len(entries) >= max(entries) - min(entries) + 1:
+                first, last = min(entries), max(entries)
+                offset = Signal(max(ceil(log2(last - first + 1)), 1))
+                comb += offset.eq(index - first)
+                table = [entries.get(i, Const(0, self.data_w)) for i in range(first, last + 1)]
+                with m.If((index >= first) & (index <= last)):
+                    sync += reg_data.eq(_mux_tree(table, offset))
+                with m.Else():
+                    sync += reg_data.eq(0)
+            else:
+                with m.Switch(index):
+                    for i, reg in entries.items():
+                        with m.Case(i):
+                            sync += reg_data.eq(reg)
+                    with m.Case():
+                        sync += reg_data.eq(0)
+
+        data = reg_data
+        for base, depth, _, bus_rd in self.memories.values():
+            mem_sel = Signal()
+            with m.If(re):
+                sync += mem_sel.eq((index >= base) & (index < base + depth))
+            comb += [bus_rd.addr.eq(index - base),
+                     bus_rd.en.eq(re),]
+            data = Mux(mem_sel, bus_rd.data, data)
+
+        comb += rd_data.eq(data)
+
+    def elaborate_fsm(self, m, regfile, active, regs):
+        sync = m.d[self.domain]
+        comb = m.d.comb
 
         we = Signal()
         wr_addr = Signal(self.addr_w)
         wr_data = Signal(self.data_w)
+        wr_strb = Signal(self.data_w // 8)
 
         with m.If(self.axi_lite.aw_accepted()):
             sync += wr_addr.eq(self.axi_lite.awaddr)
 
         with m.If(self.axi_lite.w_accepted()):
-            sync += wr_data.eq(self.axi_lite.wdata)
-        
-        for _, r_dir, r_addr, r_fields in self._regs:
-            if r_dir == 'rw':
-                with m.If((wr_addr == r_addr) & (we == 1)):
-                    sync += regs[r_addr].eq(wr_data)
+            sync += [wr_data.eq(self.axi_lite.wdata),
+                     wr_strb.eq(self.axi_lite.wstrb),]
 
-        for _, r_dir, r_addr, r_fields in self._regs:
-            with m.If(self.axi_lite.ar_accepted() & (self.axi_lite.araddr == r_addr)):
-                sync += self.axi_lite.rdata.eq(regs[r_addr])
+        self.write_registers(m, regfile, active, we, wr_addr, wr_data, wr_strb)
+        self.read_registers(m, regs, self.axi_lite.ar_accepted(), self.axi_lite.araddr, self.axi_lite.rdata)
 
         # Axi Lite Slave Interface
         
@@ -66,7 +250,6 @@ class AxiLiteDevice(Elaboratable):
                 comb += self.axi_lite.arready.eq(0)
                 comb += self.axi_lite.rvalid.eq(1)
                 with m.If(self.axi_lite.r_accepted()):
-                    sync += self.axi_lite.rdata.eq(0)
                     m.next = "IDLE"
 
         with m.FSM(domain=self.domain) as fsm_wr:
@@ -102,6 +285,304 @@ class AxiLiteDevice(Elaboratable):
                          we.eq(1),]
                 with m.If(self.axi_lite.b_accepted()):
                     m.next = "IDLE"
+                with m.Else():
+                    m.next = "RESPONSE"
+            with m.State("RESPONSE"):
+                comb += [self.axi_lite.awready.eq(0),
+                         self.axi_lite.wready.eq(0),
+                         self.axi_lite.bvalid.eq(1),
+                         we.eq(0),]
+                with m.If(self.axi_lite.b_accepted()):
+                    m.next = "IDLE"
+
+    def elaborate_pipelined(self, m, regfile, active, regs):
+        # Every request channel goes through a skid buffer, so AWREADY, WREADY
+        # and ARREADY are registered. The skid buffers pass data through while
+        # empty, and the R and B channels are output registers, so a new
+        # transfer can complete on each channel every cycle. Read data comes
+        # out one cycle after the address.
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        ar = channel_skid_buffer(m, 'ar', self.axi_lite.araddr, self.axi_lite.arvalid, self.axi_lite.arready, self.domain)
+        aw = channel_skid_buffer(m, 'aw', self.axi_lite.awaddr, self.axi_lite.awvalid, self.axi_lite.awready, self.domain)
+        w = channel_skid_buffer(m, 'w', Cat(self.axi_lite.wdata, self.axi_lite.wstrb),
+                                self.axi_lite.wvalid, self.axi_lite.wready, self.domain)
+
+        comb += self.axi_lite.rresp.eq(0)
+        comb += self.axi_lite.bresp.eq(0)
+
+        # Read channel
+        re = Signal()
+        comb += ar.ready.eq(~self.axi_lite.rvalid | self.axi_lite.rready)
+        comb += re.eq(ar.accepted())
+        self.read_registers(m, regs, re, ar.data, self.axi_lite.rdata)
+        with m.If(re):
+            sync += self.axi_lite.rvalid.eq(1)
+        with m.Elif(self.axi_lite.r_accepted()):
+            sync += self.axi_lite.rvalid.eq(0)
+
+        # Write channel: address and data are consumed together
+        we = Signal()
+        comb += we.eq(aw.valid & w.valid & (~self.axi_lite.bvalid | self.axi_lite.bready))
+        comb += aw.ready.eq(we)
+        comb += w.ready.eq(we)
+        self.write_registers(m, regfile, active, we, aw.data, w.data[:self.data_w], w.data[self.data_w:])
+        with m.If(we):
+            sync += self.axi_lite.bvalid.eq(1)
+        with m.Elif(self.axi_lite.b_accepted()):
+            sync += self.axi_lite.bvalid.eq(0)
+
+
+class AxiLiteMaster(Elaboratable):
+    """Issues AXI-Lite transactions from a command stream.
+
+    Each `command` beat is a write of `data` to `addr` (with byte lanes
+    `strb`) when `write` is set, or a read of `addr` otherwise. Up to
+    `max_outstanding` writes and `max_outstanding` reads can be in flight,
+    so a slave that accepts a transfer per cycle is written at full speed.
+    AW and W are issued together for each write.
+
+    Read data comes out of `read_data` in command order, with the `last`
+    bit of its command. Reads and writes are not ordered with respect to
+    each other. `error` is set on any non OKAY response until reset, and
+    `idle` is high when nothing is in flight.
+    """
+
+    def __init__(self, addr_w, data_w, max_outstanding=4, domain='sync'):
+        assert max_outstanding >= 1
+        self.addr_w = addr_w
+        self.data_w = data_w
+        self.max_outstanding = max_outstanding
+        self.domain = domain
+        self.axi_lite = AxiLite(addr_w, data_w, 'master', name='m_axi')
+        self.command = AxiLiteCommandStream(addr_w, data_w, 'sink', name='command')
+        self.read_data = DataStream(data_w, 'source', name='read_data')
+        self.error = Signal()
+        self.idle = Signal()
+
+    def get_ports(self):
+        ports = [self.axi_lite[f] for f in self.axi_lite.fields]
+        ports += [self.command[f] for f in self.command.fields]
+        ports += [self.read_data[f] for f in self.read_data.fields]
+        ports += [self.error, self.idle]
+        return ports
+
+    def elaborate(self, platform):
+        m = Module()
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        bus = self.axi_lite
+        writes = Signal(range(self.max_outstanding + 1))
+        reads = Signal(range(self.max_outstanding + 1))
+
+        # the last bit of every read in flight
+        m.submodules.read_last = read_last = DomainRenamer(self.domain)(SyncFIFO(width=1, depth=self.max_outstanding))
+
+        aw_free = ~bus.awvalid | bus.awready
+        w_free = ~bus.wvalid | bus.wready
+        ar_free = ~bus.arvalid | bus.arready
+        write_ready = aw_free & w_free & (writes < self.max_outstanding)
+        read_ready = ar_free & (reads < self.max_outstanding)
+        comb += self.command.ready.eq(Mux(self.command.write, write_ready, read_ready))
+
+        write_issued = self.command.accepted() & self.command.write
+        read_issued = self.command.accepted() & ~self.command.write
+
+        # Write address and data channels
+        with m.If(write_issued):
+            sync += [bus.awaddr.eq(self.command.addr),
+                     bus.awvalid.eq(1),
+                     bus.wdata.eq(self.command.data),
+                     bus.wstrb.eq(self.command.strb),
+                     bus.wvalid.eq(1),]
+        with m.Else():
+            with m.If(bus.aw_accepted()):
+                sync += bus.awvalid.eq(0)
+            with m.If(bus.w_accepted()):
+                sync += bus.wvalid.eq(0)
+
+        # Write response channel
+        comb += bus.bready.eq(1)
+        with m.If(write_issued & ~bus.b_accepted()):
+            sync += writes.eq(writes + 1)
+        with m.Elif(~write_issued & bus.b_accepted()):
+            sync += writes.eq(writes - 1)
+
+        # Read address channel
+        with m.If(read_issued):
+            sync += [bus.araddr.eq(self.command.addr),
+                     bus.arvalid.eq(1),]
+        with m.Elif(bus.ar_accepted()):
+            sync += bus.arvalid.eq(0)
+        comb += [read_last.w_data.eq(self.command.last),
+                 read_last.w_en.eq(read_issued),]
+
+        # Read data channel
+        comb += [self.read_data.valid.eq(bus.rvalid),
+                 self.read_data.data.eq(bus.rdata),
+                 self.read_data.last.eq(read_last.r_data),
+                 bus.rready.eq(self.read_data.ready),
+                 read_last.r_en.eq(bus.r_accepted()),]
+        with m.If(read_issued & ~bus.r_accepted()):
+            sync += reads.eq(reads + 1)
+        with m.Elif(~read_issued & bus.r_accepted()):
+            sync += reads.eq(reads - 1)
+
+        with m.If((bus.b_accepted() & (bus.bresp != 0)) | (bus.r_accepted() & (bus.rresp != 0))):
+            sync += self.error.eq(1)
+
+        comb += self.idle.eq((writes == 0) & (reads == 0))
 
         return m
 
+
+class AxiLiteInterconnect(Elaboratable):
+    """Routes one AXI-Lite master to several slaves.
+
+    `address_map` is a list of (base, size) pairs, one per slave in
+    `slaves`. Sizes are powers of two and bases are aligned to their size.
+    Slaves see the address relative to their base, so a slave port can be
+    connected to a narrower AxiLiteDevice with `slave.connect(device.axi_lite)`.
+
+    The request channels go through skid buffers (registered ready) and the
+    decoded requests are registered before they reach the slaves. Reads and
+    writes are independent, and up to `max_outstanding` transactions of
+    each kind are in flight, to any mix of slaves. The slave of every
+    transaction is queued, and responses are taken from the slaves in that
+    order, as AXI-Lite has no IDs. Addresses outside the map get a DECERR
+    response without reaching any slave.
+    """
+
+    OKAY = 0
+    DECERR = 3
+
+    def __init__(self, addr_w, data_w, address_map, max_outstanding=4, domain='sync'):
+        for base, size in address_map:
+            assert size & (size - 1) == 0 and base % size == 0, 'Slave ranges must be aligned powers of two'
+            assert base + size <= 2**addr_w
+        self.addr_w = addr_w
+        self.data_w = data_w
+        self.address_map = address_map
+        self.max_outstanding = max_outstanding
+        self.domain = domain
+        self.axi_lite = AxiLite(addr_w, data_w, 'slave', name='s_axi')
+        self.slaves = [AxiLite(addr_w, data_w, 'master', name=f'm_axi_{i}') for i in range(len(address_map))]
+
+    def get_ports(self):
+        ports = [self.axi_lite[f] for f in self.axi_lite.fields]
+        for slave in self.slaves:
+            ports += [slave[f] for f in slave.fields]
+        return ports
+
+    def decode(self, m, addr):
+        # index of the slave that owns `addr`, len(slaves) if there is none
+        sel = Signal(range(len(self.slaves) + 1), reset=len(self.slaves))
+        for i, (base, size) in reversed(list(enumerate(self.address_map))):
+            with m.If((addr >> int(log2(size))) == (base >> int(log2(size)))):
+                m.d.comb += sel.eq(i)
+        return sel
+
+    def elaborate(self, platform):
+        m = Module()
+
+        self.elaborate_read(m)
+        self.elaborate_write(m)
+
+        return m
+
+    def elaborate_read(self, m):
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        bus = self.axi_lite
+        n = len(self.slaves)
+        ar = channel_skid_buffer(m, 'ar', bus.araddr, bus.arvalid, bus.arready, self.domain)
+        sel = self.decode(m, ar.data)
+
+        m.submodules.rd_order = order = DomainRenamer(self.domain)(SyncFIFO(width=len(sel), depth=self.max_outstanding))
+
+        # registered requests towards the slaves
+        ar_valid = Signal()
+        ar_addr = Signal(self.addr_w)
+        ar_sel = Signal(range(n + 1))
+        ar_ready = Array([slave.arready for slave in self.slaves] + [1])[ar_sel]
+
+        comb += ar.ready.eq((~ar_valid | ar_ready) & order.w_rdy)
+        with m.If(ar.accepted()):
+            sync += [ar_valid.eq(sel != n),
+                     ar_addr.eq(ar.data),
+                     ar_sel.eq(sel),]
+        with m.Elif(ar_ready):
+            sync += ar_valid.eq(0)
+        comb += [order.w_data.eq(sel),
+                 order.w_en.eq(ar.accepted()),]
+
+        for i, (slave, (base, size)) in enumerate(zip(self.slaves, self.address_map)):
+            comb += [slave.arvalid.eq(ar_valid & (ar_sel == i)),
+                     slave.araddr.eq(ar_addr[:int(log2(size))]),]
+
+        # responses in request order
+        head = order.r_data
+        comb += [bus.rvalid.eq(order.r_rdy & Array([slave.rvalid for slave in self.slaves] + [1])[head]),
+                 bus.rdata.eq(Array([slave.rdata for slave in self.slaves] + [0])[head]),
+                 bus.rresp.eq(Array([slave.rresp for slave in self.slaves] + [self.DECERR])[head]),
+                 order.r_en.eq(bus.r_accepted()),]
+        for i, slave in enumerate(self.slaves):
+            comb += slave.rready.eq(bus.rready & order.r_rdy & (head == i))
+
+    def elaborate_write(self, m):
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        bus = self.axi_lite
+        n = len(self.slaves)
+        aw = channel_skid_buffer(m, 'aw', bus.awaddr, bus.awvalid, bus.awready, self.domain)
+        w = channel_skid_buffer(m, 'w', Cat(bus.wdata, bus.wstrb), bus.wvalid, bus.wready, self.domain)
+        sel = self.decode(m, aw.data)
+
+        m.submodules.wr_order = order = DomainRenamer(self.domain)(SyncFIFO(width=len(sel), depth=self.max_outstanding))
+
+        # registered requests towards the slaves. Address and data of a
+        # write are issued together and each is held until accepted.
+        aw_valid = Signal()
+        aw_addr = Signal(self.addr_w)
+        w_valid = Signal()
+        w_data = Signal(len(w.data))
+        wr_sel = Signal(range(n + 1))
+        aw_ready = Array([slave.awready for slave in self.slaves] + [1])[wr_sel]
+        w_ready = Array([slave.wready for slave in self.slaves] + [1])[wr_sel]
+
+        issue = Signal()
+        comb += issue.eq(aw.valid & w.valid & (~aw_valid | aw_ready) & (~w_valid | w_ready) & order.w_rdy)
+        comb += [aw.ready.eq(issue),
+                 w.ready.eq(issue),]
+        with m.If(issue):
+            sync += [aw_valid.eq(sel != n),
+                     aw_addr.eq(aw.data),
+                     w_valid.eq(sel != n),
+                     w_data.eq(w.data),
+                     wr_sel.eq(sel),]
+        with m.Else():
+            with m.If(aw_ready):
+                sync += aw_valid.eq(0)
+            with m.If(w_ready):
+                sync += w_valid.eq(0)
+        comb += [order.w_data.eq(sel),
+                 order.w_en.eq(issue),]
+
+        for i, (slave, (base, size)) in enumerate(zip(self.slaves, self.address_map)):
+            comb += [slave.awvalid.eq(aw_valid & (wr_sel == i)),
+                     slave.awaddr.eq(aw_addr[:int(log2(size))]),
+                     slave.wvalid.eq(w_valid & (wr_sel == i)),
+                     slave.wdata.eq(w_data[:self.data_w]),
+                     slave.wstrb.eq(w_data[self.data_w:]),]
+
+        # responses in request order
+        head = order.r_data
+        comb += [bus.bvalid.eq(order.r_rdy & Array([slave.bvalid for slave in self.slaves] + [1])[head]),
+                 bus.bresp.eq(Array([slave.bresp for slave in self.slaves] + [self.DECERR])[head]),
+                 order.r_en.eq(bus.b_accepted()),]
+        for i, slave in enumerate(self.slaves):
+            comb += slave.bready.eq(bus.bready & order.r_rdy & (head == i))
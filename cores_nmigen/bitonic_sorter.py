@@ -0,0 +1,126 @@
+from nmigen import *
+from .interfaces import MatrixStream
+from math import ceil, log2
+
+
+class BitonicSorter(Elaboratable):
+    """Pipelined bitonic sorting network for vectors of `n` elements.
+
+    `input` and `output` are (n,) MatrixStreams. The key of each element is
+    `width` bits wide, two's complement when `signed`, and sits above
+    `payload_w` payload bits that travel with it. With `index`, the position
+    of the element in the input vector is added above the key, so the
+    output elements are Cat(payload, key, index). Elements come out in
+    ascending order of their keys, or descending with `descending`. Equal
+    keys may be reordered.
+
+    The network has log2(N) * (log2(N) + 1) / 2 comparator levels, N being n
+    rounded up to a power of two; the missing elements are resolved while
+    building it and cost no comparators. A register stage follows every
+    `pipeline_every` levels and the last one. The whole pipeline stalls
+    while the output is not accepted.
+    """
+
+    def __init__(self, width, n, payload_w=0, index=False, descending=False, signed=False, pipeline_every=1,
+                 domain='sync'):
+        assert n >= 2 and pipeline_every >= 1
+        self.width = width
+        self.n = n
+        self.payload_w = payload_w
+        self.index = index
+        self.index_w = max(1, int(ceil(log2(n)))) if index else 0
+        self.descending = descending
+        self.signed = signed
+        self.pipeline_every = pipeline_every
+        self.domain = domain
+        self.size = 2**int(ceil(log2(n)))
+        self.levels = [(k, j) for k in [2**i for i in range(1, int(log2(self.size)) + 1)]
+                              for j in [k >> i for i in range(1, int(log2(k)) + 1)]]
+        self.latency = int(ceil(len(self.levels) / pipeline_every))
+        self.input = MatrixStream(width=width + payload_w, shape=(n,), direction='sink', name='input')
+        self.output = MatrixStream(width=width + payload_w + self.index_w, shape=(n,), direction='source',
+                                   name='output')
+
+    def get_ports(self):
+        ports = [self.input[f] for f in self.input.fields]
+        ports += [self.output[f] for f in self.output.fields]
+        return ports
+
+    def key(self, element):
+        key = element[self.payload_w:self.payload_w + self.width]
+        if self.signed:
+            # flipping the sign bit keeps the order in an unsigned comparison
+            return Cat(key[:-1], ~key[-1])
+        return key
+
+    def elaborate(self, platform):
+        m = Module()
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        # The pipeline moves when its output is free
+        valid = Signal(self.latency)
+        last = Signal(self.latency)
+        ce = Signal()
+        comb += ce.eq(~valid[-1] | self.output.ready)
+        comb += self.input.ready.eq(ce)
+        with m.If(ce):
+            sync += valid.eq(Cat(self.input.valid, valid[:-1]))
+            sync += last.eq(Cat(self.input.last, last[:-1]))
+        comb += [self.output.valid.eq(valid[-1]),
+                 self.output.last.eq(last[-1]),]
+
+        element_w = len(self.output.data_0)
+        elements = []
+        for i, data in enumerate(self.input.data_ports):
+            element = Signal(element_w, name=f'element_{i}')
+            comb += element.eq(Cat(data, Const(i, self.index_w)) if self.index else data)
+            elements.append(element)
+        # None stands for the padding elements, greater than any key
+        elements += [None] * (self.size - self.n)
+
+        for level, (k, j) in enumerate(self.levels):
+            elements = self.compare_exchange(m, elements, k, j, level)
+            if (level + 1) % self.pipeline_every == 0 or level == len(self.levels) - 1:
+                elements = self.register(m, elements, ce, level)
+
+        elements = elements[:self.n]
+        if self.descending:
+            elements = elements[::-1]
+        for port, element in zip(self.output.data_ports, elements):
+            comb += port.eq(element)
+
+        return m
+
+    def compare_exchange(self, m, elements, k, j, level):
+        result = list(elements)
+        for i in range(self.size):
+            l = i ^ j
+            if l < i:
+                continue
+            a, b = elements[i], elements[l]
+            ascending = (i & k) == 0
+            if a is None or b is None:
+                # the padding element goes to the high end
+                low, high = (b, a) if a is None else (a, b)
+            else:
+                swap = Signal(name=f'swap_{level}_{i}')
+                m.d.comb += swap.eq(self.key(a) > self.key(b))
+                low = Signal.like(a, name=f'low_{level}_{i}')
+                high = Signal.like(a, name=f'high_{level}_{i}')
+                m.d.comb += [low.eq(Mux(swap, b, a)),
+                             high.eq(Mux(swap, a, b)),]
+            result[i], result[l] = (low, high) if ascending else (high, low)
+        return result
+
+    def register(self, m, elements, ce, level):
+        result = []
+        for i, element in enumerate(elements):
+            if element is None:
+                result.append(None)
+                continue
+            r = Signal.like(element, name=f'stage_{level}_{i}')
+            with m.If(ce):
+                m.d[self.domain] += r.eq(element)
+            result.append(r)
+        return result
@@ -0,0 +1,270 @@
+from nmigen import *
+from .interfaces import KeepStream
+from .operations import _tree
+from math import ceil, log2
+
+
+class ChecksumEngine(Elaboratable):
+    """Common parts of the packet checksum cores.
+
+    `input` and `output` are KeepStreams of `data_w` bits with one keep bit
+    per byte. Byte 0 is the first of the beat. Every beat but the last is
+    full, and the last one keeps its first bytes. A 'generator' appends the
+    `check_w` bit checksum after the last byte of every packet, which takes
+    one more beat when it does not fit in the last one. A 'checker' passes
+    the packets through and sets `error` with the last beat of a packet
+    whose checksum does not match.
+
+    The checksum of a beat takes two cycles. The data term is computed and
+    registered first, and then it is merged with the running state, so the
+    feedback path stays short. Subclasses give `init`, `term`,
+    `next_state`, `check_value` and `residue_ok`.
+    """
+
+    MODES = ('generator', 'checker')
+
+    def __init__(self, data_w, check_w, term_w, mode, domain):
+        assert mode in self.MODES, f'mode must be one of {self.MODES}'
+        assert data_w % 8 == 0 and data_w >= check_w
+        self.data_w = data_w
+        self.nbytes = data_w // 8
+        self.check_w = check_w
+        self.term_w = term_w
+        self.mode = mode
+        self.domain = domain
+        self.input = KeepStream(data_w, self.nbytes, 'sink', name='input')
+        self.output = KeepStream(data_w, self.nbytes, 'source', name='output')
+        if mode == 'checker':
+            self.error = Signal()
+
+    def get_ports(self):
+        ports = [self.input[f] for f in self.input.fields]
+        ports += [self.output[f] for f in self.output.fields]
+        if self.mode == 'checker':
+            ports += [self.error]
+        return ports
+
+    def elaborate(self, platform):
+        m = Module()
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        nbytes = self.nbytes
+        check_bytes = self.check_w // 8
+
+        # Bytes in the beat: all but on the last beat
+        n_in = Signal(range(nbytes + 1))
+        comb += n_in.eq(Mux(self.input.last, sum([self.input.keep[b] for b in range(nbytes)]), nbytes))
+        data_in = Signal(self.data_w)
+        for b in range(nbytes):
+            comb += data_in[8*b:8*(b+1)].eq(Mux(n_in > b, self.input.data[8*b:8*(b+1)], 0))
+
+        # Stage 1: the beat and its data term
+        s1_valid = Signal()
+        s1_data = Signal(self.data_w)
+        s1_n = Signal.like(n_in)
+        s1_last = Signal()
+        s1_term = Signal(self.term_w)
+        s1_move = Signal()
+        comb += self.input.ready.eq(~s1_valid | s1_move)
+        with m.If(self.input.ready):
+            sync += [s1_valid.eq(self.input.valid),
+                     s1_data.eq(data_in),
+                     s1_n.eq(n_in),
+                     s1_last.eq(self.input.last),
+                     s1_term.eq(self.term(m, data_in, n_in)),]
+
+        state = Signal(self.state_w, reset=self.init)
+        next_state = Signal(self.state_w)
+        comb += next_state.eq(self.next_state(m, state, s1_term, s1_n))
+        with m.If(s1_move & s1_valid):
+            sync += state.eq(Mux(s1_last, self.init, next_state))
+
+        advance = Signal()
+        comb += advance.eq(~self.output.valid | self.output.ready)
+
+        if self.mode == 'checker':
+            comb += s1_move.eq(advance)
+            with m.If(advance):
+                sync += [self.output.valid.eq(s1_valid),
+                         self.output.data.eq(s1_data),
+                         self.output.keep.eq(Cat(*[s1_n > b for b in range(nbytes)])),
+                         self.output.last.eq(s1_last),
+                         self.error.eq(s1_last & ~self.residue_ok(next_state)),]
+            return m
+
+        # Generator: the checksum goes after the last byte, the bytes that
+        # do not fit wait for one more beat
+        pending = Signal()
+        pending_data = Signal(self.data_w)
+        pending_keep = Signal(nbytes)
+        comb += s1_move.eq(advance & ~pending)
+
+        n_out = Signal(range(nbytes + check_bytes + 1))
+        comb += n_out.eq(s1_n + Mux(s1_last, check_bytes, 0))
+        appended = Signal(2 * self.data_w)
+        comb += appended.eq(Cat(s1_data, Const(0, self.data_w)) |
+                            Mux(s1_last, self.check_value(next_state, s1_n) << (s1_n * 8), 0))
+        keep = Cat(*[n_out > b for b in range(2 * nbytes)])
+
+        with m.If(advance):
+            with m.If(pending):
+                sync += [self.output.valid.eq(1),
+                         self.output.data.eq(pending_data),
+                         self.output.keep.eq(pending_keep),
+                         self.output.last.eq(1),
+                         pending.eq(0),]
+            with m.Else():
+                sync += [self.output.valid.eq(s1_valid),
+                         self.output.data.eq(appended[:self.data_w]),
+                         self.output.keep.eq(keep[:nbytes]),
+                         self.output.last.eq(s1_last & (n_out <= nbytes)),
+                         pending.eq(s1_valid & s1_last & (n_out > nbytes)),
+                         pending_data.eq(appended[self.data_w:]),
+                         pending_keep.eq(keep[nbytes:]),]
+
+        return m
+
+
+class Crc(ChecksumEngine):
+    """Parallel CRC of `width` bits over `data_w` bits per cycle.
+
+    `polynomial` is given without its top bit (0x04C11DB7 for CRC-32). With
+    `reflect` the bytes go in LSB first and the CRC is sent LSB first,
+    otherwise MSB first. `init` is the state at the start of every packet
+    and `xor_out` is applied to the final value. The defaults give the
+    CRC-32 of Ethernet and zlib.
+
+    The matrices that give the next state from the state and the first `k`
+    bytes of a beat are found at elaboration by running the bit serial CRC
+    on symbols. The state part has one small matrix for every `k`, for the
+    last beats, and the data part a single one.
+    """
+
+    def __init__(self, data_w, width=32, polynomial=0x04C11DB7, init=0xFFFFFFFF, reflect=True,
+                 xor_out=0xFFFFFFFF, mode='generator', domain='sync'):
+        assert width % 8 == 0
+        self.width = width
+        self.polynomial = polynomial
+        self.init = init
+        self.reflect = reflect
+        self.xor_out = xor_out
+        self.state_w = width
+        ChecksumEngine.__init__(self, data_w, width, width, mode, domain)
+        self.matrices = self.get_matrices()
+        self.residue = self.get_residue()
+
+    def serial_step(self, state, bit):
+        # one bit of the serial CRC, on ints or on symbols (XOR masks)
+        mask = 2**self.width - 1
+        if self.reflect:
+            poly = int(f'{self.polynomial:0{self.width}b}'[::-1], 2)
+            feedback = state[0] ^ bit
+            state = state[1:] + [0]
+        else:
+            poly = self.polynomial & mask
+            feedback = state[-1] ^ bit
+            state = [0] + state[:-1]
+        return [s ^ feedback if (poly >> i) & 1 else s for i, s in enumerate(state)]
+
+    def byte_bits(self, byte):
+        return byte if self.reflect else byte[::-1]
+
+    def get_matrices(self):
+        # Symbols: bit i of the state is 1 << i, data bit j is 1 << (width + j).
+        # The matrix for k bytes has one XOR mask per state bit.
+        state = [1 << i for i in range(self.width)]
+        matrices = [list(state)]
+        for b in range(self.nbytes):
+            for bit in self.byte_bits([1 << (self.width + 8 * b + t) for t in range(8)]):
+                state = self.serial_step(state, bit)
+            matrices.append(list(state))
+        return matrices
+
+    def model(self, message):
+        """CRC register after `message` (bytes), before `xor_out`."""
+        state = [(self.init >> i) & 1 for i in range(self.width)]
+        for byte in message:
+            for bit in self.byte_bits([(byte >> t) & 1 for t in range(8)]):
+                state = self.serial_step(state, bit)
+        return sum([s << i for i, s in enumerate(state)])
+
+    def crc_bytes(self, value):
+        value ^= self.xor_out
+        order = range(self.width // 8) if self.reflect else reversed(range(self.width // 8))
+        return bytes([(value >> (8 * i)) & 0xFF for i in order])
+
+    def get_residue(self):
+        # the state after a message and its CRC does not depend on the message
+        return self.model(self.crc_bytes(self.model(b'')))
+
+    def term(self, m, data, n):
+        # Leading zero bytes do not change the data term, so the bytes are
+        # moved to the end of the beat and one matrix serves every length.
+        aligned = Signal(self.data_w)
+        m.d.comb += aligned.eq(data << ((self.nbytes - n) * 8))
+        bits = []
+        for mask in self.matrices[-1]:
+            data_mask = mask >> self.width
+            selected = [aligned[j] for j in range(self.data_w) if (data_mask >> j) & 1]
+            bits.append(_tree(selected, lambda a, b: a ^ b, empty=Const(0, 1)))
+        return Cat(*bits)
+
+    def next_state(self, m, state, term, n):
+        states = []
+        for k, matrix in enumerate(self.matrices):
+            bits = []
+            for mask in matrix:
+                selected = [state[j] for j in range(self.width) if (mask >> j) & 1]
+                bits.append(_tree(selected, lambda a, b: a ^ b, empty=Const(0, 1)))
+            s = Signal(self.width, name=f'state_{k}')
+            m.d.comb += s.eq(Cat(*bits))
+            states.append(s)
+        return Array(states)[n] ^ term
+
+    def check_value(self, state, n):
+        value = state ^ self.xor_out
+        if self.reflect:
+            return value
+        return Cat(*[value[8*i:8*(i+1)] for i in reversed(range(self.width // 8))])
+
+    def residue_ok(self, state):
+        return state == self.residue
+
+
+class InternetChecksum(ChecksumEngine):
+    """Internet checksum (RFC 1071): the ones' complement of the ones'
+    complement sum of the 16 bit big endian words of the packet.
+
+    `data_w` is a multiple of 16 so the words of full beats are aligned.
+    After a packet of odd length the checksum is sent byte swapped, which
+    keeps the sum over the packet and its checksum at 0xFFFF.
+    """
+
+    def __init__(self, data_w, mode='generator', domain='sync'):
+        assert data_w % 16 == 0
+        self.init = 0
+        self.state_w = 16
+        ChecksumEngine.__init__(self, data_w, 16, 16, mode, domain)
+
+    def term(self, m, data, n):
+        words = [Cat(data[8*(2*i+1):8*(2*i+2)], data[16*i:16*i+8]) for i in range(self.nbytes // 2)]
+        total = Signal(16 + int(ceil(log2(len(words) + 1))))
+        m.d.comb += total.eq(_tree(words, lambda a, b: a + b))
+        folded = Signal(17)
+        m.d.comb += folded.eq(total[:16] + total[16:])
+        return folded[:16] + folded[16]
+
+    def next_state(self, m, state, term, n):
+        total = Signal(17)
+        m.d.comb += total.eq(state + term)
+        return total[:16] + total[16]
+
+    def check_value(self, state, n):
+        value = ~state[:16]
+        big_endian = Cat(value[8:], value[:8])
+        return Mux(n[0], value, big_endian)
+
+    def residue_ok(self, state):
+        return state == 0xFFFF
+
@@ -0,0 +1,140 @@
+from nmigen import *
+from .interfaces import CordicStream
+from math import atan, ceil, log2, pi, sqrt
+
+
+class Cordic(Elaboratable):
+    """Pipelined CORDIC, one sample per cycle.
+
+    x and y are `width` bit two's complement integers. z is a `z_width` bit
+    two's complement angle where the full scale is [-pi, pi): pi is
+    2**(z_width - 1). In 'rotation' mode (x, y) is rotated by z, so
+    (x, y, z) = (K, 0, angle) gives (cos, sin) with the gain K below. In
+    'vectoring' mode y is driven to 0: x gets the magnitude of (x, y) and z
+    gets z + atan2(y, x). Inputs out of [-pi/2, pi/2] are first turned by pi,
+    so every quadrant converges.
+
+    Each of the `iterations` (`width` by default) adds about one bit of
+    precision, and `iterations_per_stage` of them are done between two
+    register stages. The CORDIC gain (about 1.647) is removed by a constant
+    multiplier when `compensate`. The output x and y have one more bit
+    than the input (two without compensation) so the magnitude fits. The
+    whole pipeline stalls while the output is not accepted.
+    """
+
+    MODES = ('rotation', 'vectoring')
+
+    def __init__(self, width, z_width=None, mode='rotation', iterations=None, iterations_per_stage=1,
+                 compensate=True, domain='sync'):
+        assert mode in self.MODES, f'mode must be one of {self.MODES}'
+        self.width = width
+        self.z_width = width if z_width is None else z_width
+        self.mode = mode
+        self.iterations = width if iterations is None else iterations
+        self.iterations_per_stage = iterations_per_stage
+        self.compensate = compensate
+        self.domain = domain
+        # guard bits below the LSB keep the rounding errors of the iterations
+        self.guard = int(ceil(log2(self.iterations))) + 1
+        self.gain = 1
+        for i in range(self.iterations):
+            self.gain *= sqrt(1 + 2**(-2 * i))
+        self.output_w = width + (1 if compensate else 2)
+        stages = int(ceil(self.iterations / iterations_per_stage))
+        self.latency = 2 + stages + (1 if compensate else 0)
+        self.input = CordicStream(width, self.z_width, direction='sink', name='input')
+        self.output = CordicStream(self.output_w, self.z_width, direction='source', name='output')
+
+    def get_ports(self):
+        ports = [self.input[f] for f in self.input.fields]
+        ports += [self.output[f] for f in self.output.fields]
+        return ports
+
+    def elaborate(self, platform):
+        m = Module()
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        xy_w = self.width + 2 + self.guard
+        z_w = self.z_width + self.guard
+
+        # The pipeline moves when its output is free
+        valid = Signal(self.latency)
+        last = Signal(self.latency)
+        ce = Signal()
+        comb += ce.eq(~valid[-1] | self.output.ready)
+        comb += self.input.ready.eq(ce)
+        with m.If(ce):
+            sync += valid.eq(Cat(self.input.valid, valid[:-1]))
+            sync += last.eq(Cat(self.input.last, last[:-1]))
+
+        # Input stage: turn by pi into the right half plane (vectoring) or
+        # into [-pi/2, pi/2) (rotation). One more bit so that -(-2**(width-1))
+        # does not wrap.
+        x_in = Signal(signed(self.width + 1))
+        y_in = Signal(signed(self.width + 1))
+        z_in = Signal(signed(self.z_width))
+        comb += [x_in.eq(Cat(self.input.x, self.input.x[-1])),
+                 y_in.eq(Cat(self.input.y, self.input.y[-1])),
+                 z_in.eq(self.input.z),]
+        if self.mode == 'rotation':
+            turn = z_in[-1] != z_in[-2]
+        else:
+            turn = x_in[-1]
+        x = Signal(signed(xy_w), name='x_0')
+        y = Signal(signed(xy_w), name='y_0')
+        z = Signal(signed(z_w), name='z_0')
+        with m.If(ce):
+            with m.If(turn):
+                sync += [x.eq(-x_in << self.guard),
+                         y.eq(-y_in << self.guard),
+                         z.eq(Cat(Const(0, self.guard), z_in[:-1], ~z_in[-1])),]
+            with m.Else():
+                sync += [x.eq(x_in << self.guard),
+                         y.eq(y_in << self.guard),
+                         z.eq(z_in << self.guard),]
+
+        # Iterations
+        for i in range(self.iterations):
+            angle = int(round(atan(2**-i) / pi * 2**(z_w - 1)))
+            if self.mode == 'rotation':
+                clockwise = z[-1]
+            else:
+                clockwise = ~y[-1]
+            last_of_stage = (i + 1) % self.iterations_per_stage == 0 or i == self.iterations - 1
+            x_next = Signal(signed(xy_w), name=f'x_{i + 1}')
+            y_next = Signal(signed(xy_w), name=f'y_{i + 1}')
+            z_next = Signal(signed(z_w), name=f'z_{i + 1}')
+            stmts = [x_next.eq(Mux(clockwise, x + (y >> i), x - (y >> i))),
+                     y_next.eq(Mux(clockwise, y - (x >> i), y + (x >> i))),
+                     z_next.eq(Mux(clockwise, z + angle, z - angle)),]
+            if last_of_stage:
+                with m.If(ce):
+                    sync += stmts
+            else:
+                comb += stmts
+            x, y, z = x_next, y_next, z_next
+
+        # Gain compensation
+        if self.compensate:
+            scale_w = xy_w
+            scale = int(round(2**scale_w / self.gain))
+            x_comp = Signal(signed(xy_w), name='x_comp')
+            y_comp = Signal(signed(xy_w), name='y_comp')
+            z_comp = Signal(signed(z_w), name='z_comp')
+            with m.If(ce):
+                sync += [x_comp.eq((x * scale) >> scale_w),
+                         y_comp.eq((y * scale) >> scale_w),
+                         z_comp.eq(z),]
+            x, y, z = x_comp, y_comp, z_comp
+
+        # Output: round away the guard bits
+        half = 1 << (self.guard - 1)
+        with m.If(ce):
+            sync += [self.output.x.eq((x + half) >> self.guard),
+                     self.output.y.eq((y + half) >> self.guard),
+                     self.output.z.eq((z + half) >> self.guard),]
+        comb += [self.output.valid.eq(valid[-1]),
+                 self.output.last.eq(last[-1]),]
+
+        return m
@@ -0,0 +1,135 @@
+from nmigen import *
+from .interfaces import DataStream
+from .operations import _incr
+
+
+class CornerTurn(Elaboratable):
+    """Transposes `rows` x `columns` frames streamed in row-major order.
+
+    Each input beat carries `lanes` consecutive elements of a row, and each
+    output beat `lanes` consecutive elements of a column, the first element
+    in the low bits. `last` is set on the last beat of every frame; the
+    input `last` is not used, frames are counted.
+
+    The frames go through two banks of Memory (ping-pong): a frame is read
+    out column by column while the next one fills the other bank, so frames
+    stream in and out at one beat per cycle. With `lanes` > 1 the rows are
+    spread over `lanes` memories (row `r` goes to memory `r % lanes`), so a
+    column group is read from all of them in the same cycle.
+    """
+
+    def __init__(self, width, rows, columns, lanes=1, domain='sync'):
+        assert rows % lanes == 0 and columns % lanes == 0
+        self.width = width
+        self.rows = rows
+        self.columns = columns
+        self.lanes = lanes
+        self.domain = domain
+        # words of a frame in each memory
+        self.depth = (rows // lanes) * (columns // lanes)
+        self.input = DataStream(width * lanes, 'sink', name='input')
+        self.output = DataStream(width * lanes, 'source', name='output')
+
+    def get_ports(self):
+        ports = [self.input[f] for f in self.input.fields]
+        ports += [self.output[f] for f in self.output.fields]
+        return ports
+
+    def elaborate(self, platform):
+        m = Module()
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        lanes = self.lanes
+        row_words = self.columns // lanes
+
+        full = Signal(2)
+        w_bank = Signal()
+        r_bank = Signal()
+        frame_written = Signal()
+        frame_read = Signal()
+
+        mems = [Memory(width=self.width * lanes, depth=2 * self.depth, name=f'bank_{j}') for j in range(lanes)]
+        wr_ports = [mem.write_port(domain=self.domain) for mem in mems]
+        rd_ports = [mem.read_port(domain=self.domain, transparent=False) for mem in mems]
+        for j, (wr, rd) in enumerate(zip(wr_ports, rd_ports)):
+            m.submodules[f'wr_port_{j}'] = wr
+            m.submodules[f'rd_port_{j}'] = rd
+
+        # Write side: column group, memory and row group of the next beat
+        w_column = Signal(range(row_words))
+        w_lane = Signal(range(lanes))
+        w_row_base = Signal(range(self.depth))
+        w_addr = Signal(range(2 * self.depth))
+
+        comb += self.input.ready.eq(~full.bit_select(w_bank, 1))
+        comb += w_addr.eq(w_row_base + w_column + Mux(w_bank, self.depth, 0))
+        for j, wr in enumerate(wr_ports):
+            comb += [wr.addr.eq(w_addr),
+                     wr.data.eq(self.input.data),
+                     wr.en.eq(self.input.accepted() & (w_lane == j)),]
+
+        end_of_row = w_column == row_words - 1
+        end_of_group = end_of_row & (w_lane == lanes - 1)
+        comb += frame_written.eq(self.input.accepted() & end_of_group & (w_row_base == self.depth - row_words))
+        with m.If(self.input.accepted()):
+            sync += w_column.eq(_incr(w_column, row_words))
+            with m.If(end_of_row):
+                sync += w_lane.eq(_incr(w_lane, lanes))
+            with m.If(end_of_group):
+                sync += w_row_base.eq(Mux(frame_written, 0, w_row_base + row_words))
+            with m.If(frame_written):
+                sync += w_bank.eq(~w_bank)
+
+        # Read side: row group, lane within the word and column group of the
+        # next beat. Data comes out of the memories one cycle after the read.
+        r_group = Signal(range(self.rows // lanes))
+        r_group_base = Signal(range(self.depth))
+        r_select = Signal(range(lanes))
+        r_column = Signal(range(row_words))
+        r_addr = Signal(range(2 * self.depth))
+        out_valid = Signal()
+        out_last = Signal()
+        out_select = Signal(range(lanes))
+        read = Signal()
+        advance = Signal()
+
+        comb += advance.eq(~out_valid | self.output.ready)
+        comb += read.eq(advance & full.bit_select(r_bank, 1))
+        comb += r_addr.eq(r_group_base + r_column + Mux(r_bank, self.depth, 0))
+        for rd in rd_ports:
+            comb += [rd.addr.eq(r_addr),
+                     rd.en.eq(advance),]
+
+        end_of_column = r_group == self.rows // lanes - 1
+        end_of_word = end_of_column & (r_select == lanes - 1)
+        comb += frame_read.eq(read & end_of_word & (r_column == row_words - 1))
+        with m.If(read):
+            sync += r_group.eq(_incr(r_group, self.rows // lanes))
+            sync += r_group_base.eq(Mux(end_of_column, 0, r_group_base + row_words))
+            with m.If(end_of_column):
+                sync += r_select.eq(_incr(r_select, lanes))
+            with m.If(end_of_word):
+                sync += r_column.eq(_incr(r_column, row_words))
+            with m.If(frame_read):
+                sync += r_bank.eq(~r_bank)
+        with m.If(advance):
+            sync += [out_valid.eq(read),
+                     out_last.eq(frame_read),
+                     out_select.eq(r_select),]
+
+        # element `out_select` of every memory word
+        elements = [Array([rd.data[i*self.width:(i+1)*self.width] for i in range(lanes)])[out_select]
+                    for rd in rd_ports]
+        comb += [self.output.valid.eq(out_valid),
+                 self.output.data.eq(Cat(*elements)),
+                 self.output.last.eq(out_last),]
+
+        # A bank is full from its last write to its last read
+        for bank in range(2):
+            with m.If(frame_written & (w_bank == bank)):
+                sync += full[bank].eq(1)
+            with m.Elif(frame_read & (r_bank == bank)):
+                sync += full[bank].eq(0)
+
+        return m
@@ -1,16 +1,24 @@
 from nmigen import *
-from .interfaces import Stream
+from .interfaces import DataStream
+from .skid_buffer import SkidBuffer
+from .fifo import StreamFifo
+from .operations import _incr
 
 class StagePipelineDelay(Elaboratable):
-    def __init__(self, width):
+    def __init__(self, width, skid_buffer=False):
         self.width = width
-        self.input = Stream(width, 'sink')
-        self.output = Stream(width, 'source')
+        self.skid_buffer = skid_buffer
+        self.input = DataStream(width, 'sink')
+        self.output = DataStream(width, 'source')
     def elaborate(self, platform):
         m = Module()
         sync = m.d.sync
         comb = m.d.comb
 
+        if self.skid_buffer:
+            m.submodules.skid_buffer = SkidBuffer(self.input, self.output)
+            return m
+
         with m.If(self.input.accepted()):
             sync += self.output.valid.eq(1)
             sync += self.output.data.eq(self.input.data)
@@ -26,16 +34,17 @@ class StagePipelineDelay(Elaboratable):
         return m
 
 class PipelineDelay(Elaboratable):
-    def __init__(self, width, stages):
+    def __init__(self, width, stages, skid_buffer=False):
         self.width = width
-        self.input = Stream(width, 'sink', name='input')
-        self.output = Stream(width, 'source', name='output')
+        self.input = DataStream(width, 'sink', name='input')
+        self.output = DataStream(width, 'source', name='output')
         self.stages = stages
+        self.skid_buffer = skid_buffer
 
     def elaborate(self, platform):
         m = Module()
         comb = m.d.comb
-        modules = [StagePipelineDelay(self.width)
+        modules = [StagePipelineDelay(self.width, self.skid_buffer)
                    for i in range(self.stages)]
         for i, stage in enumerate(modules):
             m.submodules['stage_' + str(i)] = stage
@@ -43,4 +52,94 @@ class PipelineDelay(Elaboratable):
             comb += modules[i].input.connect(modules[i-1].output)
         comb += modules[0].input.connect(self.input)
         comb += modules[-1].output.connect(self.output)
-        return m
\ No newline at end of file
+        return m
+
+class DelayLine(Elaboratable):
+    """Fixed-latency delay line for long delays.
+
+    While the output is not stalled every beat (and every bubble) comes out
+    exactly `depth` cycles after it went in. Short delays use a
+    PipelineDelay of flops. Longer ones use a reset-less shift register
+    (inferred as SRL) or, from `ram_threshold` on, a circular buffer in a
+    Memory. Backpressure is absorbed by a small output StreamFifo: the
+    whole line only advances while the FIFO has room.
+    """
+    # cycles added by the output StreamFifo (SyncFIFOBuffered)
+    _fifo_latency = 2
+
+    def __init__(self, width, depth, srl_threshold=4, ram_threshold=64, fifo_depth=4, implementation=None):
+        assert implementation in (None, 'flops', 'srl', 'ram')
+        if implementation is None:
+            if depth < srl_threshold:
+                implementation = 'flops'
+            elif depth < ram_threshold:
+                implementation = 'srl'
+            else:
+                implementation = 'ram'
+        assert depth >= {'flops': 1, 'srl': 3, 'ram': 4}[implementation], f'depth {depth} too short for {implementation}'
+        self.width = width
+        self.depth = depth
+        self.fifo_depth = fifo_depth
+        self.implementation = implementation
+        self.input = DataStream(width, 'sink', name='input')
+        self.output = DataStream(width, 'source', name='output')
+
+    def elaborate(self, platform):
+        m = Module()
+        sync = m.d.sync
+        comb = m.d.comb
+
+        if self.implementation == 'flops':
+            m.submodules.pipeline = pipeline = PipelineDelay(self.width, self.depth)
+            comb += pipeline.input.connect(self.input)
+            comb += pipeline.output.connect(self.output)
+            return m
+
+        line_output = DataStream(self.width, 'source')
+        m.submodules.fifo = StreamFifo(input_stream=line_output,
+                                       output_stream=self.output,
+                                       depth=self.fifo_depth)
+
+        # Each entry carries the input valid bit, so bubbles are delayed too.
+        entry_w = self.input._total_width + 1
+        entry_in = Cat(self.input.valid, self.input._flat_data)
+        entry_out = Signal(entry_w)
+        advance = Signal()
+
+        comb += advance.eq(line_output.ready)
+        comb += self.input.ready.eq(advance)
+
+        if self.implementation == 'srl':
+            length = self.depth - self._fifo_latency
+            line = [Signal(entry_w, reset_less=True, name='line_' + str(i)) for i in range(length)]
+            with m.If(advance):
+                sync += line[0].eq(entry_in)
+                for i in range(1, length):
+                    sync += line[i].eq(line[i-1])
+            comb += entry_out.eq(line[-1])
+        else:
+            # The registered read adds one step to the memory depth.
+            length = self.depth - self._fifo_latency
+            mem = Memory(width=entry_w, depth=length-1)
+            m.submodules.wr_port = wr_port = mem.write_port()
+            m.submodules.rd_port = rd_port = mem.read_port(transparent=False)
+            ptr = Signal(range(length-1))
+            comb += [wr_port.addr.eq(ptr),
+                     wr_port.data.eq(entry_in),
+                     wr_port.en.eq(advance),
+                     rd_port.addr.eq(ptr),
+                     rd_port.en.eq(advance),
+                     entry_out.eq(rd_port.data),]
+            with m.If(advance):
+                sync += ptr.eq(_incr(ptr, length-1))
+
+        # Neither SRLs nor memories are reset, so whatever is in the line
+        # is ignored until it has been completely refilled after reset.
+        filled = Signal(range(length+1))
+        with m.If(advance & (filled != length)):
+            sync += filled.eq(filled + 1)
+
+        comb += line_output.valid.eq(entry_out[0] & (filled == length))
+        comb += line_output.eq_from_flat(entry_out[1:])
+
+        return m
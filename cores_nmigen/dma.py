@@ -0,0 +1,247 @@
+from nmigen import *
+from nmigen.lib.fifo import SyncFIFO
+from .interfaces import Axi4, DataStream, RegistersInterface
+from .fifo import StreamFifo
+from math import ceil, log2
+
+
+class DmaEngine(Elaboratable):
+    """Common parts of the AXI4 DMA engines.
+
+    A transfer moves `length` bytes from/to `address` (both multiples of
+    the bus word) as INCR bursts of up to `max_burst` beats. Bursts never
+    cross a 4KB boundary, and up to `max_outstanding` bursts are in flight.
+
+    `register_map` is a register list for `AxiLiteDevice` starting at
+    `base_addr`: a 'pulse' control register (start on bit 0), a 'ro' status
+    register (busy on bit 0, error on bit 1, sticky until the next start),
+    the 'rw' address (one word per 32 bits) and the 'rw' length in bytes.
+    `registers` has the same fields, so the engine is hooked to a device
+    with:
+
+        comb += device.registers.connect(dma.registers, include=dma.registers.fields)
+    """
+
+    def __init__(self, addr_w, data_w, max_burst, max_outstanding, fifo_depth, reg_addr_w, base_addr,
+                 name, domain):
+        assert 1 <= max_burst <= 256 and max_burst & (max_burst - 1) == 0
+        assert max_outstanding >= 1
+        self.addr_w = addr_w
+        self.data_w = data_w
+        self.beat_bytes = data_w // 8
+        self.max_burst = max_burst
+        self.max_outstanding = max_outstanding
+        self.fifo_depth = 2 * max_burst if fifo_depth is None else fifo_depth
+        assert self.fifo_depth >= max_burst
+        self.name = name
+        self.domain = domain
+        self.axi = Axi4(addr_w, data_w, mode='master', name='m_axi')
+        self.register_map = self.get_register_map(base_addr)
+        self.registers = RegistersInterface(reg_addr_w, 32, self.register_map, name=name)
+        self.start = getattr(self.registers, name + '_start')
+        self.busy = getattr(self.registers, name + '_busy')
+        self.error = getattr(self.registers, name + '_error')
+        self.length = getattr(self.registers, name + '_length')
+        self.address = Cat(*[getattr(self.registers, f) for f in self.address_fields()])
+
+    def address_fields(self):
+        words = ceil(self.addr_w / 32)
+        if words == 1:
+            return [self.name + '_address']
+        return [f'{self.name}_address_{i}' for i in range(words)]
+
+    def get_register_map(self, base_addr):
+        registers = [(self.name + '_control', 'pulse', base_addr, [(self.name + '_start', 1, 0),]),
+                     (self.name + '_status', 'ro', base_addr + 4, [(self.name + '_busy', 1, 0),
+                                                                   (self.name + '_error', 1, 1),]),]
+        addr = base_addr + 8
+        for i, field in enumerate(self.address_fields()):
+            registers.append((field, 'rw', addr, [(field, min(32, self.addr_w - 32 * i), 0),]))
+            addr += 4
+        registers.append((self.name + '_length', 'rw', addr, [(self.name + '_length', 32, 0),]))
+        return registers
+
+    def get_ports(self):
+        ports = [self.axi[f] for f in self.axi.fields]
+        ports += [self.registers[f] for f in self.registers.fields]
+        return ports
+
+    def elaborate_bursts(self, m, addr, remaining):
+        # Beats of the next burst: limited by what is left, by `max_burst`
+        # and by the next 4KB boundary.
+        comb = m.d.comb
+
+        size = int(log2(self.beat_bytes))
+        to_boundary = Signal(13 - size + 1)
+        beats = Signal(range(self.max_burst + 1))
+        comb += to_boundary.eq((4096 - addr[:12]) >> size)
+        with m.If((remaining <= self.max_burst) & (remaining <= to_boundary)):
+            comb += beats.eq(remaining)
+        with m.Elif(to_boundary <= self.max_burst):
+            comb += beats.eq(to_boundary)
+        with m.Else():
+            comb += beats.eq(self.max_burst)
+        return beats
+
+    def elaborate_transfer(self, m, addr, remaining, bursts):
+        # start/busy handling shared by both directions. The transfer is over
+        # once every burst has been issued and has completed.
+        sync = m.d[self.domain]
+
+        size = int(log2(self.beat_bytes))
+        with m.If(~self.busy & self.start):
+            sync += [addr.eq(self.address[size:] << size),
+                     remaining.eq(self.length >> size),
+                     self.busy.eq(1),
+                     self.error.eq(0),]
+        with m.Elif(self.busy & (remaining == 0) & (bursts == 0)):
+            sync += self.busy.eq(0)
+
+
+class DmaS2MM(DmaEngine):
+    """Stream to memory mapped DMA.
+
+    Beats of `input` are buffered in a FIFO of `fifo_depth` beats, and a
+    burst is only issued once all of its data is in the FIFO, so W never
+    stalls the interconnect. `last` on the input is ignored: the stream is
+    cut in transfers of `length` bytes, and the data that arrives between
+    transfers waits in the FIFO.
+    """
+
+    def __init__(self, addr_w, data_w, max_burst=256, max_outstanding=4, fifo_depth=None, reg_addr_w=8,
+                 base_addr=0, name='s2mm', domain='sync'):
+        DmaEngine.__init__(self, addr_w, data_w, max_burst, max_outstanding, fifo_depth, reg_addr_w,
+                           base_addr, name, domain)
+        self.input = DataStream(data_w, 'sink', name='input')
+
+    def get_ports(self):
+        return DmaEngine.get_ports(self) + [self.input[f] for f in self.input.fields]
+
+    def elaborate(self, platform):
+        m = Module()
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        axi = self.axi
+        addr = Signal(self.addr_w)
+        remaining = Signal(32)
+        bursts = Signal(range(self.max_outstanding + 1))
+        credit = Signal(range(self.fifo_depth + 1))
+
+        data = DataStream(self.data_w, 'source', name='data')
+        m.submodules.data_fifo = DomainRenamer(self.domain)(StreamFifo(self.input, data, self.fifo_depth))
+        # lengths of the bursts whose data has not been sent yet
+        m.submodules.lengths = lengths = DomainRenamer(self.domain)(SyncFIFO(width=8, depth=self.max_outstanding))
+
+        beats = self.elaborate_bursts(m, addr, remaining)
+        self.elaborate_transfer(m, addr, remaining, bursts)
+
+        # Write address channel: a burst is issued once its data is buffered
+        issue = Signal()
+        comb += issue.eq(self.busy & (remaining != 0) & (credit >= beats) & (bursts < self.max_outstanding) &
+                         (~axi.awvalid | axi.awready) & lengths.w_rdy)
+        comb += [axi.awid.eq(0),
+                 axi.awsize.eq(int(log2(self.beat_bytes))),
+                 axi.awburst.eq(1),]
+        with m.If(issue):
+            sync += [axi.awaddr.eq(addr),
+                     axi.awlen.eq(beats - 1),
+                     axi.awvalid.eq(1),
+                     addr.eq(addr + (beats << int(log2(self.beat_bytes)))),
+                     remaining.eq(remaining - beats),]
+        with m.Elif(axi.aw_accepted()):
+            sync += axi.awvalid.eq(0)
+        comb += [lengths.w_data.eq(beats - 1),
+                 lengths.w_en.eq(issue),]
+
+        # beats in the FIFO that no burst has claimed yet
+        sync += credit.eq(credit + self.input.accepted() - Mux(issue, beats, 0))
+
+        # Write data channel
+        count = Signal(8)
+        comb += [axi.wdata.eq(data.data),
+                 axi.wstrb.eq(2**len(axi.wstrb) - 1),
+                 axi.wlast.eq(count == lengths.r_data),
+                 axi.wvalid.eq(data.valid & lengths.r_rdy),
+                 data.ready.eq(axi.wready & lengths.r_rdy),
+                 lengths.r_en.eq(axi.w_accepted() & axi.wlast),]
+        with m.If(axi.w_accepted()):
+            sync += count.eq(Mux(axi.wlast, 0, count + 1))
+
+        # Write response channel
+        comb += axi.bready.eq(1)
+        sync += bursts.eq(bursts + issue - axi.b_accepted())
+        with m.If(axi.b_accepted() & (axi.bresp != 0)):
+            sync += self.error.eq(1)
+
+        return m
+
+
+class DmaMM2S(DmaEngine):
+    """Memory mapped to stream DMA.
+
+    Read data goes through a FIFO of `fifo_depth` beats, and a burst is only
+    issued when there is room for all of it, so R is never back-pressured
+    by `output`. `last` is set on the last beat of each transfer.
+    """
+
+    def __init__(self, addr_w, data_w, max_burst=256, max_outstanding=4, fifo_depth=None, reg_addr_w=8,
+                 base_addr=0, name='mm2s', domain='sync'):
+        DmaEngine.__init__(self, addr_w, data_w, max_burst, max_outstanding, fifo_depth, reg_addr_w,
+                           base_addr, name, domain)
+        self.output = DataStream(data_w, 'source', name='output')
+
+    def get_ports(self):
+        return DmaEngine.get_ports(self) + [self.output[f] for f in self.output.fields]
+
+    def elaborate(self, platform):
+        m = Module()
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        axi = self.axi
+        addr = Signal(self.addr_w)
+        remaining = Signal(32)
+        to_receive = Signal(32)
+        bursts = Signal(range(self.max_outstanding + 1))
+        space = Signal(range(self.fifo_depth + 1), reset=self.fifo_depth)
+
+        data = DataStream(self.data_w, 'sink', name='data')
+        m.submodules.data_fifo = DomainRenamer(self.domain)(StreamFifo(data, self.output, self.fifo_depth))
+
+        beats = self.elaborate_bursts(m, addr, remaining)
+        self.elaborate_transfer(m, addr, remaining, bursts)
+        with m.If(~self.busy & self.start):
+            sync += to_receive.eq(self.length >> int(log2(self.beat_bytes)))
+
+        # Read address channel: a burst is issued once there is room for it
+        issue = Signal()
+        comb += issue.eq(self.busy & (remaining != 0) & (space >= beats) & (bursts < self.max_outstanding) &
+                         (~axi.arvalid | axi.arready))
+        comb += [axi.arid.eq(0),
+                 axi.arsize.eq(int(log2(self.beat_bytes))),
+                 axi.arburst.eq(1),]
+        with m.If(issue):
+            sync += [axi.araddr.eq(addr),
+                     axi.arlen.eq(beats - 1),
+                     axi.arvalid.eq(1),
+                     addr.eq(addr + (beats << int(log2(self.beat_bytes)))),
+                     remaining.eq(remaining - beats),]
+        with m.Elif(axi.ar_accepted()):
+            sync += axi.arvalid.eq(0)
+
+        # FIFO entries that no burst has claimed yet
+        sync += space.eq(space + self.output.accepted() - Mux(issue, beats, 0))
+
+        # Read data channel
+        comb += [data.valid.eq(axi.rvalid),
+                 data.data.eq(axi.rdata),
+                 data.last.eq(to_receive == 1),
+                 axi.rready.eq(data.ready),]
+        with m.If(axi.r_accepted()):
+            sync += to_receive.eq(to_receive - 1)
+            with m.If(axi.rresp != 0):
+                sync += self.error.eq(1)
+        sync += bursts.eq(bursts + issue - (axi.r_accepted() & axi.rlast))
+
+        return m
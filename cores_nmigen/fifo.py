@@ -1,14 +1,181 @@
 from nmigen import *
 from nmigen.lib.fifo import SyncFIFOBuffered, SyncFIFO, AsyncFIFOBuffered, AsyncFIFO
+from nmigen.lib.cdc import FFSynchronizer
+from nmigen.lib.coding import GrayEncoder, GrayDecoder
+from .interfaces import DataStream
+from .width_converter import WidthConverterUpKeep, WidthConverterDownKeep
+from math import ceil, log2
+
+
+class AsyncFIFOLevel(AsyncFIFO):
+    """AsyncFIFO that reports its fill level on both sides.
+
+    Same design as nmigen's AsyncFIFO (Cummings' "style #2"). The Gray-coded
+    pointer seen through the synchronizer is decoded back to binary on each
+    side, which gives `w_level` in the write domain and `r_level` in the
+    read domain. Both are conservative: `w_level` may count entries that
+    have already been read, and `r_level` may miss entries that have just
+    been written. `sync_stages` sets the length of the pointer
+    synchronizers.
+    """
+
+    def __init__(self, *, width, depth, r_domain="read", w_domain="write", sync_stages=2, exact_depth=False):
+        AsyncFIFO.__init__(self, width=width, depth=depth, r_domain=r_domain, w_domain=w_domain,
+                           exact_depth=exact_depth)
+        assert self.depth >= 2, 'AsyncFIFOLevel needs a depth of at least 2'
+        assert sync_stages >= 2
+        self.sync_stages = sync_stages
+        self.w_level = Signal(range(self.depth + 1))
+        self.r_level = Signal(range(self.depth + 1))
+
+    def elaborate(self, platform):
+        m = Module()
+        comb = m.d.comb
+        w_sync = m.d[self._w_domain]
+        r_sync = m.d[self._r_domain]
+
+        do_write = self.w_rdy & self.w_en
+        do_read  = self.r_rdy & self.r_en
+
+        produce_w_bin = Signal(self._ctr_bits)
+        produce_w_nxt = Signal(self._ctr_bits)
+        comb += produce_w_nxt.eq(produce_w_bin + do_write)
+        w_sync += produce_w_bin.eq(produce_w_nxt)
+
+        consume_r_bin = Signal(self._ctr_bits)
+        consume_r_nxt = Signal(self._ctr_bits)
+        comb += consume_r_nxt.eq(consume_r_bin + do_read)
+        r_sync += consume_r_bin.eq(consume_r_nxt)
+
+        produce_w_gry = Signal(self._ctr_bits)
+        produce_r_gry = Signal(self._ctr_bits)
+        m.submodules.produce_enc = produce_enc = GrayEncoder(self._ctr_bits)
+        m.submodules.produce_cdc = FFSynchronizer(produce_w_gry, produce_r_gry,
+                                                  o_domain=self._r_domain, stages=self.sync_stages)
+        comb += produce_enc.i.eq(produce_w_nxt)
+        w_sync += produce_w_gry.eq(produce_enc.o)
+
+        consume_r_gry = Signal(self._ctr_bits)
+        consume_w_gry = Signal(self._ctr_bits)
+        m.submodules.consume_enc = consume_enc = GrayEncoder(self._ctr_bits)
+        m.submodules.consume_cdc = FFSynchronizer(consume_r_gry, consume_w_gry,
+                                                  o_domain=self._w_domain, stages=self.sync_stages)
+        comb += consume_enc.i.eq(consume_r_nxt)
+        r_sync += consume_r_gry.eq(consume_enc.o)
+
+        # Fill levels from the synchronized pointers
+        m.submodules.produce_dec = produce_dec = GrayDecoder(self._ctr_bits)
+        m.submodules.consume_dec = consume_dec = GrayDecoder(self._ctr_bits)
+        comb += produce_dec.i.eq(produce_r_gry)
+        comb += consume_dec.i.eq(consume_w_gry)
+        comb += self.w_level.eq((produce_w_bin - consume_dec.o)[:self._ctr_bits])
+        comb += self.r_level.eq((produce_dec.o - consume_r_bin)[:self._ctr_bits])
+
+        w_full  = Signal()
+        r_empty = Signal()
+        comb += [
+            w_full.eq((produce_w_gry[-1]  != consume_w_gry[-1]) &
+                      (produce_w_gry[-2]  != consume_w_gry[-2]) &
+                      (produce_w_gry[:-2] == consume_w_gry[:-2])),
+            r_empty.eq(consume_r_gry == produce_r_gry),
+        ]
+
+        storage = Memory(width=self.width, depth=self.depth)
+        m.submodules.w_port = w_port = storage.write_port(domain=self._w_domain)
+        m.submodules.r_port = r_port = storage.read_port(domain=self._r_domain, transparent=False)
+        comb += [
+            w_port.addr.eq(produce_w_bin[:-1]),
+            w_port.data.eq(self.w_data),
+            w_port.en.eq(do_write),
+            self.w_rdy.eq(~w_full),
+        ]
+        comb += [
+            r_port.addr.eq(consume_r_nxt[:-1]),
+            self.r_data.eq(r_port.data),
+            r_port.en.eq(1),
+            self.r_rdy.eq(~r_empty),
+        ]
+
+        return m
+
+
+class AsyncFIFOBufferedLevel(AsyncFIFOBuffered):
+    """AsyncFIFOBuffered built on AsyncFIFOLevel.
+
+    The output register counts as one more entry in both levels. Its valid
+    flag goes through a synchronizer as long as the read pointer's, so
+    `w_level` sees an entry leave the FIFO and enter the register together.
+    """
+
+    def __init__(self, *, width, depth, r_domain="read", w_domain="write", sync_stages=2, exact_depth=False):
+        AsyncFIFOBuffered.__init__(self, width=width, depth=depth, r_domain=r_domain, w_domain=w_domain,
+                                   exact_depth=exact_depth)
+        self.sync_stages = sync_stages
+        self.w_level = Signal(range(self.depth + 1))
+        self.r_level = Signal(range(self.depth + 1))
+
+    def elaborate(self, platform):
+        m = Module()
+        comb = m.d.comb
+        r_sync = m.d[self._r_domain]
+
+        m.submodules.unbuffered = fifo = AsyncFIFOLevel(width=self.width, depth=self.depth - 1,
+                                                        r_domain=self._r_domain, w_domain=self._w_domain,
+                                                        sync_stages=self.sync_stages)
+
+        comb += [
+            fifo.w_data.eq(self.w_data),
+            self.w_rdy.eq(fifo.w_rdy),
+            fifo.w_en.eq(self.w_en),
+        ]
+
+        with m.If(self.r_en | ~self.r_rdy):
+            r_sync += [
+                self.r_data.eq(fifo.r_data),
+                self.r_rdy.eq(fifo.r_rdy),
+            ]
+            comb += fifo.r_en.eq(1)
+
+        r_rdy_w = Signal()
+        m.submodules.r_rdy_cdc = FFSynchronizer(self.r_rdy, r_rdy_w, o_domain=self._w_domain,
+                                                stages=self.sync_stages)
+
+        comb += self.w_level.eq(fifo.w_level + r_rdy_w)
+        comb += self.r_level.eq(fifo.r_level + self.r_rdy)
+
+        return m
 
 
 class StreamFifo(Elaboratable):
+    """Stream wrapper around a nmigen FIFO.
+
+    `level` and `packet_count` report the occupancy, and `almost_full` /
+    `almost_empty` compare `level` against `almost_full_threshold` /
+    `almost_empty_threshold`. Both thresholds are signals, so they can be
+    driven at run time; when undriven they keep their reset values.
 
-    def __init__(self, input_stream, output_stream, depth, fifo=SyncFIFOBuffered, *args, **kwargs):
+    With `packet_mode` the FIFO works as store-and-forward: `output.valid`
+    only rises once a whole packet (up to `last`) has been written. A packet
+    longer than the FIFO is let through once the FIFO fills up, and then
+    flows until its `last` beat, so the FIFO cannot deadlock.
+    """
+
+    def __init__(self, input_stream, output_stream, depth, fifo=SyncFIFOBuffered, *args,
+                 packet_mode=False, almost_full_threshold=None, almost_empty_threshold=1, **kwargs):
         assert input_stream._total_width == output_stream._total_width
         self.input = input_stream
         self.output = output_stream
+        self.depth = depth
+        self.packet_mode = packet_mode
         self.fifo = fifo(width=input_stream._total_width, depth=depth, *args, **kwargs)
+        if almost_full_threshold is None:
+            almost_full_threshold = depth - 1
+        self.level = Signal(range(depth + 1))
+        self.packet_count = Signal(range(depth + 1))
+        self.almost_full = Signal()
+        self.almost_empty = Signal()
+        self.almost_full_threshold = Signal(range(depth + 1), reset=almost_full_threshold)
+        self.almost_empty_threshold = Signal(range(depth + 1), reset=almost_empty_threshold)
 
     def elaborate(self, platform):
         m = Module()
@@ -20,16 +187,162 @@ class StreamFifo(Elaboratable):
         comb += fifo.w_en.eq(self.input.accepted())
         comb += self.input.ready.eq(fifo.w_rdy)
 
-        comb += self.output.valid.eq(fifo.r_rdy)
+        if self.packet_mode:
+            # a packet that fills the FIFO is drained up to its last beat
+            draining = Signal()
+            with m.If(~fifo.w_rdy & (self.packet_count == 0)):
+                m.d.sync += draining.eq(1)
+            with m.If(self.output.accepted() & self.output.last):
+                m.d.sync += draining.eq(0)
+            comb += self.output.valid.eq(fifo.r_rdy & ((self.packet_count != 0) | draining | ~fifo.w_rdy))
+        else:
+            comb += self.output.valid.eq(fifo.r_rdy)
         comb += fifo.r_en.eq(self.output.accepted())
         comb += self.output.eq_from_flat(fifo.r_data)
 
+        self.elaborate_status(m)
+
+        return m
+
+    def elaborate_status(self, m):
+        sync = m.d.sync
+        comb = m.d.comb
+
+        # streams without last have no packets to count
+        if 'last' in [name for name, width in self.input.DATA_FIELDS]:
+            packet_in = Signal()
+            packet_out = Signal()
+            comb += packet_in.eq(self.input.accepted() & self.input.last)
+            comb += packet_out.eq(self.output.accepted() & self.output.last)
+
+            with m.If(packet_in & ~packet_out):
+                sync += self.packet_count.eq(self.packet_count + 1)
+            with m.Elif(~packet_in & packet_out):
+                sync += self.packet_count.eq(self.packet_count - 1)
+
+        comb += self.level.eq(self.fifo.level)
+        comb += self.almost_full.eq(self.level >= self.almost_full_threshold)
+        comb += self.almost_empty.eq(self.level <= self.almost_empty_threshold)
+
+
+class StreamFifoPacked(Elaboratable):
+    """StreamFifo that stores `ratio` narrow beats per memory word.
+
+    Beats are packed with WidthConverterUpKeep and unpacked with
+    WidthConverterDownKeep, so the memory is `ratio` times wider and
+    shallower than the one StreamFifo would build. A word closed early by
+    `last` only gives back its populated lanes, so `last` stays on the same
+    beat and no padding comes out. `depth` counts narrow beats, but every
+    packet uses whole words. The input stream must have a `last` field.
+
+    Only the word closed by `last` can be partial, so each word stores a
+    single tag next to the lanes: 0 for a full word without `last`, or the
+    number of lanes of the last word. `word_width` is the resulting memory
+    width. With `memory_width` (the width of the RAM columns) `ratio` can be
+    left out to get the largest one whose word fits, otherwise the word is
+    checked against it.
+    """
+
+    def __init__(self, input_stream, output_stream, depth, ratio=None, fifo=SyncFIFOBuffered,
+                 memory_width=None):
+        assert input_stream._total_width == output_stream._total_width
+        assert input_stream.DATA_FIELDS[-1][0] == 'last'
+        self.input = input_stream
+        self.output = output_stream
+        self.width = input_stream._total_width - 1
+        if ratio is None:
+            assert memory_width is not None, 'ratio or memory_width is needed'
+            ratio = 2
+            while self.get_word_width(ratio + 1) <= memory_width:
+                ratio += 1
+        assert ratio >= 2
+        self.ratio = ratio
+        self.tag_w = int(ceil(log2(ratio + 1)))
+        self.word_width = self.get_word_width(ratio)
+        if memory_width is not None:
+            assert self.word_width <= memory_width, \
+                f'{ratio} beats take {self.word_width} bits, more than {memory_width}'
+        self.packer = WidthConverterUpKeep(self.width, self.width * ratio)
+        self.unpacker = WidthConverterDownKeep(self.width * ratio, self.width)
+        self.fifo = StreamFifo(input_stream=DataStream(self.word_width, 'sink', last=False),
+                               output_stream=DataStream(self.word_width, 'source', last=False),
+                               depth=int(ceil(depth / ratio)),
+                               fifo=fifo)
+
+    def get_word_width(self, ratio):
+        return self.width * ratio + int(ceil(log2(ratio + 1)))
+
+    def elaborate(self, platform):
+        m = Module()
+        comb = m.d.comb
+
+        m.submodules.packer = packer = self.packer
+        m.submodules.fifo = fifo = self.fifo
+        m.submodules.unpacker = unpacker = self.unpacker
+
+        comb += packer.input.valid.eq(self.input.valid)
+        comb += packer.input.data.eq(self.input._flat_data[:-1])
+        comb += packer.input.last.eq(self.input.last)
+        comb += self.input.ready.eq(packer.input.ready)
+
+        # keep is always a prefix of lanes: store its length on last words
+        n_lanes = Signal(self.tag_w)
+        comb += n_lanes.eq(sum([packer.output.keep[i] for i in range(self.ratio)]))
+        comb += fifo.input.valid.eq(packer.output.valid)
+        comb += fifo.input.data.eq(Cat(packer.output.data, Mux(packer.output.last, n_lanes, 0)))
+        comb += packer.output.ready.eq(fifo.input.ready)
+
+        tag = fifo.output.data[-self.tag_w:]
+        word_lanes = Signal(self.tag_w)
+        comb += word_lanes.eq(Mux(tag == 0, self.ratio, tag))
+        comb += unpacker.input.valid.eq(fifo.output.valid)
+        comb += unpacker.input.data.eq(fifo.output.data[:-self.tag_w])
+        comb += unpacker.input.keep.eq(Cat(*[word_lanes > i for i in range(self.ratio)]))
+        comb += unpacker.input.last.eq(tag != 0)
+        comb += fifo.output.ready.eq(unpacker.input.ready)
+
+        comb += self.output.valid.eq(unpacker.output.valid)
+        comb += self.output.eq_from_flat(Cat(unpacker.output.data, unpacker.output.last))
+        comb += unpacker.output.ready.eq(self.output.ready)
+
         return m
 
 
 class StreamFifoCDC(StreamFifo):
+    """Clock domain crossing StreamFifo.
+
+    `w_level` / `w_almost_full` belong to the write domain and `r_level` /
+    `r_almost_empty` to the read domain. With `buffered` the FIFO gets a
+    registered read stage (AsyncFIFOBuffered). `sync_stages` sets the
+    length of the pointer synchronizers.
+    """
 
-    def __init__(self, input_stream, output_stream, depth, r_domain, w_domain, fifo=AsyncFIFO):
+    def __init__(self, input_stream, output_stream, depth, r_domain, w_domain, buffered=False, sync_stages=2,
+                 w_almost_full_threshold=None, r_almost_empty_threshold=1):
+        if buffered:
+            # the unbuffered FIFO inside needs at least 2 entries
+            fifo = AsyncFIFOBufferedLevel
+            depth = max(depth, 3)
+        else:
+            fifo = AsyncFIFOLevel
         StreamFifo.__init__(self, input_stream, output_stream, depth, fifo=fifo,
-                            r_domain=r_domain, w_domain=w_domain)
+                            r_domain=r_domain, w_domain=w_domain, sync_stages=sync_stages)
+        self.r_domain = r_domain
+        self.w_domain = w_domain
+        depth = self.fifo.depth
+        if w_almost_full_threshold is None:
+            w_almost_full_threshold = depth - 1
+        self.w_level = Signal(range(depth + 1))
+        self.r_level = Signal(range(depth + 1))
+        self.w_almost_full = Signal()
+        self.r_almost_empty = Signal()
+        self.w_almost_full_threshold = Signal(range(depth + 1), reset=w_almost_full_threshold)
+        self.r_almost_empty_threshold = Signal(range(depth + 1), reset=r_almost_empty_threshold)
+
+    def elaborate_status(self, m):
+        comb = m.d.comb
 
+        comb += self.w_level.eq(self.fifo.w_level)
+        comb += self.r_level.eq(self.fifo.r_level)
+        comb += self.w_almost_full.eq(self.w_level >= self.w_almost_full_threshold)
+        comb += self.r_almost_empty.eq(self.r_level <= self.r_almost_empty_threshold)
@@ -0,0 +1,237 @@
+from nmigen import *
+from .interfaces import DataStream, RegistersInterface
+from .operations import _incr
+from math import ceil, log2
+
+
+class FirFilter(Elaboratable):
+    """Pipelined FIR filter, one sample per cycle.
+
+    Samples are `width` bit two's complement integers on `input` and
+    `output`. `coefficients` are signed integers of `coefficient_w` bits.
+    The full precision sum is shifted right by `output_shift` (the fraction
+    bits to drop, truncating) and saturated to `output_w` bits.
+
+    The filter is polyphase when `decimation` or `interpolation` is above 1
+    (not both): each of the ceil(N / factor) multipliers goes through the
+    `factor` phases of its coefficients. A decimator accepts one sample per
+    cycle and sends every `decimation`-th output; an interpolator sends one
+    output per cycle and `interpolation` outputs per sample. `symmetric`
+    filters give the same product to both taps of every coefficient pair,
+    which halves the multipliers of single rate filters.
+
+    The filter is in transposed form: every sample goes to all the
+    multipliers, and each tap adds its product to the registered partial sum
+    of the next tap, so the sum moves along a chain that maps onto the
+    operand, product and cascaded accumulator registers of DSP blocks. The
+    latency does not depend on the number of taps, but the sample drives
+    every multiplier. `last` goes out with the output of the sample that
+    carried it, or with the next decimated output. The whole pipeline stalls
+    while the output is not accepted.
+
+    With `reload`, `register_map` is a register list for `AxiLiteDevice`
+    starting at `base_addr`: a 'pulse' control register (load on bit 0)
+    followed by one 'rw' register per coefficient, only the first half for
+    symmetric filters. The coefficients start with `coefficients` and take
+    the register values on load. `registers` has the same fields, so the
+    filter is hooked to a device with:
+
+        comb += device.registers.connect(fir.registers, include=fir.registers.fields)
+    """
+
+    def __init__(self, width, coefficients, coefficient_w=16, output_w=None, output_shift=0, symmetric=False,
+                 decimation=1, interpolation=1, reload=False, reg_addr_w=8, base_addr=0, name='fir',
+                 domain='sync'):
+        coefficients = list(coefficients)
+        assert decimation >= 1 and interpolation >= 1
+        assert decimation == 1 or interpolation == 1, 'rational resampling is not supported'
+        assert not symmetric or (coefficients == coefficients[::-1] and decimation == interpolation == 1)
+        assert all(-2**(coefficient_w - 1) <= c < 2**(coefficient_w - 1) for c in coefficients)
+        self.width = width
+        self.coefficients = coefficients
+        self.coefficient_w = coefficient_w
+        self.symmetric = symmetric
+        self.decimation = decimation
+        self.interpolation = interpolation
+        self.phases = max(decimation, interpolation)
+        self.domain = domain
+        self.name = name
+        n = len(coefficients)
+        self.multipliers = ceil(n / 2) if symmetric else ceil(n / self.phases)
+        self.full_w = width + coefficient_w + max(1, int(ceil(log2(n))))
+        self.output_w = self.full_w - output_shift if output_w is None else output_w
+        self.output_shift = output_shift
+        self.latency = 5
+        self.reload = reload
+        # coefficients kept in registers
+        self.stored = self.multipliers if symmetric else n
+        if reload:
+            assert coefficient_w <= 32
+            self.register_map = self.get_register_map(base_addr)
+            self.registers = RegistersInterface(reg_addr_w, 32, self.register_map, name=name)
+        self.input = DataStream(width, 'sink', name='input')
+        self.output = DataStream(self.output_w, 'source', name='output')
+
+    def get_register_map(self, base_addr):
+        registers = [(self.name + '_control', 'pulse', base_addr, [(self.name + '_load', 1, 0),]),]
+        for k in range(self.stored):
+            field = f'{self.name}_coefficient_{k}'
+            registers.append((field, 'rw', base_addr + 4 * (k + 1), [(field, self.coefficient_w, 0),]))
+        return registers
+
+    def get_ports(self):
+        ports = [self.input[f] for f in self.input.fields]
+        ports += [self.output[f] for f in self.output.fields]
+        if self.reload:
+            ports += [self.registers[f] for f in self.registers.fields]
+        return ports
+
+    def elaborate(self, platform):
+        m = Module()
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        n = len(self.coefficients)
+        phases = self.phases
+
+        # Coefficients
+        if self.reload:
+            coefficients = [Signal(signed(self.coefficient_w), name=f'coefficient_{k}', reset=c)
+                            for k, c in enumerate(self.coefficients[:self.stored])]
+            with m.If(getattr(self.registers, self.name + '_load')):
+                for k, c in enumerate(coefficients):
+                    sync += c.eq(getattr(self.registers, f'{self.name}_coefficient_{k}'))
+        else:
+            coefficients = [Const(c, signed(self.coefficient_w)) for c in self.coefficients[:self.stored]]
+        coefficients += [coefficients[n - 1 - k] for k in range(self.stored, n)]
+
+        # The pipeline moves when its output is free
+        ce = Signal()
+        comb += ce.eq(~self.output.valid | self.output.ready)
+
+        # Issue: one phase of the filter per cycle. A decimator counts the
+        # phase down with every sample and sends the output on phase 0, an
+        # interpolator counts it up while holding the sample.
+        phase = Signal(range(phases))
+        issue = Signal()
+        held_last = Signal()
+        if self.interpolation > 1:
+            comb += self.input.ready.eq(ce & (phase == 0))
+            comb += issue.eq((phase != 0) | self.input.valid)
+            with m.If(ce & issue):
+                sync += phase.eq(_incr(phase, phases))
+            with m.If(self.input.accepted()):
+                sync += held_last.eq(self.input.last)
+            slot_last = held_last & (phase == phases - 1)
+        else:
+            comb += self.input.ready.eq(ce)
+            comb += issue.eq(self.input.valid)
+            with m.If(self.input.accepted()):
+                sync += phase.eq(Mux(phase == 0, phases - 1, phase - 1))
+            slot_last = self.input.last
+
+        # Stage A: the sample, held by an interpolator for all its phases
+        sample = Signal(signed(self.width))
+        with m.If(self.input.accepted()):
+            sync += sample.eq(self.input.data)
+
+        valid_a, last_a = Signal(), Signal()
+        phase_a = Signal.like(phase)
+        with m.If(ce):
+            sync += [valid_a.eq(issue),
+                     last_a.eq(slot_last),
+                     phase_a.eq(phase),]
+
+        # Stage B: operand (A/B register of a DSP block)
+        operand = Signal(signed(self.width))
+        valid_b, last_b = Signal(), Signal()
+        phase_b = Signal.like(phase)
+        with m.If(ce):
+            sync += [operand.eq(sample),
+                     valid_b.eq(valid_a),
+                     last_b.eq(last_a),
+                     phase_b.eq(phase_a),]
+
+        # Stage C: products (M register), the sample goes to every multiplier
+        products = []
+        for j in range(self.multipliers):
+            taps = [coefficients[j * phases + p] if j * phases + p < n else Const(0, signed(self.coefficient_w))
+                    for p in range(phases)]
+            coefficient = taps[0] if phases == 1 else Array(taps)[phase_b]
+            product = Signal(signed(self.width + self.coefficient_w), name=f'product_{j}')
+            with m.If(ce):
+                sync += product.eq(operand * coefficient)
+            products.append(product)
+        valid_c, last_c = Signal(), Signal()
+        phase_c = Signal.like(phase)
+        with m.If(ce):
+            sync += [valid_c.eq(valid_b),
+                     last_c.eq(last_b),
+                     phase_c.eq(phase_b),]
+        step = ce & valid_c
+
+        # Stage D: transposed chain (P register and cascade of a DSP block),
+        # every tap adds its product to the partial sum of the next one
+        valid_d, last_d = Signal(), Signal()
+        if self.decimation > 1:
+            # Partial sum j belongs to the output j blocks ahead. The phases
+            # of a block accumulate in place, and the chain moves one tap
+            # with the last sample of the block, when output 0 is complete.
+            sums = [Signal(signed(self.full_w), name=f'sum_{j}') for j in range(self.multipliers)]
+            total = Signal(signed(self.full_w))
+            pending_last = Signal()
+            with m.If(step):
+                with m.If(phase_c == 0):
+                    sync += total.eq(sums[0] + products[0])
+                    for j, partial in enumerate(sums):
+                        if j + 1 < len(sums):
+                            sync += partial.eq(sums[j + 1] + products[j + 1])
+                        else:
+                            sync += partial.eq(0)
+                    sync += pending_last.eq(0)
+                with m.Else():
+                    for j, partial in enumerate(sums):
+                        sync += partial.eq(partial + products[j])
+                    sync += pending_last.eq(pending_last | last_c)
+            with m.If(ce):
+                sync += [valid_d.eq(valid_c & (phase_c == 0)),
+                         last_d.eq(pending_last | last_c),]
+        else:
+            # Partial sum j is taps j to N-1. An interpolator keeps the
+            # `interpolation` phases apart with as many registers per tap.
+            # Symmetric filters give the same product to both taps of a pair.
+            taps = n if self.symmetric else self.multipliers
+            sums = [Signal(signed(self.full_w), name=f'sum_{j}') for j in range(taps)]
+            for j, partial in enumerate(sums):
+                product = products[min(j, n - 1 - j)] if self.symmetric else products[j]
+                if j + 1 < taps:
+                    previous = sums[j + 1]
+                    for k in range(phases - 1):
+                        delayed = Signal.like(previous, name=f'sum_{j + 1}_delay_{k}')
+                        with m.If(step):
+                            sync += delayed.eq(previous)
+                        previous = delayed
+                    with m.If(step):
+                        sync += partial.eq(previous + product)
+                else:
+                    with m.If(step):
+                        sync += partial.eq(product)
+            total = sums[0]
+            with m.If(ce):
+                sync += [valid_d.eq(valid_c),
+                         last_d.eq(last_c),]
+        result_valid, result_last = valid_d, last_d
+
+        # Output precision
+        with m.If(ce):
+            sync += [self.output.valid.eq(result_valid),
+                     self.output.last.eq(result_last),
+                     self.output.data.eq(self.saturate(total >> self.output_shift)),]
+
+        return m
+
+    def saturate(self, value):
+        high, low = 2**(self.output_w - 1) - 1, -2**(self.output_w - 1)
+        if len(value) <= self.output_w:
+            return value
+        return Mux(value > high, high, Mux(value < low, low, value))
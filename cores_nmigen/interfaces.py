@@ -47,39 +47,66 @@ class DataStream(GenericStream):
         GenericStream.__init__(self, *args, **kargs)
 
 
+class KeepStream(GenericStream):
+    def __init__(self, width, lanes, *args, **kargs):
+        assert width % lanes == 0
+        self.lanes = lanes
+        self.lane_width = width // lanes
+        self.DATA_FIELDS = [('data', width), ('keep', lanes)]
+        GenericStream.__init__(self, *args, **kargs)
+
+
 class ShifterStream(GenericStream):
-    def __init__(self, width, *args, **kargs):
+    def __init__(self, width, *args, mode=False, **kargs):
         self.DATA_FIELDS = [('data', width), ('shift', ceil(log2(width+1)))]
+        if mode:
+            self.DATA_FIELDS += [('mode', 3)]
+        GenericStream.__init__(self, *args, **kargs)
+
+
+class AxiLiteCommandStream(GenericStream):
+    def __init__(self, addr_w, data_w, *args, **kargs):
+        self.DATA_FIELDS = [('addr', addr_w), ('data', data_w), ('strb', data_w//8), ('write', 1)]
+        GenericStream.__init__(self, *args, **kargs)
+
+
+class CordicStream(GenericStream):
+    def __init__(self, width, z_width=None, *args, **kargs):
+        self.DATA_FIELDS = [('x', width), ('y', width), ('z', width if z_width is None else z_width)]
         GenericStream.__init__(self, *args, **kargs)
 
 
 class AxiLite(Record):
+    _flip = {Direction.FANIN: Direction.FANOUT,
+             Direction.FANOUT: Direction.FANIN}
+
     def __init__(self, addr_w, data_w, mode=None, name=None, fields=None):
         # www.gstitt.ece.ufl.edu/courses/fall15/eel4720_5721/labs/refs/AXI4_specification.pdf#page=122
-        assert mode in ('slave',) #('slave', 'master')
+        assert mode in ('slave', 'master')
         assert data_w in (32, 64)
         self.addr_w = addr_w
         self.data_w = data_w
-        if mode == 'slave':
-            layout = [('AWADDR', addr_w, Direction.FANIN),
-                      ('AWVALID', 1, Direction.FANIN),
-                      ('AWREADY', 1, Direction.FANOUT),
-                      ('WDATA', data_w, Direction.FANIN),
-                      ('WSTRB', data_w//8, Direction.FANIN),
-                      ('WVALID', 1, Direction.FANIN),
-                      ('WREADY', 1, Direction.FANOUT),
-                      ('BRESP', 2, Direction.FANOUT),
-                      ('BVALID', 1, Direction.FANOUT),
-                      ('BREADY', 1, Direction.FANIN),
-                      ('ARADDR', addr_w, Direction.FANIN),
-                      ('ARVALID', 1, Direction.FANIN),
-                      ('ARREADY', 1, Direction.FANOUT),
-                      ('RDATA', data_w, Direction.FANOUT),
-                      ('RRESP', 2, Direction.FANOUT),
-                      ('RVALID', 1, Direction.FANOUT),
-                      ('RREADY', 1, Direction.FANIN),]
-        elif mode == 'master':
-            pass
+        # directions are given from the slave side. A master drives the
+        # same signals, so `master.connect(slave)` wires both ends.
+        layout = [('AWADDR', addr_w, Direction.FANIN),
+                  ('AWVALID', 1, Direction.FANIN),
+                  ('AWREADY', 1, Direction.FANOUT),
+                  ('WDATA', data_w, Direction.FANIN),
+                  ('WSTRB', data_w//8, Direction.FANIN),
+                  ('WVALID', 1, Direction.FANIN),
+                  ('WREADY', 1, Direction.FANOUT),
+                  ('BRESP', 2, Direction.FANOUT),
+                  ('BVALID', 1, Direction.FANOUT),
+                  ('BREADY', 1, Direction.FANIN),
+                  ('ARADDR', addr_w, Direction.FANIN),
+                  ('ARVALID', 1, Direction.FANIN),
+                  ('ARREADY', 1, Direction.FANOUT),
+                  ('RDATA', data_w, Direction.FANOUT),
+                  ('RRESP', 2, Direction.FANOUT),
+                  ('RVALID', 1, Direction.FANOUT),
+                  ('RREADY', 1, Direction.FANIN),]
+        if mode == 'master':
+            layout = [(f_name, f_size, self._flip[f_dir]) for f_name, f_size, f_dir in layout]
         Record.__init__(self, layout, name=name, fields=fields)
         self.awaddr = self.AWADDR
         self.awvalid = self.AWVALID
@@ -115,21 +142,100 @@ class AxiLite(Record):
         return (self.rvalid == 1) & (self.rready == 1)    
 
 
+class Axi4(Record):
+    _flip = {Direction.FANIN: Direction.FANOUT,
+             Direction.FANOUT: Direction.FANIN}
+
+    def __init__(self, addr_w, data_w, id_w=1, mode=None, name=None, fields=None):
+        # AXI4 full, without the optional LOCK, CACHE, PROT, QOS, REGION and
+        # USER signals. Directions are given from the slave side.
+        assert mode in ('slave', 'master')
+        assert data_w in (32, 64, 128, 256, 512, 1024)
+        self.addr_w = addr_w
+        self.data_w = data_w
+        self.id_w = id_w
+        layout = [('AWID', id_w, Direction.FANIN),
+                  ('AWADDR', addr_w, Direction.FANIN),
+                  ('AWLEN', 8, Direction.FANIN),
+                  ('AWSIZE', 3, Direction.FANIN),
+                  ('AWBURST', 2, Direction.FANIN),
+                  ('AWVALID', 1, Direction.FANIN),
+                  ('AWREADY', 1, Direction.FANOUT),
+                  ('WDATA', data_w, Direction.FANIN),
+                  ('WSTRB', data_w//8, Direction.FANIN),
+                  ('WLAST', 1, Direction.FANIN),
+                  ('WVALID', 1, Direction.FANIN),
+                  ('WREADY', 1, Direction.FANOUT),
+                  ('BID', id_w, Direction.FANOUT),
+                  ('BRESP', 2, Direction.FANOUT),
+                  ('BVALID', 1, Direction.FANOUT),
+                  ('BREADY', 1, Direction.FANIN),
+                  ('ARID', id_w, Direction.FANIN),
+                  ('ARADDR', addr_w, Direction.FANIN),
+                  ('ARLEN', 8, Direction.FANIN),
+                  ('ARSIZE', 3, Direction.FANIN),
+                  ('ARBURST', 2, Direction.FANIN),
+                  ('ARVALID', 1, Direction.FANIN),
+                  ('ARREADY', 1, Direction.FANOUT),
+                  ('RID', id_w, Direction.FANOUT),
+                  ('RDATA', data_w, Direction.FANOUT),
+                  ('RRESP', 2, Direction.FANOUT),
+                  ('RLAST', 1, Direction.FANOUT),
+                  ('RVALID', 1, Direction.FANOUT),
+                  ('RREADY', 1, Direction.FANIN),]
+        if mode == 'master':
+            layout = [(f_name, f_size, self._flip[f_dir]) for f_name, f_size, f_dir in layout]
+        Record.__init__(self, layout, name=name, fields=fields)
+        for f_name in self.fields:
+            setattr(self, f_name.lower(), self[f_name])
+
+    def aw_accepted(self):
+        return (self.awvalid == 1) & (self.awready == 1)
+
+    def w_accepted(self):
+        return (self.wvalid == 1) & (self.wready == 1)
+
+    def b_accepted(self):
+        return (self.bvalid == 1) & (self.bready == 1)
+
+    def ar_accepted(self):
+        return (self.arvalid == 1) & (self.arready == 1)
+
+    def r_accepted(self):
+        return (self.rvalid == 1) & (self.rready == 1)
+
+
 class RegistersInterface(Record):
     _dir = {'ro': Direction.FANIN,
-            'rw': Direction.FANOUT}
+            'rw': Direction.FANOUT,
+            'rws': Direction.FANOUT,
+            'pulse': Direction.FANOUT}
 
     def __init__(self, addr_w, data_w, registers, mode=None, name=None, fields=None):
         assert data_w in (32, 64)
-        assert max([reg[2] for reg in registers]) < 2**addr_w, 'Register with address 0x{:x} not reachable. Increase address width!'.format(max([reg[2] for reg in registers]))
+        last_addr = max([self.last_address(reg, data_w) for reg in registers])
+        assert last_addr < 2**addr_w, 'Register with address 0x{:x} not reachable. Increase address width!'.format(last_addr)
         self.addr_w = addr_w
         self.data_w = data_w
         self.registers = registers
         layout = []
         for r_name, r_dir, r_addr, r_fields in self.registers:
-            layout += [(f_name, f_size, self._dir[r_dir]) for f_name, f_size, f_offset in r_fields]
+            if r_dir == 'mem':
+                # memory blocks: r_fields is the number of words. The user
+                # logic gets a read port into the block.
+                layout += [(r_name + '_addr', range(r_fields), Direction.FANIN),
+                           (r_name + '_data', data_w, Direction.FANOUT)]
+            else:
+                layout += [(f_name, f_size, self._dir[r_dir]) for f_name, f_size, f_offset in r_fields]
         Record.__init__(self, layout, name=name, fields=fields)
 
+    @staticmethod
+    def last_address(register, data_w):
+        r_name, r_dir, r_addr, r_fields = register
+        if r_dir == 'mem':
+            return r_addr + r_fields * data_w // 8 - 1
+        return r_addr
+
 class MatrixStream(GenericStream):
 
     def __init__(self, width, shape, *args, **kwargs):
@@ -0,0 +1,123 @@
+from nmigen import *
+from .interfaces import DataStream, MatrixStream
+from .operations import _incr
+
+
+class LineBuffer(Elaboratable):
+    """Sliding window over a raster stream of pixels.
+
+    `input` carries one `width` bit pixel per beat in raster order, with
+    `line_w` pixels per line and `last` on the last pixel of the frame.
+    For each input pixel the `output` MatrixStream gives the `shape`
+    (rows, columns) window whose bottom right element is that pixel:
+    element (0, 0) is the oldest pixel of the window. `last` follows the
+    frame's last pixel.
+
+    The previous rows - 1 lines are kept in a Memory with one word per
+    column, holding the column's history. `border` sets what happens to
+    windows that reach out of the frame (the first rows - 1 lines and
+    columns - 1 pixels of each line):
+
+        'zero':  the pixels out of the frame are 0, every pixel gives a window
+        'valid': only windows fully inside the frame are sent
+
+    The output comes two cycles after the pixel, one pixel per cycle.
+    """
+
+    BORDERS = ('zero', 'valid')
+
+    def __init__(self, width, line_w, shape=(3, 3), border='zero', domain='sync'):
+        assert border in self.BORDERS, f'border must be one of {self.BORDERS}'
+        assert len(shape) == 2 and line_w >= 2
+        self.width = width
+        self.line_w = line_w
+        self.shape = tuple(shape)
+        self.border = border
+        self.domain = domain
+        self.input = DataStream(width, 'sink', name='input')
+        self.output = MatrixStream(width=width, shape=self.shape, direction='source', name='output')
+
+    def get_ports(self):
+        ports = [self.input[f] for f in self.input.fields]
+        ports += [self.output[f] for f in self.output.fields]
+        return ports
+
+    def elaborate(self, platform):
+        m = Module()
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        rows, columns = self.shape
+
+        # The pipeline moves when its output is free
+        ce = Signal()
+        comb += ce.eq(~self.output.valid | self.output.ready)
+        comb += self.input.ready.eq(ce)
+
+        # Position of the next input pixel, the line is saturated at rows - 1
+        x = Signal(range(self.line_w))
+        y = Signal(range(rows))
+        with m.If(self.input.accepted()):
+            sync += x.eq(_incr(x, self.line_w))
+            with m.If(self.input.last):
+                sync += [x.eq(0),
+                         y.eq(0),]
+            with m.Elif((x == self.line_w - 1) & (y != rows - 1)):
+                sync += y.eq(y + 1)
+
+        # Stage 1: the pixel and the history of its column
+        valid_1 = Signal()
+        last_1 = Signal()
+        pixel_1 = Signal(self.width)
+        x_1 = Signal.like(x)
+        y_1 = Signal.like(y)
+        with m.If(ce):
+            sync += [valid_1.eq(self.input.accepted()),
+                     last_1.eq(self.input.last),
+                     pixel_1.eq(self.input.data),
+                     x_1.eq(x),
+                     y_1.eq(y),]
+
+        if rows > 1:
+            mem = Memory(width=self.width * (rows - 1), depth=self.line_w)
+            m.submodules.rd_port = rd_port = mem.read_port(domain=self.domain, transparent=False)
+            m.submodules.wr_port = wr_port = mem.write_port(domain=self.domain)
+            comb += [rd_port.addr.eq(x),
+                     rd_port.en.eq(ce),]
+            # oldest line in the low bits
+            history = [rd_port.data[i*self.width:(i+1)*self.width] for i in range(rows - 1)]
+            comb += [wr_port.addr.eq(x_1),
+                     wr_port.data.eq(Cat(*history[1:], pixel_1)),
+                     wr_port.en.eq(ce & valid_1),]
+        else:
+            history = []
+
+        column = [Signal(self.width, name=f'column_{i}') for i in range(rows)]
+        for i, (c, pixel) in enumerate(zip(column, history + [pixel_1])):
+            # row i of the window is y - (rows - 1 - i)
+            comb += c.eq(Mux(y_1 >= rows - 1 - i, pixel, 0))
+
+        # Stage 2: the window, shifting one column per pixel
+        window = [[Signal(self.width, name=f'window_{i}_{j}') for j in range(columns)] for i in range(rows)]
+        valid_2 = Signal()
+        last_2 = Signal()
+        if self.border == 'valid':
+            inside = (y_1 == rows - 1) & (x_1 >= columns - 1)
+        else:
+            inside = 1
+        with m.If(ce):
+            sync += [valid_2.eq(valid_1 & inside),
+                     last_2.eq(last_1),]
+            with m.If(valid_1):
+                for i in range(rows):
+                    sync += window[i][-1].eq(column[i])
+                    for j in range(columns - 1):
+                        sync += window[i][j].eq(Mux(x_1 == 0, 0, window[i][j + 1]))
+
+        comb += [self.output.valid.eq(valid_2),
+                 self.output.last.eq(last_2),]
+        for i in range(rows):
+            for j in range(columns):
+                comb += self.output.matrix[(i, j)].eq(window[i][j])
+
+        return m
@@ -0,0 +1,145 @@
+from nmigen import *
+from .interfaces import MatrixStream
+from .reduction_tree import reduction_tree
+from math import ceil, log2
+
+
+class MatrixMultiplier(Elaboratable):
+    """Pipelined product of two MatrixStreams, one pair of matrices per cycle.
+
+    `input_a` is (M, K) or (K,) and `input_b` is (K, N) or (K,). The output
+    drops the dimensions the inputs do not have: matrix-matrix gives (M, N),
+    matrix-vector (M,), vector-matrix (N,) and vector-vector (1,).
+
+    Elements are `width` bit integers, two's complement when `signed`. Each
+    product has its own multiplier with registered inputs and output (the
+    DSP block A/B and M registers), followed by an adder tree with a
+    register per level. The full precision sum is shifted right by
+    `output_shift` (the fraction bits to drop, truncating) and saturated to
+    `output_w` bits. The latency is 3 + ceil(log2(K)) cycles. The whole
+    pipeline stalls while the output is not accepted.
+    """
+
+    def __init__(self, width, shape_a, shape_b, signed=True, output_w=None, output_shift=0, domain='sync'):
+        shape_a, shape_b = tuple(shape_a), tuple(shape_b)
+        assert len(shape_a) in (1, 2) and len(shape_b) in (1, 2)
+        self.k = shape_a[-1]
+        assert shape_b[0] == self.k, f'{shape_a} x {shape_b}: inner dimensions differ'
+        self.rows = shape_a[0] if len(shape_a) == 2 else 1
+        self.columns = shape_b[1] if len(shape_b) == 2 else 1
+        if len(shape_a) == 2 and len(shape_b) == 2:
+            self.shape_out = (self.rows, self.columns)
+        elif len(shape_a) == 2:
+            self.shape_out = (self.rows,)
+        elif len(shape_b) == 2:
+            self.shape_out = (self.columns,)
+        else:
+            self.shape_out = (1,)
+        self.width = width
+        self.shape_a = shape_a
+        self.shape_b = shape_b
+        self.signed = signed
+        self.full_w = 2 * width + int(ceil(log2(self.k)))
+        self.output_w = self.full_w - output_shift if output_w is None else output_w
+        self.output_shift = output_shift
+        self.domain = domain
+        self.latency = 3 + int(ceil(log2(self.k)))
+        self.input_a = MatrixStream(width=width, shape=shape_a, direction='sink', name='input_a')
+        self.input_b = MatrixStream(width=width, shape=shape_b, direction='sink', name='input_b')
+        self.output = MatrixStream(width=self.output_w, shape=self.shape_out, direction='source', name='output')
+
+    def get_ports(self):
+        ports = [self.input_a[f] for f in self.input_a.fields]
+        ports += [self.input_b[f] for f in self.input_b.fields]
+        ports += [self.output[f] for f in self.output.fields]
+        return ports
+
+    def element_a(self, row, k):
+        return self.input_a.matrix[(row, k) if len(self.shape_a) == 2 else (k,)]
+
+    def element_b(self, k, column):
+        return self.input_b.matrix[(k, column) if len(self.shape_b) == 2 else (k,)]
+
+    def element_out(self, row, column):
+        if len(self.shape_out) == 2:
+            return self.output.matrix[(row, column)]
+        if len(self.shape_a) == 2:
+            return self.output.matrix[(row,)]
+        return self.output.matrix[(column,)]
+
+    def elaborate(self, platform):
+        m = Module()
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        shape = signed if self.signed else unsigned
+
+        # The pipeline moves when its output is free
+        valid = Signal(self.latency)
+        last = Signal(self.latency)
+        ce = Signal()
+        comb += ce.eq(~valid[-1] | self.output.ready)
+
+        in_valid = self.input_a.valid & self.input_b.valid
+        comb += [self.input_a.ready.eq(ce & self.input_b.valid),
+                 self.input_b.ready.eq(ce & self.input_a.valid),]
+
+        with m.If(ce):
+            sync += valid.eq(Cat(in_valid, valid[:-1]))
+            sync += last.eq(Cat(self.input_a.last | self.input_b.last, last[:-1]))
+        comb += [self.output.valid.eq(valid[-1]),
+                 self.output.last.eq(last[-1]),]
+
+        # Input registers
+        a = [[Signal(shape(self.width), name=f'a_{i}_{k}') for k in range(self.k)] for i in range(self.rows)]
+        b = [[Signal(shape(self.width), name=f'b_{k}_{j}') for j in range(self.columns)] for k in range(self.k)]
+        with m.If(ce):
+            for i in range(self.rows):
+                for k in range(self.k):
+                    sync += a[i][k].eq(self.element_a(i, k))
+            for k in range(self.k):
+                for j in range(self.columns):
+                    sync += b[k][j].eq(self.element_b(k, j))
+
+        for i in range(self.rows):
+            for j in range(self.columns):
+                # Multipliers
+                products = []
+                for k in range(self.k):
+                    product = Signal(shape(2 * self.width), name=f'p_{i}_{j}_{k}')
+                    with m.If(ce):
+                        sync += product.eq(a[i][k] * b[k][j])
+                    products.append(product)
+
+                total = self.adder_tree(m, products, ce, f'{i}_{j}')
+
+                # Output precision
+                out = Signal(self.output_w, name=f'out_{i}_{j}')
+                with m.If(ce):
+                    sync += out.eq(self.saturate(total >> self.output_shift))
+                comb += self.element_out(i, j).eq(out)
+
+        return m
+
+    def adder_tree(self, m, values, ce, name):
+        # one register per level, the odd element passes to the next level
+        if len(values) == 1:
+            return values[0]
+        return reduction_tree(m, values, 'add', self.signed, 1, ce, self.domain, name=f'sum_{name}')
+
+    def saturate(self, value):
+        if self.signed:
+            high, low = 2**(self.output_w - 1) - 1, -2**(self.output_w - 1)
+        else:
+            high, low = 2**self.output_w - 1, 0
+        if len(value) <= self.output_w:
+            return value
+        return Mux(value > high, high, Mux(value < low, low, value))
+
+
+class DotProduct(MatrixMultiplier):
+    """Dot product of two vectors of `n` elements. The result is the
+    single element of the (1,) output matrix."""
+
+    def __init__(self, width, n, signed=True, output_w=None, output_shift=0, domain='sync'):
+        MatrixMultiplier.__init__(self, width, (n,), (n,), signed, output_w, output_shift, domain)
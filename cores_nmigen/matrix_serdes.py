@@ -0,0 +1,94 @@
+from nmigen import *
+from .interfaces import MatrixStream, DataStream
+from .width_converter import WidthConverterDown, WidthConverterUp
+import cores_nmigen.utils.matrix as mat
+from math import ceil
+
+
+class MatrixSerializer(Elaboratable):
+    """Streams a matrix per beat out as `lanes` elements per beat.
+
+    Elements are sent in `order` ('row' or 'column' major), the first one
+    in the low bits of the first beat. When `lanes` does not divide the
+    number of elements, the last beat of each matrix is padded with zeros.
+    `last` of a matrix goes out on its last beat.
+    """
+
+    def __init__(self, width, shape, lanes=1, order='row', domain='sync'):
+        self.width = width
+        self.shape = shape
+        self.lanes = lanes
+        self.order = order
+        self.domain = domain
+        self.input = MatrixStream(width=width, shape=shape, direction='sink', name='input')
+        assert 1 <= lanes <= self.input.n_elements
+        self.n_beats = int(ceil(self.input.n_elements / lanes))
+        self.output = DataStream(width * lanes, 'source', name='output')
+
+    def get_ports(self):
+        ports = [self.input[f] for f in self.input.fields]
+        ports += [self.output[f] for f in self.output.fields]
+        return ports
+
+    def elaborate(self, platform):
+        m = Module()
+        comb = m.d.comb
+
+        m.submodules.converter = converter = WidthConverterDown(self.width * self.lanes * self.n_beats,
+                                                                self.width * self.lanes, self.domain)
+
+        elements = [self.input.matrix[idx] for idx in mat.matrix_indexes(self.shape, self.order)]
+        comb += [converter.input.data.eq(Cat(*elements)),
+                 converter.input.valid.eq(self.input.valid),
+                 converter.input.last.eq(self.input.last),
+                 self.input.ready.eq(converter.input.ready),]
+        comb += [self.output.valid.eq(converter.output.valid),
+                 self.output.data.eq(converter.output.data),
+                 self.output.last.eq(converter.output.last),
+                 converter.output.ready.eq(self.output.ready),]
+
+        return m
+
+
+class MatrixDeserializer(Elaboratable):
+    """Collects beats of `lanes` elements back into a matrix per beat.
+
+    The inverse of MatrixSerializer with the same parameters. A matrix is
+    complete after its last beat; `last` of that beat goes to the matrix.
+    An early `last` closes the matrix and the missing elements are zero.
+    """
+
+    def __init__(self, width, shape, lanes=1, order='row', domain='sync'):
+        self.width = width
+        self.shape = shape
+        self.lanes = lanes
+        self.order = order
+        self.domain = domain
+        self.output = MatrixStream(width=width, shape=shape, direction='source', name='output')
+        assert 1 <= lanes <= self.output.n_elements
+        self.n_beats = int(ceil(self.output.n_elements / lanes))
+        self.input = DataStream(width * lanes, 'sink', name='input')
+
+    def get_ports(self):
+        ports = [self.input[f] for f in self.input.fields]
+        ports += [self.output[f] for f in self.output.fields]
+        return ports
+
+    def elaborate(self, platform):
+        m = Module()
+        comb = m.d.comb
+
+        m.submodules.converter = converter = WidthConverterUp(self.width * self.lanes,
+                                                              self.width * self.lanes * self.n_beats,
+                                                              self.domain)
+
+        comb += converter.input.connect(self.input)
+
+        data = converter.output.data
+        for i, idx in enumerate(mat.matrix_indexes(self.shape, self.order)):
+            comb += self.output.matrix[idx].eq(data[i*self.width:(i+1)*self.width])
+        comb += [self.output.valid.eq(converter.output.valid),
+                 self.output.last.eq(converter.output.last),
+                 converter.output.ready.eq(self.output.ready),]
+
+        return m
@@ -6,9 +6,34 @@ def _incr(signal, modulo):
     else:
         return Mux(signal == modulo - 1, 0, signal + 1)
 
+def _tree(values, operator, empty=None):
+    """Balanced tree of `operator` over `values`, ceil(log2(n)) levels deep.
+    `empty` is the result when there are no values.
+    `reduction_tree.reduction_tree` is the pipelined version."""
+    level = list(values)
+    if not level:
+        assert empty is not None, '_tree needs values or an empty result'
+        return empty
+    while len(level) > 1:
+        level = [operator(level[i], level[i+1]) if i + 1 < len(level) else level[i]
+                 for i in range(0, len(level), 2)]
+    return level[0]
+
+
 def _and(signals):
     return Mux(Cat(*signals) == 2**len(signals)-1, 1, 0)
 
 
 def _or(signals):
-    return Mux(Cat(*signals) != 0, 1, 0)
\ No newline at end of file
+    return Mux(Cat(*signals) != 0, 1, 0)
+
+
+def _mux_tree(values, select):
+    """Balanced mux tree: level `i` of the tree is driven by `select[i]`."""
+    level = list(values)
+    bit = 0
+    while len(level) > 1:
+        level = [Mux(select[bit], level[i+1], level[i]) if i + 1 < len(level) else level[i]
+                 for i in range(0, len(level), 2)]
+        bit += 1
+    return level[0]
@@ -0,0 +1,144 @@
+from nmigen import *
+from .interfaces import MatrixStream, DataStream
+import cores_nmigen.utils.matrix as mat
+from math import ceil, log2
+
+
+OPERATORS = ('and', 'or', 'xor', 'add', 'min', 'max', 'argmin', 'argmax')
+
+
+def tree_latency(n, register_every=1):
+    """Register stages of a reduction tree of `n` values."""
+    levels = int(ceil(log2(n))) if n > 1 else 0
+    return max(1, int(ceil(levels / register_every)))
+
+
+def reduction_tree(m, values, operator, signed=False, register_every=1, ce=1, domain='sync', name='tree'):
+    """Balanced tree reducing `values` with `operator`, with a register stage
+    every `register_every` levels and on the result. The registers move while
+    `ce` is set; the result comes `tree_latency(len(values), register_every)`
+    cycles after the values.
+
+    'add' grows one bit per level, the others keep the width of the values.
+    'min' and 'max' compare as two's complement when `signed`. 'argmin' and
+    'argmax' return Cat(index, value) of the first minimum or maximum.
+    """
+    assert operator in OPERATORS, f'operator must be one of {OPERATORS}'
+    arg = operator.startswith('arg')
+    signed_values = signed and operator not in ('and', 'or', 'xor')
+    shape = lambda width: Shape(width, signed_values)
+    index_w = max(1, int(ceil(log2(len(values)))))
+
+    def node(width, expr, registered, label):
+        s = Signal(shape(width), name=f'{name}_{label}')
+        if registered:
+            with m.If(ce):
+                m.d[domain] += s.eq(expr)
+        else:
+            m.d.comb += s.eq(expr)
+        return s
+
+    def take_second(a, b):
+        # on ties the lower index wins
+        if operator in ('min', 'argmin'):
+            return b < a
+        return b > a
+
+    items = []
+    for i, value in enumerate(values):
+        v = Signal(shape(len(value)), name=f'{name}_in_{i}')
+        m.d.comb += v.eq(value)
+        items.append((v, Const(i, index_w)))
+
+    levels = int(ceil(log2(len(values)))) if len(values) > 1 else 0
+    for level in range(max(1, levels)):
+        registered = (level + 1) % register_every == 0 or level == max(1, levels) - 1
+        reduced = []
+        for n in range(0, len(items), 2):
+            label = f'{level}_{n // 2}'
+            if n + 1 == len(items):
+                # the odd item passes to the next level
+                value, index = items[n]
+                reduced.append((node(len(value), value, registered, label),
+                                node(index_w, index, registered, f'{label}_index') if arg else None))
+                continue
+            (a, a_index), (b, b_index) = items[n], items[n + 1]
+            width = max(len(a), len(b))
+            if operator == 'add':
+                reduced.append((node(width + 1, a + b, registered, label), None))
+            elif operator == 'and':
+                reduced.append((node(width, a & b, registered, label), None))
+            elif operator == 'or':
+                reduced.append((node(width, a | b, registered, label), None))
+            elif operator == 'xor':
+                reduced.append((node(width, a ^ b, registered, label), None))
+            else:
+                take_b = take_second(a, b)
+                reduced.append((node(width, Mux(take_b, b, a), registered, label),
+                                node(index_w, Mux(take_b, b_index, a_index), registered, f'{label}_index')
+                                if arg else None))
+        items = reduced
+
+    value, index = items[0]
+    return Cat(index, value) if arg else value
+
+
+class ReductionTree(Elaboratable):
+    """Reduces all the elements of a MatrixStream with an associative
+    `operator`, one matrix per cycle.
+
+    The `output` DataStream carries the result: `width` bits for 'and', 'or',
+    'xor', 'min' and 'max', `width` + ceil(log2(n)) bits for 'add' and
+    Cat(index, value) for 'argmin' and 'argmax', the index being the
+    position of the element in row major order. A register stage follows
+    every `register_every` levels of the tree and the last one. The whole
+    pipeline stalls while the output is not accepted.
+    """
+
+    def __init__(self, width, shape, operator='add', signed=False, register_every=1, domain='sync'):
+        assert operator in OPERATORS, f'operator must be one of {OPERATORS}'
+        assert register_every >= 1
+        self.width = width
+        self.shape = shape
+        self.operator = operator
+        self.signed = signed
+        self.register_every = register_every
+        self.domain = domain
+        n = mat.get_n_elements(shape)
+        self.latency = tree_latency(n, register_every)
+        if operator == 'add':
+            self.output_w = width + int(ceil(log2(n)))
+        elif operator.startswith('arg'):
+            self.output_w = width + max(1, int(ceil(log2(n))))
+        else:
+            self.output_w = width
+        self.input = MatrixStream(width=width, shape=shape, direction='sink', name='input')
+        self.output = DataStream(self.output_w, 'source', name='output')
+
+    def get_ports(self):
+        ports = [self.input[f] for f in self.input.fields]
+        ports += [self.output[f] for f in self.output.fields]
+        return ports
+
+    def elaborate(self, platform):
+        m = Module()
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        # The pipeline moves when its output is free
+        valid = Signal(self.latency)
+        last = Signal(self.latency)
+        ce = Signal()
+        comb += ce.eq(~valid[-1] | self.output.ready)
+        comb += self.input.ready.eq(ce)
+        with m.If(ce):
+            sync += valid.eq(Cat(self.input.valid, valid[:-1]))
+            sync += last.eq(Cat(self.input.last, last[:-1]))
+
+        result = reduction_tree(m, list(self.input.data_ports), self.operator, self.signed,
+                                self.register_every, ce, self.domain)
+        comb += [self.output.valid.eq(valid[-1]),
+                 self.output.data.eq(result),
+                 self.output.last.eq(last[-1]),]
+
+        return m
@@ -1,33 +1,106 @@
 from nmigen import *
 from nmigen_cocotb import main
 from .interfaces import ShifterStream
+from .skid_buffer import SkidBuffer
 from math import ceil, log2
 
+# Values of the `mode` field of ShifterStream(mode=True):
+#   bit 0: shift to the right, bit 1: shift instead of rotate,
+#   bit 2: arithmetic (sign filled) right shift.
+ROTATE_LEFT = 0b000
+ROTATE_RIGHT = 0b001
+SHIFT_LEFT = 0b010
+SHIFT_RIGHT = 0b011
+SHIFT_RIGHT_ARITH = 0b111
+
 def fixed_shift(data, shift):
     return Cat(data[-shift::], data[0:-shift:])
 
+def fixed_shift_fill(data, shift, fill):
+    return Cat(Repl(fill, shift), data[0:-shift:])
+
 class StagePipelinedBarrelShifter(Elaboratable):
-    def __init__(self, width, shift):
+    """One registered stage covering the shift amounts in `shifts`.
+
+    In mode-aware shifters right shifts are done as left shifts of the
+    bit-reversed data: the first stage reverses the data on the way in and
+    the last one on the way out. Arithmetic fill is taken from bit 0, which
+    holds the sign bit while the data is reversed.
+    """
+    def __init__(self, width, shifts, skid_buffer=False, mode=False, first=False, last=False):
         self.width = width
-        self.shift = shift
-        self.input = ShifterStream(width, 'sink')
-        self.output = ShifterStream(width, 'source')
+        self.shifts = shifts
+        self.skid_buffer = skid_buffer
+        self.mode = mode
+        self.first = first
+        self.last = last
+        self.input = ShifterStream(width, 'sink', mode=mode)
+        self.output = ShifterStream(width, 'source', mode=mode)
+
+    def shift_data(self, m):
+        comb = m.d.comb
+
+        data = self.input.data
+        if self.mode:
+            right = self.input.mode[0]
+            is_shift = self.input.mode[1]
+            arith = self.input.mode[2] & right
+            if self.first:
+                data = Mux(right, data[::-1], data)
+
+        for shift in self.shifts:
+            shifted = Signal(self.width)
+            with m.If(self.input.shift & shift):
+                if self.mode:
+                    with m.If(is_shift):
+                        comb += shifted.eq(fixed_shift_fill(data, shift, arith & data[0]))
+                    with m.Else():
+                        comb += shifted.eq(fixed_shift(data, shift))
+                else:
+                    comb += shifted.eq(fixed_shift(data, shift))
+            with m.Else():
+                comb += shifted.eq(data)
+            data = shifted
+
+        if self.mode and self.last:
+            # shift amounts not covered by any stage move every bit out
+            overflow = self.input.shift >> (max(self.shifts).bit_length())
+            data = Mux(is_shift & (overflow != 0), Repl(arith & data[0], self.width), data)
+            data = Mux(right, data[::-1], data)
+
+        return data
+
     def elaborate(self, platform):
         m = Module()
         sync = m.d.sync
         comb = m.d.comb
 
+        data = self.shift_data(m)
+
+        if self.skid_buffer:
+            shifted = ShifterStream(self.width, 'sink', mode=self.mode)
+            m.submodules.skid_buffer = SkidBuffer(shifted, self.output)
+            comb += shifted.valid.eq(self.input.valid)
+            comb += self.input.ready.eq(shifted.ready)
+            comb += shifted.data.eq(data)
+            comb += shifted.shift.eq(self.input.shift)
+            if self.mode:
+                comb += shifted.mode.eq(self.input.mode)
+            comb += shifted.last.eq(self.input.last)
+            return m
+
         with m.If(self.input.accepted()):
             sync += self.output.valid.eq(1)
-            with m.If(self.input.shift & self.shift):
-                sync += self.output.data.eq(fixed_shift(self.input.data, self.shift))
-            with m.Else():
-                sync += self.output.data.eq(self.input.data)
+            sync += self.output.data.eq(data)
             sync += self.output.shift.eq(self.input.shift)
+            if self.mode:
+                sync += self.output.mode.eq(self.input.mode)
             sync += self.output.last.eq(self.input.last)
         with m.Elif(self.output.accepted()):
             sync += self.output.data.eq(0)
             sync += self.output.shift.eq(0)
+            if self.mode:
+                sync += self.output.mode.eq(0)
             sync += self.output.valid.eq(0)
             sync += self.output.last.eq(0)
         with m.If((self.output.valid == 0) | self.output.accepted()):
@@ -38,16 +111,33 @@ class StagePipelinedBarrelShifter(Elaboratable):
 
         
 class PipelinedBarrelShifter(Elaboratable):
-    def __init__(self, width):
+    """Barrel shifter with a register every `levels_per_stage` mux levels.
+
+    Without `mode` it rotates left by `shift`. With `mode=True` the input
+    stream gets a `mode` field selecting, per beat, one of ROTATE_LEFT,
+    ROTATE_RIGHT, SHIFT_LEFT, SHIFT_RIGHT or SHIFT_RIGHT_ARITH.
+    """
+    def __init__(self, width, skid_buffer=False, levels_per_stage=1, mode=False):
+        assert levels_per_stage >= 1
         self.width = width
-        self.input = ShifterStream(width, 'sink', name='input')
-        self.output = ShifterStream(width, 'source', name='output')
-        self.stages = ceil(log2(self.width))
+        self.skid_buffer = skid_buffer
+        self.mode = mode
+        self.input = ShifterStream(width, 'sink', name='input', mode=mode)
+        self.output = ShifterStream(width, 'source', name='output', mode=mode)
+        self.levels = max(ceil(log2(self.width)), 1)
+        self.levels_per_stage = levels_per_stage
+        self.stages = ceil(self.levels / levels_per_stage)
 
     def elaborate(self, platform):
         m = Module()
         comb = m.d.comb
-        modules = [StagePipelinedBarrelShifter(self.width, 2**i)
+        shifts = [2**i for i in range(self.levels)]
+        modules = [StagePipelinedBarrelShifter(self.width,
+                                               shifts[i*self.levels_per_stage:(i+1)*self.levels_per_stage],
+                                               self.skid_buffer,
+                                               self.mode,
+                                               first=(i == 0),
+                                               last=(i == self.stages - 1))
                    for i in range(self.stages)]
         for i, stage in enumerate(modules):
             m.submodules['stage_' + str(i)] = stage
@@ -0,0 +1,68 @@
+from nmigen import *
+
+
+class SkidBuffer(Elaboratable):
+    """Register slice for any GenericStream.
+
+    `input.ready` always comes straight from a register, so the ready path
+    is cut. By default `output.valid` and the output data are registered
+    too, and no combinational path crosses the slice in either direction.
+    The extra skid register catches the beat that arrives in the cycle the
+    output stalls, which keeps the throughput at one beat per cycle.
+
+    With `registered=False` the data passes straight through while the
+    skid register is empty. Only the ready path is cut, and no latency is
+    added.
+    """
+
+    def __init__(self, input_stream, output_stream, domain='sync', registered=True):
+        assert input_stream._total_width == output_stream._total_width
+        self.input = input_stream
+        self.output = output_stream
+        self.domain = domain
+        self.registered = registered
+
+    def elaborate(self, platform):
+        m = Module()
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        width = self.input._total_width
+        skid_valid = Signal()
+        skid_data = Signal(width)
+
+        comb += self.input.ready.eq(~skid_valid)
+
+        if not self.registered:
+            comb += self.output.valid.eq(skid_valid | self.input.valid)
+            with m.If(skid_valid):
+                comb += self.output.eq_from_flat(skid_data)
+            with m.Else():
+                comb += self.output.eq_from_flat(self.input._flat_data)
+
+            with m.If(self.output.ready):
+                sync += skid_valid.eq(0)
+            with m.Elif(self.input.accepted()):
+                sync += skid_data.eq(self.input._flat_data)
+                sync += skid_valid.eq(1)
+            return m
+
+        out_valid = Signal()
+        out_data = Signal(width)
+
+        comb += self.output.valid.eq(out_valid)
+        comb += self.output.eq_from_flat(out_data)
+
+        with m.If(~out_valid | self.output.ready):
+            with m.If(skid_valid):
+                sync += out_data.eq(skid_data)
+                sync += out_valid.eq(1)
+                sync += skid_valid.eq(0)
+            with m.Else():
+                sync += out_data.eq(self.input._flat_data)
+                sync += out_valid.eq(self.input.valid)
+        with m.Elif(self.input.accepted()):
+            sync += skid_data.eq(self.input._flat_data)
+            sync += skid_valid.eq(1)
+
+        return m
@@ -0,0 +1,100 @@
+from nmigen import *
+from .interfaces import RegistersInterface
+from math import ceil
+
+
+class StreamMonitor(Elaboratable):
+    """Performance counters for any GenericStream.
+
+    The monitor only taps `valid`, `ready` and `last` of the stream. It
+    counts cycles, accepted beats, packets, stall cycles (valid & ~ready),
+    starvation cycles (~valid & ready) and keeps the maximum packet length.
+
+    The counters run all the time. A `snapshot` pulse copies them to the
+    registers that are read, so multi-word counters are read consistently,
+    and a `clear` pulse restarts them. Both in the same cycle snapshot the
+    last interval and start a new one.
+
+    `register_map` is a register list for `AxiLiteDevice` starting at
+    `base_addr`: a 'pulse' control register (snapshot on bit 0, clear on
+    bit 1) followed by the 'ro' counters, `ceil(counter_w / data_w)` words
+    each. `registers` has the same fields, so the monitor is hooked to a
+    device with:
+
+        comb += device.registers.connect(monitor.registers,
+                                         include=monitor.registers.fields)
+    """
+    COUNTERS = ('cycles', 'beats', 'packets', 'stalls', 'starves', 'max_packet')
+
+    def __init__(self, stream, addr_w, data_w=32, base_addr=0, counter_w=32, name='monitor', domain='sync'):
+        self.stream = stream
+        self.data_w = data_w
+        self.counter_w = counter_w
+        self.name = name
+        self.domain = domain
+        self.register_map = self.get_register_map(base_addr)
+        self.registers = RegistersInterface(addr_w, data_w, self.register_map, name=name)
+        self.snapshot = getattr(self.registers, name + '_snapshot')
+        self.clear = getattr(self.registers, name + '_clear')
+
+    def get_register_map(self, base_addr):
+        word_bytes = self.data_w // 8
+        words = ceil(self.counter_w / self.data_w)
+        registers = [(self.name + '_control', 'pulse', base_addr, [(self.name + '_snapshot', 1, 0),
+                                                                   (self.name + '_clear', 1, 1),])]
+        addr = base_addr + word_bytes
+        for counter in self.COUNTERS:
+            for i in range(words):
+                size = min(self.data_w, self.counter_w - i * self.data_w)
+                r_name = self.field_name(counter, i)
+                registers.append((r_name, 'ro', addr, [(r_name, size, 0),]))
+                addr += word_bytes
+        return registers
+
+    def field_name(self, counter, word):
+        if self.counter_w <= self.data_w:
+            return f'{self.name}_{counter}'
+        return f'{self.name}_{counter}_{word}'
+
+    def elaborate(self, platform):
+        m = Module()
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        live = {counter: Signal(self.counter_w, name='live_' + counter) for counter in self.COUNTERS}
+        snap = {counter: Signal(self.counter_w, name='snap_' + counter) for counter in self.COUNTERS}
+        packet_len = Signal(self.counter_w)
+
+        valid, ready = self.stream.valid, self.stream.ready
+        beat = valid & ready
+        last = self.stream.last if 'last' in self.stream.fields else Const(0)
+
+        with m.If(self.snapshot):
+            sync += [snap[counter].eq(live[counter]) for counter in self.COUNTERS]
+
+        with m.If(self.clear):
+            sync += [live[counter].eq(0) for counter in self.COUNTERS]
+            sync += packet_len.eq(0)
+        with m.Else():
+            sync += live['cycles'].eq(live['cycles'] + 1)
+            with m.If(beat):
+                sync += live['beats'].eq(live['beats'] + 1)
+                with m.If(last):
+                    sync += live['packets'].eq(live['packets'] + 1)
+                    sync += packet_len.eq(0)
+                    with m.If(packet_len + 1 > live['max_packet']):
+                        sync += live['max_packet'].eq(packet_len + 1)
+                with m.Else():
+                    sync += packet_len.eq(packet_len + 1)
+            with m.If(valid & ~ready):
+                sync += live['stalls'].eq(live['stalls'] + 1)
+            with m.If(~valid & ready):
+                sync += live['starves'].eq(live['starves'] + 1)
+
+        words = ceil(self.counter_w / self.data_w)
+        for counter in self.COUNTERS:
+            for i in range(words):
+                field = getattr(self.registers, self.field_name(counter, i))
+                comb += field.eq(snap[counter][i*self.data_w:(i+1)*self.data_w])
+
+        return m
@@ -85,6 +85,25 @@ class DataStreamDriver(StreamDriver):
         return random.randint(0, 2**len(self.bus.data)-1)
 
 
+class KeepStreamDriver(StreamDriver):
+
+    _signals =['valid', 'ready', 'last', 'data', 'keep']
+
+    def write(self, data):
+        self.bus.data <= data[0]
+        self.bus.keep <= data[1]
+
+    def read(self):
+        data = self.bus.data.value.integer
+        keep = self.bus.keep.value.integer
+        return data, keep
+
+    def _get_random_data(self):
+        data = random.randint(0, 2**len(self.bus.data)-1)
+        keep = random.randint(0, 2**len(self.bus.keep)-1)
+        return data, keep
+
+
 class ShifterStreamDriver(StreamDriver):
 
     _signals =['valid', 'ready', 'last', 'data', 'shift']
@@ -104,6 +123,28 @@ class ShifterStreamDriver(StreamDriver):
         return data, shift
 
 
+class ShifterModeStreamDriver(StreamDriver):
+
+    _signals =['valid', 'ready', 'last', 'data', 'shift', 'mode']
+
+    def write(self, data):
+        self.bus.data <= data[0]
+        self.bus.shift <= data[1]
+        self.bus.mode <= data[2]
+
+    def read(self):
+        data = self.bus.data.value.integer
+        shift = self.bus.shift.value.integer
+        mode = self.bus.mode.value.integer
+        return data, shift, mode
+
+    def _get_random_data(self):
+        data = random.randint(0, 2**len(self.bus.data)-1)
+        shift = random.randint(0, 2**len(self.bus.shift)-1)
+        mode = random.randint(0, 2**len(self.bus.mode)-1)
+        return data, shift, mode
+
+
 class AxiLiteDriver(BusDriver):
 
     _signals =['AWADDR', 'AWVALID', 'AWREADY',
@@ -117,6 +158,7 @@ class AxiLiteDriver(BusDriver):
         self.clk = clock
         self.registers = {}
         self.transactions = []
+        self.resp = None
 
     def init_zero(self):
         self.bus.AWADDR <= 0
@@ -146,7 +188,9 @@ class AxiLiteDriver(BusDriver):
 
 
     @cocotb.coroutine
-    def write_reg(self, addr, value):
+    def write_reg(self, addr, value, strb=None):
+        if strb is None:
+            strb = 2**len(self.bus.WSTRB) - 1
         self.bus.AWADDR <= addr
         self.bus.AWVALID <= 1
         yield RisingEdge(self.clk)
@@ -154,6 +198,7 @@ class AxiLiteDriver(BusDriver):
             yield RisingEdge(self.clk)
         self.bus.AWVALID <= 0
         self.bus.WDATA <= value
+        self.bus.WSTRB <= strb
         self.bus.WVALID <= 1
         yield RisingEdge(self.clk)
         while not self.w_accepted():
@@ -162,6 +207,7 @@ class AxiLiteDriver(BusDriver):
         self.bus.BREADY <= 1
         while not self.b_accepted():
             yield RisingEdge(self.clk)
+        self.resp = self.bus.BRESP.value.integer
         self.bus.BREADY <= 0
         yield RisingEdge(self.clk)
 
@@ -179,9 +225,39 @@ class AxiLiteDriver(BusDriver):
             yield RisingEdge(self.clk)
         self.bus.RREADY <= 0
         rd = self.rdata
+        self.resp = self.bus.RRESP.value.integer
         yield RisingEdge(self.clk)
         return rd
 
+    @cocotb.coroutine
+    def send_read_addresses(self, addrs):
+        addrs = list(addrs)
+        self.bus.ARVALID <= 1
+        while len(addrs):
+            self.bus.ARADDR <= addrs[0]
+            yield RisingEdge(self.clk)
+            if self.ar_accepted():
+                addrs.pop(0)
+        self.bus.ARVALID <= 0
+
+    @cocotb.coroutine
+    def read_regs(self, addrs):
+        """Back-to-back reads: ARVALID and RREADY are held high until all
+        the data has been received. Returns the data and the number of
+        cycles it took."""
+        n = len(addrs)
+        rd = []
+        cycles = 0
+        cocotb.fork(self.send_read_addresses(addrs))
+        self.bus.RREADY <= 1
+        while len(rd) < n:
+            yield RisingEdge(self.clk)
+            cycles += 1
+            if self.r_accepted():
+                rd.append(self.rdata)
+        self.bus.RREADY <= 0
+        return rd, cycles
+
     @cocotb.coroutine
     def monitor(self):
         while True:
@@ -225,8 +301,9 @@ class MatrixStreamDriver(StreamDriver):
 
     def __init__(self, entity, name, clock, shape):
         self.shape = shape
-        for idx in mat.matrix_indexes(self.shape):
-            self._signals.append(self.get_element_name(idx))
+        # per instance copy: drivers of different shapes must not share it
+        self._signals = MatrixStreamDriver._signals + [self.get_element_name(idx)
+                                                        for idx in mat.matrix_indexes(self.shape)]
         BusDriver.__init__(self, entity, name, clock)
         self.clk = clock
         self.buffer = []
@@ -269,4 +346,162 @@ class MatrixStreamDriver(StreamDriver):
 
     @property
     def first_idx(self):
-        return tuple([0] * len(self.shape))
\ No newline at end of file
+        return tuple([0] * len(self.shape))
+
+
+class AxiLiteCommandStreamDriver(StreamDriver):
+
+    _signals =['valid', 'ready', 'last', 'addr', 'data', 'strb', 'write']
+
+    def write(self, data):
+        self.bus.addr <= data[0]
+        self.bus.data <= data[1]
+        self.bus.strb <= data[2]
+        self.bus.write <= data[3]
+
+    def read(self):
+        addr = self.bus.addr.value.integer
+        data = self.bus.data.value.integer
+        strb = self.bus.strb.value.integer
+        write = self.bus.write.value.integer
+        return addr, data, strb, write
+
+    def _get_random_data(self):
+        addr = random.randint(0, 2**len(self.bus.addr)-1)
+        data = random.randint(0, 2**len(self.bus.data)-1)
+        strb = random.randint(0, 2**len(self.bus.strb)-1)
+        write = random.randint(0, 1)
+        return addr, data, strb, write
+
+
+class CordicStreamDriver(StreamDriver):
+
+    _signals =['valid', 'ready', 'last', 'x', 'y', 'z']
+
+    def write(self, data):
+        self.bus.x <= data[0]
+        self.bus.y <= data[1]
+        self.bus.z <= data[2]
+
+    def read(self):
+        x = self.bus.x.value.integer
+        y = self.bus.y.value.integer
+        z = self.bus.z.value.integer
+        return x, y, z
+
+    def _get_random_data(self):
+        x = random.randint(0, 2**len(self.bus.x)-1)
+        y = random.randint(0, 2**len(self.bus.y)-1)
+        z = random.randint(0, 2**len(self.bus.z)-1)
+        return x, y, z
+
+
+class Axi4MemoryModel(BusDriver):
+    """AXI4 slave backed by a dict of bus words indexed by byte address.
+    Checks that bursts are INCR and do not cross 4KB boundaries."""
+
+    _signals =['AWADDR', 'AWLEN', 'AWBURST', 'AWVALID', 'AWREADY',
+               'WDATA', 'WLAST', 'WVALID', 'WREADY',
+               'BRESP', 'BVALID', 'BREADY',
+               'ARADDR', 'ARLEN', 'ARBURST', 'ARVALID', 'ARREADY',
+               'RDATA', 'RRESP', 'RLAST', 'RVALID', 'RREADY',]
+
+    def __init__(self, entity, name, clock, memory=None, burps=False):
+        BusDriver.__init__(self, entity, name, clock)
+        self.clk = clock
+        self.memory = {} if memory is None else memory
+        self.burps = burps
+        self.beat_bytes = len(self.bus.WDATA) // 8
+        self.writes = []
+        self.reads = []
+        self.bursts = []
+
+    def init_zero(self):
+        self.bus.AWREADY <= 0
+        self.bus.WREADY <= 0
+        self.bus.BRESP <= 0
+        self.bus.BVALID <= 0
+        self.bus.ARREADY <= 0
+        self.bus.RDATA <= 0
+        self.bus.RRESP <= 0
+        self.bus.RLAST <= 0
+        self.bus.RVALID <= 0
+
+    def _ready(self):
+        return random.randint(0, 1) if self.burps else 1
+
+    def _check_burst(self, addr, length, burst):
+        assert burst == 1, 'only INCR bursts'
+        assert addr // 4096 == (addr + length * self.beat_bytes - 1) // 4096, f'burst at {hex(addr)} crosses 4KB'
+        self.bursts.append((addr, length))
+
+    @cocotb.coroutine
+    def run(self):
+        self.init_zero()
+        cocotb.fork(self.write_address())
+        cocotb.fork(self.write_data())
+        cocotb.fork(self.read_address())
+        cocotb.fork(self.read_data())
+        yield RisingEdge(self.clk)
+
+    @cocotb.coroutine
+    def write_address(self):
+        while True:
+            ready = self._ready()
+            self.bus.AWREADY <= ready
+            yield RisingEdge(self.clk)
+            if ready and self.bus.AWVALID.value.integer:
+                addr = self.bus.AWADDR.value.integer
+                length = self.bus.AWLEN.value.integer + 1
+                self._check_burst(addr, length, self.bus.AWBURST.value.integer)
+                self.writes.append((addr, length))
+
+    @cocotb.coroutine
+    def write_data(self):
+        beat = 0
+        responses = 0
+        while True:
+            ready = self._ready() if self.writes else 0
+            self.bus.WREADY <= ready
+            self.bus.BVALID <= int(responses > 0)
+            yield RisingEdge(self.clk)
+            if responses and self.bus.BREADY.value.integer:
+                responses -= 1
+            if ready and self.bus.WVALID.value.integer:
+                addr, length = self.writes[0]
+                self.memory[addr + beat * self.beat_bytes] = self.bus.WDATA.value.integer
+                beat += 1
+                assert self.bus.WLAST.value.integer == int(beat == length)
+                if beat == length:
+                    self.writes.pop(0)
+                    beat = 0
+                    responses += 1
+
+    @cocotb.coroutine
+    def read_address(self):
+        while True:
+            ready = self._ready()
+            self.bus.ARREADY <= ready
+            yield RisingEdge(self.clk)
+            if ready and self.bus.ARVALID.value.integer:
+                addr = self.bus.ARADDR.value.integer
+                length = self.bus.ARLEN.value.integer + 1
+                self._check_burst(addr, length, self.bus.ARBURST.value.integer)
+                self.reads.append((addr, length))
+
+    @cocotb.coroutine
+    def read_data(self):
+        beat = 0
+        while True:
+            valid = self._ready() if self.reads else 0
+            if valid:
+                addr, length = self.reads[0]
+                self.bus.RDATA <= self.memory.get(addr + beat * self.beat_bytes, 0)
+                self.bus.RLAST <= int(beat == length - 1)
+            self.bus.RVALID <= valid
+            yield RisingEdge(self.clk)
+            if valid and self.bus.RREADY.value.integer:
+                beat += 1
+                if beat == length:
+                    self.reads.pop(0)
+                    beat = 0
@@ -0,0 +1,196 @@
+from nmigen_cocotb import run
+from nmigen import *
+from cores_nmigen.arbiter import StreamArbiter, StreamRouter
+from cores_nmigen.interfaces import DataStream
+import random
+import pytest
+import os
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge, Join
+    from cocotb.clock import Clock
+    from cocotb.regression import TestFactory as TF
+    from .interfaces import DataStreamDriver
+except:
+    pass
+
+CLK_PERIOD_BASE = 100
+WIDTH = 16
+# index of the stream in the top bits of the data
+INDEX_W = 3
+
+
+class ArbiterWrapper(Elaboratable):
+    def __init__(self, n, scheme):
+        self.inputs = [DataStream(WIDTH, 'sink', name=f'input_{i}') for i in range(n)]
+        self.output = DataStream(WIDTH, 'source', name='output')
+        self.arbiter = StreamArbiter(self.inputs, self.output, scheme)
+
+    def get_ports(self):
+        ports = []
+        for stream in self.inputs + [self.output]:
+            ports += [stream[f] for f in stream.fields]
+        return ports
+
+    def elaborate(self, platform):
+        m = Module()
+        m.submodules.arbiter = self.arbiter
+        return m
+
+
+class RouterWrapper(Elaboratable):
+    def __init__(self, n):
+        self.input = DataStream(WIDTH, 'sink', name='input')
+        self.outputs = [DataStream(WIDTH, 'source', name=f'output_{i}') for i in range(n)]
+        self.router = StreamRouter(self.input, self.outputs, self.input.data[-INDEX_W:])
+
+    def get_ports(self):
+        ports = []
+        for stream in [self.input] + self.outputs:
+            ports += [stream[f] for f in stream.fields]
+        return ports
+
+    def elaborate(self, platform):
+        m = Module()
+        m.submodules.router = self.router
+        return m
+
+
+@cocotb.coroutine
+def init_test(dut):
+    dut.rst <= 1
+    cocotb.fork(Clock(dut.clk, 10, 'ns').start())
+    yield RisingEdge(dut.clk)
+    dut.rst <= 0
+    yield RisingEdge(dut.clk)
+
+
+def random_packet(index, length=None):
+    length = random.randint(1, 6) if length is None else length
+    return [(index << (WIDTH - INDEX_W)) | random.getrandbits(WIDTH - INDEX_W) for _ in range(length)]
+
+
+@cocotb.coroutine
+def send_packets(driver, packets, burps):
+    for packet in packets:
+        yield driver.send(packet, burps=burps)
+
+
+@cocotb.coroutine
+def recv_packets(driver, n, burps):
+    packets = []
+    for _ in range(n):
+        # recv stops on the last beat of every packet
+        packet = yield driver.recv(burps=burps)
+        packets.append(packet)
+    return packets
+
+
+@cocotb.coroutine
+def check_arbiter(dut, burps_in, burps_out):
+    test_size = 20
+    n = int(os.environ['coco_param_n'])
+    scheme = os.environ['coco_param_scheme']
+
+    yield init_test(dut)
+
+    m_axis = [DataStreamDriver(dut, f'input_{i}_', dut.clk) for i in range(n)]
+    s_axis = DataStreamDriver(dut, 'output_', dut.clk)
+
+    packets = [[random_packet(i) for _ in range(test_size)] for i in range(n)]
+    for driver, p in zip(m_axis, packets):
+        cocotb.fork(send_packets(driver, p, burps_in))
+    rcv = yield recv_packets(s_axis, n * test_size, burps_out)
+
+    # packets are not split and keep their order
+    for i in range(n):
+        assert [p for p in rcv if p[0] >> (WIDTH - INDEX_W) == i] == packets[i]
+    if not burps_in and not burps_out:
+        order = [p[0] >> (WIDTH - INDEX_W) for p in rcv]
+        if scheme == 'round_robin':
+            assert order == [k % n for k in range(n * test_size)], f'{order}'
+        else:
+            assert order == sorted(order), f'{order}'
+
+
+@cocotb.coroutine
+def check_back_to_back(dut):
+    n = int(os.environ['coco_param_n'])
+
+    yield init_test(dut)
+
+    m_axis = [DataStreamDriver(dut, f'input_{i}_', dut.clk) for i in range(n)]
+    for i, driver in enumerate(m_axis):
+        cocotb.fork(driver.send(random_packet(i, length=4)))
+    dut.output__ready <= 1
+    yield RisingEdge(dut.clk)
+
+    # every input has a packet waiting: no cycle without a beat
+    for _ in range(4 * n - 1):
+        yield RisingEdge(dut.clk)
+        assert dut.output__valid.value.integer == 1
+    dut.output__ready <= 0
+
+
+@cocotb.coroutine
+def check_router(dut, burps_in, burps_out):
+    test_size = 60
+    n = int(os.environ['coco_param_n'])
+
+    yield init_test(dut)
+
+    m_axis = DataStreamDriver(dut, 'input_', dut.clk)
+    s_axis = [DataStreamDriver(dut, f'output_{i}_', dut.clk) for i in range(n)]
+
+    # destinations without an output are dropped
+    packets = [random_packet(random.randrange(2**INDEX_W)) for _ in range(test_size)]
+    expected = [[p for p in packets if p[0] >> (WIDTH - INDEX_W) == i] for i in range(n)]
+    receivers = [cocotb.fork(recv_packets(driver, len(e), burps_out)) for driver, e in zip(s_axis, expected)]
+    yield send_packets(m_axis, packets, burps_in)
+    for receiver, e in zip(receivers, expected):
+        rcv = yield Join(receiver)
+        assert rcv == e
+
+
+try:
+    running_cocotb = True
+    core = os.environ['coco_param_core']
+except KeyError as e:
+    running_cocotb = False
+
+if running_cocotb:
+    if core == 'arbiter':
+        tf_test_arbiter = TF(check_arbiter)
+        tf_test_arbiter.add_option('burps_in', [False, True])
+        tf_test_arbiter.add_option('burps_out', [False, True])
+        tf_test_arbiter.generate_tests()
+        tf_test_back_to_back = TF(check_back_to_back)
+        tf_test_back_to_back.generate_tests()
+    else:
+        tf_test_router = TF(check_router)
+        tf_test_router.add_option('burps_in', [False, True])
+        tf_test_router.add_option('burps_out', [False, True])
+        tf_test_router.generate_tests()
+
+
+@pytest.mark.parametrize("scheme", StreamArbiter.SCHEMES)
+@pytest.mark.parametrize("n", [1, 3, 4])
+def test_arbiter(n, scheme):
+    os.environ['coco_param_core'] = 'arbiter'
+    os.environ['coco_param_n'] = str(n)
+    os.environ['coco_param_scheme'] = scheme
+    core = ArbiterWrapper(n, scheme)
+    ports = core.get_ports()
+    vcd_file = f'./test_arbiter_{scheme}_n{n}.vcd'
+    run(core, 'cores_nmigen.test.test_arbiter', ports=ports, vcd_file=vcd_file)
+
+
+@pytest.mark.parametrize("n", [1, 3, 8])
+def test_router(n):
+    os.environ['coco_param_core'] = 'router'
+    os.environ['coco_param_n'] = str(n)
+    core = RouterWrapper(n)
+    ports = core.get_ports()
+    vcd_file = f'./test_router_n{n}.vcd'
+    run(core, 'cores_nmigen.test.test_arbiter', ports=ports, vcd_file=vcd_file)
@@ -1,6 +1,8 @@
 from nmigen_cocotb import run
 from cores_nmigen.axi_lite import AxiLiteDevice
 import random
+import pytest
+import os
 
 try:
     import cocotb
@@ -27,7 +29,12 @@ regs_ro = [('reg_ro_1', 'ro', 0x0000000C, [('field_10', 32,  0),]),
                                            ('field_40', 16, 16),]),
            ('reg_ro_3', 'ro', 0x00000014, [('field_50', 32,  0),]),
           ]
-regs = regs_rw + regs_ro
+regs_rws = [('reg_rws_1', 'rws', 0x00000018, [('field_100', 32,  0),]),
+            ('reg_rws_2', 'rws', 0x0000001C, [('field_200', 16,  0),
+                                              ('field_300', 16, 16),]),
+           ]
+commit_addr = 0x00000020
+regs = regs_rw + regs_ro + regs_rws
 
 
 get_mask = lambda size, offset: (2**size-1) << offset
@@ -98,17 +105,98 @@ def check_ro_regs(dut):
         assert rd == r_value, f'{hex(rd)} == {hex(r_value)}'
 
 
+@cocotb.coroutine
+def check_back_to_back_reads(dut):
+
+    axi_lite = AxiLiteDriver(dut, 's_axi_', dut.clk)
+    data = [random.randint(0,2**32-1) for _ in range(len(regs_rw))]
+    pipelined = int(os.environ.get('coco_param_pipelined', 0))
+
+    yield init_test(dut)
+
+    for (r_name, r_dir, r_addr, r_fields), value in zip(regs_rw, data):
+        yield axi_lite.write_reg(r_addr, value)
+
+    addrs = [r_addr for r_name, r_dir, r_addr, r_fields in regs_rw] * 10
+    rd, cycles = yield axi_lite.read_regs(addrs)
+    assert rd == data * 10, f'{rd} == {data * 10}'
+    if pipelined:
+        # one read per cycle plus one cycle of latency
+        assert cycles <= len(addrs) + 1, f'{cycles} <= {len(addrs) + 1}'
+
+
+@cocotb.coroutine
+def check_strobes(dut):
+
+    axi_lite = AxiLiteDriver(dut, 's_axi_', dut.clk)
+
+    yield init_test(dut)
+
+    for r_name, r_dir, r_addr, r_fields in regs_rw:
+        value = random.randint(0,2**32-1)
+        yield axi_lite.write_reg(r_addr, value)
+        for _ in range(4):
+            strb = random.randint(0,15)
+            new = random.randint(0,2**32-1)
+            yield axi_lite.write_reg(r_addr, new, strb=strb)
+            byte_mask = sum([0xff << (8*b) for b in range(4) if strb & (1 << b)])
+            value = (value & ~byte_mask) | (new & byte_mask)
+            rd = yield axi_lite.read_reg(r_addr)
+            assert rd == value, f'{hex(rd)} == {hex(value)}'
+
+
+@cocotb.coroutine
+def check_commit(dut):
+
+    axi_lite = AxiLiteDriver(dut, 's_axi_', dut.clk)
+    data = [random.randint(0,2**32-1) for _ in range(len(regs_rws))]
+
+    yield init_test(dut)
+
+    for (r_name, r_dir, r_addr, r_fields), value in zip(regs_rws, data):
+        yield axi_lite.write_reg(r_addr, value)
+
+    # nothing reaches the user logic before the commit
+    for r_name, r_dir, r_addr, r_fields in regs_rws:
+        for f_name, f_size, f_offset in r_fields:
+            f_value = getattr(dut, f_name).value.integer
+            assert f_value == 0, f'{hex(f_value)} == 0'
+
+    yield axi_lite.write_reg(commit_addr, 0)
+
+    for (r_name, r_dir, r_addr, r_fields), r_value in zip(regs_rws, data):
+        rd = yield axi_lite.read_reg(r_addr)
+        assert rd == r_value, f'{hex(rd)} == {hex(r_value)}'
+        for f_name, f_size, f_offset in r_fields:
+            f_value = getattr(dut, f_name).value.integer
+            expected = unmask(r_value, f_size, f_offset)
+            assert f_value == expected, f'{hex(f_value)} == {hex(expected)}'
+
+
 tf_test_rw = TF(check_rw_regs)
 tf_test_rw.generate_tests()
 
 tf_test_ro = TF(check_ro_regs)
 tf_test_ro.generate_tests()
 
+tf_test_b2b = TF(check_back_to_back_reads)
+tf_test_b2b.generate_tests()
+
+tf_test_strobes = TF(check_strobes)
+tf_test_strobes.generate_tests()
+
+tf_test_commit = TF(check_commit)
+tf_test_commit.generate_tests()
+
 
-def test_axi_lite_device():
-    core = AxiLiteDevice(addr_w=5,
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_axi_lite_device(pipelined):
+    os.environ['coco_param_pipelined'] = str(int(pipelined))
+    core = AxiLiteDevice(addr_w=6,
                          data_w=32,
-                         registers=regs)
+                         registers=regs,
+                         pipelined=pipelined,
+                         commit_addr=commit_addr)
     ports = [core.axi_lite[f] for f in core.axi_lite.fields]
     ports += [core.registers[f] for f in core.registers.fields]
     run(core, 'cores_nmigen.test.test_axi_lite', ports=ports, vcd_file='./test_axi_lite_device.vcd')
\ No newline at end of file
@@ -0,0 +1,141 @@
+from nmigen_cocotb import run
+from nmigen import *
+from cores_nmigen.axi_lite import AxiLiteInterconnect, AxiLiteDevice
+import random
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge
+    from cocotb.clock import Clock
+    from cocotb.regression import TestFactory as TF
+    from .interfaces import *
+except:
+    pass
+
+CLK_PERIOD_BASE = 100
+random.seed()
+
+N_SLAVES = 4
+N_REGS = 8
+SLAVE_SIZE = 0x100
+DECERR = 3
+
+address_map = [(SLAVE_SIZE * i, SLAVE_SIZE) for i in range(N_SLAVES)]
+unmapped = [SLAVE_SIZE * N_SLAVES, 0xFF00]
+
+
+def slave_regs(slave):
+    return [(f'reg_{slave}_{i}', 'rw', 4 * i, [(f'field_{slave}_{i}', 32, 0),]) for i in range(N_REGS)]
+
+
+class InterconnectToDevices(Elaboratable):
+    def __init__(self, pipelined):
+        self.interconnect = AxiLiteInterconnect(addr_w=16, data_w=32, address_map=address_map)
+        self.devices = [AxiLiteDevice(addr_w=8, data_w=32, registers=slave_regs(i), pipelined=pipelined)
+                        for i in range(N_SLAVES)]
+
+    def get_ports(self):
+        ports = [self.interconnect.axi_lite[f] for f in self.interconnect.axi_lite.fields]
+        for device in self.devices:
+            ports += [device.registers[f] for f in device.registers.fields]
+        return ports
+
+    def elaborate(self, platform):
+        m = Module()
+        m.submodules.interconnect = self.interconnect
+        for i, (slave, device) in enumerate(zip(self.interconnect.slaves, self.devices)):
+            m.submodules[f'device_{i}'] = device
+            m.d.comb += slave.connect(device.axi_lite)
+        return m
+
+
+@cocotb.coroutine
+def init_test(dut):
+    dut.s_axi__AWADDR <= 0
+    dut.s_axi__AWVALID <= 0
+    dut.s_axi__WDATA <= 0
+    dut.s_axi__WSTRB <= 0
+    dut.s_axi__WVALID <= 0
+    dut.s_axi__BREADY <= 0
+    dut.s_axi__ARADDR <= 0
+    dut.s_axi__ARVALID <= 0
+    dut.s_axi__RREADY <= 0
+    dut.rst <= 1
+    cocotb.fork(Clock(dut.clk, 10, 'ns').start())
+    yield RisingEdge(dut.clk)
+    dut.rst <= 0
+    yield RisingEdge(dut.clk)
+
+
+@cocotb.coroutine
+def check_routing(dut):
+
+    axi_lite = AxiLiteDriver(dut, 's_axi_', dut.clk)
+    addrs = [base + 4 * i for base, _ in address_map for i in range(N_REGS)]
+    data = {addr: random.randint(0, 2**32-1) for addr in addrs}
+
+    yield init_test(dut)
+
+    for addr in random.sample(addrs, len(addrs)):
+        yield axi_lite.write_reg(addr, data[addr])
+        assert axi_lite.resp == 0
+
+    for slave in range(N_SLAVES):
+        for i in range(N_REGS):
+            f_value = getattr(dut, f'field_{slave}_{i}').value.integer
+            expected = data[SLAVE_SIZE * slave + 4 * i]
+            assert f_value == expected, f'{hex(f_value)} == {hex(expected)}'
+
+    order = random.sample(addrs, len(addrs))
+    rd, cycles = yield axi_lite.read_regs(order)
+    assert rd == [data[addr] for addr in order]
+
+
+@cocotb.coroutine
+def check_decode_error(dut):
+
+    axi_lite = AxiLiteDriver(dut, 's_axi_', dut.clk)
+
+    yield init_test(dut)
+
+    for addr in unmapped:
+        yield axi_lite.write_reg(addr, random.randint(0, 2**32-1))
+        assert axi_lite.resp == DECERR
+        rd = yield axi_lite.read_reg(addr)
+        assert axi_lite.resp == DECERR
+        assert rd == 0
+
+    # mapped slaves still answer after an error
+    yield axi_lite.write_reg(4, 0x12345678)
+    rd = yield axi_lite.read_reg(4)
+    assert axi_lite.resp == 0
+    assert rd == 0x12345678
+
+
+@cocotb.coroutine
+def check_throughput(dut):
+
+    axi_lite = AxiLiteDriver(dut, 's_axi_', dut.clk)
+
+    yield init_test(dut)
+
+    # alternate between slaves on every read
+    addrs = [SLAVE_SIZE * (i % N_SLAVES) + 4 * (i % N_REGS) for i in range(64)]
+    rd, cycles = yield axi_lite.read_regs(addrs)
+    assert cycles <= len(addrs) + 4, f'{cycles} <= {len(addrs) + 4}'
+
+
+tf_test_routing = TF(check_routing)
+tf_test_routing.generate_tests()
+
+tf_test_decerr = TF(check_decode_error)
+tf_test_decerr.generate_tests()
+
+tf_test_throughput = TF(check_throughput)
+tf_test_throughput.generate_tests()
+
+
+def test_axi_lite_interconnect():
+    core = InterconnectToDevices(pipelined=True)
+    ports = core.get_ports()
+    run(core, 'cores_nmigen.test.test_axi_lite_interconnect', ports=ports, vcd_file='./test_axi_lite_interconnect.vcd')
@@ -0,0 +1,121 @@
+from nmigen_cocotb import run
+from nmigen import *
+from cores_nmigen.axi_lite import AxiLiteMaster, AxiLiteDevice
+import random
+import pytest
+import os
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge
+    from cocotb.clock import Clock
+    from cocotb.regression import TestFactory as TF
+    from .interfaces import *
+except:
+    pass
+
+CLK_PERIOD_BASE = 100
+random.seed()
+
+N_REGS = 16
+regs = [(f'reg_{i}', 'rw', 4 * i, [(f'field_{i}', 32, 0),]) for i in range(N_REGS)]
+
+
+class MasterToDevice(Elaboratable):
+    def __init__(self, max_outstanding, pipelined):
+        self.master = AxiLiteMaster(addr_w=8, data_w=32, max_outstanding=max_outstanding)
+        self.device = AxiLiteDevice(addr_w=8, data_w=32, registers=regs, pipelined=pipelined)
+
+    def get_ports(self):
+        ports = [self.master.command[f] for f in self.master.command.fields]
+        ports += [self.master.read_data[f] for f in self.master.read_data.fields]
+        ports += [self.master.error, self.master.idle]
+        ports += [self.device.registers[f] for f in self.device.registers.fields]
+        return ports
+
+    def elaborate(self, platform):
+        m = Module()
+        m.submodules.master = self.master
+        m.submodules.device = self.device
+        m.d.comb += self.master.axi_lite.connect(self.device.axi_lite)
+        return m
+
+
+@cocotb.coroutine
+def init_test(dut):
+    dut.command__valid <= 0
+    dut.command__last <= 0
+    dut.command__addr <= 0
+    dut.command__data <= 0
+    dut.command__strb <= 0
+    dut.command__write <= 0
+    dut.read_data__ready <= 0
+    dut.rst <= 1
+    cocotb.fork(Clock(dut.clk, 10, 'ns').start())
+    yield RisingEdge(dut.clk)
+    dut.rst <= 0
+    yield RisingEdge(dut.clk)
+
+
+@cocotb.coroutine
+def check_write_read(dut, burps_in, burps_out):
+    yield init_test(dut)
+    command = AxiLiteCommandStreamDriver(dut, 'command_', dut.clk)
+    read_data = DataStreamDriver(dut, 'read_data_', dut.clk)
+
+    data = [random.randint(0, 2**32-1) for _ in range(N_REGS)]
+    writes = [(r_addr, value, 0xf, 1) for (_, _, r_addr, _), value in zip(regs, data)]
+    yield command.send(writes, burps=burps_in)
+    while not dut.idle.value.integer:
+        yield RisingEdge(dut.clk)
+
+    for (r_name, r_dir, r_addr, r_fields), value in zip(regs, data):
+        f_value = getattr(dut, r_fields[0][0]).value.integer
+        assert f_value == value, f'{hex(f_value)} == {hex(value)}'
+
+    order = random.sample(range(N_REGS), N_REGS)
+    reads = [(regs[i][2], 0, 0, 0) for i in order]
+    cocotb.fork(command.send(reads, burps=burps_in))
+    rcv = yield read_data.recv(burps=burps_out)
+    assert rcv == [data[i] for i in order], f'{rcv} == {[data[i] for i in order]}'
+    assert dut.error.value.integer == 0
+
+
+@cocotb.coroutine
+def check_throughput(dut):
+    yield init_test(dut)
+    command = AxiLiteCommandStreamDriver(dut, 'command_', dut.clk)
+    max_outstanding = int(os.environ['coco_param_max_outstanding'])
+    pipelined = int(os.environ['coco_param_pipelined'])
+
+    writes = [(r_addr, random.randint(0, 2**32-1), 0xf, 1) for _, _, r_addr, _ in regs] * 4
+    cycles = 0
+    cocotb.fork(command.send(writes))
+    accepted = 0
+    while accepted < len(writes):
+        yield RisingEdge(dut.clk)
+        cycles += 1
+        if command.accepted():
+            accepted += 1
+    if pipelined and max_outstanding >= 4:
+        # one write per cycle once the pipeline is full
+        assert cycles <= len(writes) + 2, f'{cycles} <= {len(writes) + 2}'
+
+
+tf_test_wr = TF(check_write_read)
+tf_test_wr.add_option('burps_in', [False, True])
+tf_test_wr.add_option('burps_out', [False, True])
+tf_test_wr.generate_tests()
+
+tf_test_throughput = TF(check_throughput)
+tf_test_throughput.generate_tests()
+
+
+@pytest.mark.parametrize("max_outstanding", [1, 4])
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_axi_lite_master(max_outstanding, pipelined):
+    os.environ['coco_param_max_outstanding'] = str(max_outstanding)
+    os.environ['coco_param_pipelined'] = str(int(pipelined))
+    core = MasterToDevice(max_outstanding, pipelined)
+    ports = core.get_ports()
+    run(core, 'cores_nmigen.test.test_axi_lite_master', ports=ports, vcd_file='./test_axi_lite_master.vcd')
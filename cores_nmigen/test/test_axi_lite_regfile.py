@@ -0,0 +1,122 @@
+from nmigen_cocotb import run
+from cores_nmigen.axi_lite import AxiLiteDevice
+import random
+import pytest
+import os
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge
+    from cocotb.clock import Clock
+    from cocotb.regression import TestFactory as TF
+    from .interfaces import *
+except:
+    pass
+
+CLK_PERIOD_BASE = 100
+random.seed()
+
+N_REGS = 64
+MEM_BASE = 0x400
+MEM_DEPTH = 16
+
+# dense map: consecutive words, half rw and half ro
+regs_dense = [(f'reg_{i}', 'rw' if i % 2 == 0 else 'ro', 4 * i, [(f'field_{i}', 32, 0),])
+              for i in range(N_REGS)]
+# sparse map: a few registers spread over the address space
+regs_sparse = [(f'reg_{i}', 'rw' if i % 2 == 0 else 'ro', 0x40 * i + 4 * (i % 3), [(f'field_{i}', 32, 0),])
+               for i in range(N_REGS // 4)]
+regs_mem = [('table', 'mem', MEM_BASE, MEM_DEPTH)]
+
+
+def get_regs():
+    sparse = int(os.environ.get('coco_param_sparse', 0))
+    return (regs_sparse if sparse else regs_dense) + regs_mem
+
+
+@cocotb.coroutine
+def init_test(dut):
+    dut.s_axi__AWADDR <= 0
+    dut.s_axi__AWVALID <= 0
+    dut.s_axi__WDATA <= 0
+    dut.s_axi__WVALID <= 0
+    dut.s_axi__BREADY <= 0
+    dut.s_axi__ARADDR <= 0
+    dut.s_axi__ARVALID <= 0
+    dut.s_axi__RREADY <= 0
+    dut.table_addr <= 0
+    for r_name, r_dir, r_addr, r_fields in get_regs():
+        if r_dir == 'ro':
+            for f_name, f_size, f_offset in r_fields:
+                setattr(dut, f_name, 0)
+    dut.rst <= 1
+    cocotb.fork(Clock(dut.clk, 10, 'ns').start())
+    yield RisingEdge(dut.clk)
+    dut.rst <= 0
+    yield RisingEdge(dut.clk)
+
+
+@cocotb.coroutine
+def check_registers(dut):
+
+    axi_lite = AxiLiteDriver(dut, 's_axi_', dut.clk)
+    regs = [r for r in get_regs() if r[1] != 'mem']
+    data = {r_addr: random.randint(0, 2**32-1) for _, _, r_addr, _ in regs}
+
+    yield init_test(dut)
+
+    for r_name, r_dir, r_addr, r_fields in regs:
+        if r_dir == 'rw':
+            yield axi_lite.write_reg(r_addr, data[r_addr])
+        else:
+            setattr(dut, r_fields[0][0], data[r_addr])
+
+    for r_name, r_dir, r_addr, r_fields in random.sample(regs, len(regs)):
+        rd = yield axi_lite.read_reg(r_addr)
+        assert rd == data[r_addr], f'{hex(r_addr)}: {hex(rd)} == {hex(data[r_addr])}'
+        if r_dir == 'rw':
+            f_value = getattr(dut, r_fields[0][0]).value.integer
+            assert f_value == data[r_addr], f'{hex(f_value)} == {hex(data[r_addr])}'
+
+
+@cocotb.coroutine
+def check_memory(dut):
+
+    axi_lite = AxiLiteDriver(dut, 's_axi_', dut.clk)
+    data = [random.randint(0, 2**32-1) for _ in range(MEM_DEPTH)]
+
+    yield init_test(dut)
+
+    for i, value in enumerate(data):
+        yield axi_lite.write_reg(MEM_BASE + 4 * i, value)
+
+    for i in random.sample(range(MEM_DEPTH), MEM_DEPTH):
+        rd = yield axi_lite.read_reg(MEM_BASE + 4 * i)
+        assert rd == data[i], f'{hex(rd)} == {hex(data[i])}'
+
+    # user read port
+    for i, value in enumerate(data):
+        dut.table_addr <= i
+        yield RisingEdge(dut.clk)
+        yield RisingEdge(dut.clk)
+        rd = dut.table_data.value.integer
+        assert rd == value, f'{hex(rd)} == {hex(value)}'
+
+
+tf_test_regs = TF(check_registers)
+tf_test_regs.generate_tests()
+
+tf_test_mem = TF(check_memory)
+tf_test_mem.generate_tests()
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_axi_lite_regfile(sparse, pipelined):
+    os.environ['coco_param_sparse'] = str(int(sparse))
+    core = AxiLiteDevice(addr_w=12,
+                         data_w=32,
+                         registers=get_regs(),
+                         pipelined=pipelined)
+    ports = core.get_ports()
+    run(core, 'cores_nmigen.test.test_axi_lite_regfile', ports=ports, vcd_file='./test_axi_lite_regfile.vcd')
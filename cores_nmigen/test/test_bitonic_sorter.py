@@ -0,0 +1,84 @@
+from nmigen_cocotb import run
+from cores_nmigen.test.interfaces import MatrixStreamDriver
+from cores_nmigen.bitonic_sorter import BitonicSorter
+from cores_nmigen.utils.twos_comp import int_from_twos_comp
+import random
+import pytest
+import os
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge
+    from cocotb.clock import Clock
+    from cocotb.regression import TestFactory as TF
+except:
+    pass
+
+CLK_PERIOD_BASE = 100
+WIDTH = 8
+PAYLOAD_W = 4
+
+
+@cocotb.coroutine
+def init_test(dut):
+    dut.rst <= 1
+    cocotb.fork(Clock(dut.clk, 10, 'ns').start())
+    yield RisingEdge(dut.clk)
+    dut.rst <= 0
+    yield RisingEdge(dut.clk)
+
+
+@cocotb.coroutine
+def check_sort(dut, burps_in, burps_out):
+    test_size = 20
+    n = int(os.environ['coco_param_n'])
+    descending = int(os.environ['coco_param_descending'])
+    signed = int(os.environ['coco_param_signed'])
+
+    yield init_test(dut)
+
+    input_stream = MatrixStreamDriver(dut, name='input_', clock=dut.clk, shape=(n,))
+    output_stream = MatrixStreamDriver(dut, name='output_', clock=dut.clk, shape=(n,))
+    input_stream.init_sink()
+    output_stream.init_source()
+
+    data = [[random.getrandbits(WIDTH + PAYLOAD_W) for _ in range(n)] for _ in range(test_size)]
+
+    def key(element):
+        value = element >> PAYLOAD_W
+        return int_from_twos_comp(value, WIDTH) if signed else value
+
+    cocotb.fork(input_stream.send(data, burps=burps_in))
+    rcv = yield output_stream.recv(burps=burps_out)
+
+    assert len(rcv) == test_size
+    for vector, result in zip(data, rcv):
+        elements = [element & (2**(WIDTH + PAYLOAD_W) - 1) for element in result]
+        indexes = [element >> (WIDTH + PAYLOAD_W) for element in result]
+        keys = [key(element) for element in elements]
+        assert keys == sorted(keys, reverse=descending), f'{keys} is not sorted'
+        # payload and index travel with their key
+        assert sorted(indexes) == list(range(n))
+        assert elements == [vector[i] for i in indexes], f'{elements} == {[vector[i] for i in indexes]}'
+
+
+if 'coco_param_n' in os.environ:
+    tf_test_sort = TF(check_sort)
+    tf_test_sort.add_option('burps_in', [False, True])
+    tf_test_sort.add_option('burps_out', [False, True])
+    tf_test_sort.generate_tests()
+
+
+@pytest.mark.parametrize("pipeline_every", [1, 3])
+@pytest.mark.parametrize("signed", [False, True])
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("n", [4, 6, 16])
+def test_bitonic_sorter(n, descending, signed, pipeline_every):
+    os.environ['coco_param_n'] = str(n)
+    os.environ['coco_param_descending'] = str(int(descending))
+    os.environ['coco_param_signed'] = str(int(signed))
+    core = BitonicSorter(width=WIDTH, n=n, payload_w=PAYLOAD_W, index=True, descending=descending,
+                         signed=signed, pipeline_every=pipeline_every)
+    ports = core.get_ports()
+    vcd_file = f'./test_bitonic_sorter_n{n}_d{int(descending)}_s{int(signed)}_p{pipeline_every}.vcd'
+    run(core, 'cores_nmigen.test.test_bitonic_sorter', ports=ports, vcd_file=vcd_file)
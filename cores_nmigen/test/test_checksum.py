@@ -0,0 +1,155 @@
+from nmigen_cocotb import run
+from cores_nmigen.test.interfaces import KeepStreamDriver
+from cores_nmigen.checksum import ChecksumEngine, Crc, InternetChecksum
+import random
+import zlib
+import pytest
+import os
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge
+    from cocotb.clock import Clock
+    from cocotb.regression import TestFactory as TF
+except:
+    pass
+
+CLK_PERIOD_BASE = 100
+
+ALGORITHMS = {'crc32': lambda data_w, mode: Crc(data_w, mode=mode),
+              'crc16': lambda data_w, mode: Crc(data_w, 16, 0x1021, 0xFFFF, reflect=False, xor_out=0, mode=mode),
+              'internet': lambda data_w, mode: InternetChecksum(data_w, mode=mode),}
+
+
+@cocotb.coroutine
+def init_test(dut):
+    dut.rst <= 1
+    cocotb.fork(Clock(dut.clk, 10, 'ns').start())
+    yield RisingEdge(dut.clk)
+    dut.rst <= 0
+    yield RisingEdge(dut.clk)
+
+
+def crc16(message):
+    crc = 0xFFFF
+    for byte in message:
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021 if crc & 0x8000 else crc << 1) & 0xFFFF
+    return crc
+
+
+def internet(message):
+    padded = message + b'\0' * (len(message) % 2)
+    total = 0
+    for i in range(0, len(padded), 2):
+        total += (padded[i] << 8) | padded[i + 1]
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def checksum_bytes(algorithm, message):
+    if algorithm == 'crc32':
+        return zlib.crc32(message).to_bytes(4, 'little')
+    if algorithm == 'crc16':
+        return crc16(message).to_bytes(2, 'big')
+    # sent byte swapped after an odd number of bytes
+    return internet(message).to_bytes(2, 'little' if len(message) % 2 else 'big')
+
+
+def to_beats(message, nbytes):
+    beats = []
+    for i in range(0, len(message), nbytes):
+        chunk = message[i:i+nbytes]
+        beats.append((int.from_bytes(chunk, 'little'), 2**len(chunk) - 1))
+    return beats
+
+
+def from_beats(beats, nbytes):
+    message = b''
+    for data, keep in beats:
+        message += data.to_bytes(nbytes, 'little')[:bin(keep).count('1')]
+    return message
+
+
+@cocotb.coroutine
+def send_packets(driver, packets, nbytes, burps):
+    for packet in packets:
+        yield driver.send(to_beats(packet, nbytes), burps=burps)
+
+
+@cocotb.coroutine
+def check_generator(dut, burps_in, burps_out):
+    test_size = 20
+    algorithm = os.environ['coco_param_algorithm']
+    nbytes = len(dut.input__data) // 8
+
+    yield init_test(dut)
+
+    m_axis = KeepStreamDriver(dut, 'input_', dut.clk)
+    s_axis = KeepStreamDriver(dut, 'output_', dut.clk)
+
+    packets = [bytes([random.getrandbits(8) for _ in range(random.randint(1, 5 * nbytes))])
+               for _ in range(test_size)]
+    cocotb.fork(send_packets(m_axis, packets, nbytes, burps_in))
+    for packet in packets:
+        # recv stops on the last beat of every packet
+        rcv = yield s_axis.recv(burps=burps_out)
+        expected = packet + checksum_bytes(algorithm, packet)
+        assert from_beats(rcv, nbytes) == expected, f'{from_beats(rcv, nbytes)} == {expected}'
+
+
+@cocotb.coroutine
+def check_checker(dut, burps_in, burps_out):
+    test_size = 20
+    algorithm = os.environ['coco_param_algorithm']
+    nbytes = len(dut.input__data) // 8
+
+    yield init_test(dut)
+
+    m_axis = KeepStreamDriver(dut, 'input_', dut.clk)
+    s_axis = KeepStreamDriver(dut, 'output_', dut.clk)
+
+    packets, errors = [], []
+    for _ in range(test_size):
+        packet = bytes([random.getrandbits(8) for _ in range(random.randint(1, 5 * nbytes))])
+        packet += checksum_bytes(algorithm, packet)
+        error = random.randint(0, 1)
+        if error:
+            i = random.randrange(len(packet))
+            packet = packet[:i] + bytes([packet[i] ^ (1 << random.randrange(8))]) + packet[i+1:]
+        packets.append(packet)
+        errors.append(error)
+
+    cocotb.fork(send_packets(m_axis, packets, nbytes, burps_in))
+    for packet, error in zip(packets, errors):
+        rcv = yield s_axis.recv(burps=burps_out)
+        # error comes with the last beat
+        assert dut.error.value.integer == error
+        assert from_beats(rcv, nbytes) == packet
+
+
+try:
+    running_cocotb = True
+    algorithm = os.environ['coco_param_algorithm']
+    mode = os.environ['coco_param_mode']
+except KeyError as e:
+    running_cocotb = False
+
+if running_cocotb:
+    tf_test_data = TF(check_generator if mode == 'generator' else check_checker)
+    tf_test_data.add_option('burps_in', [False, True])
+    tf_test_data.add_option('burps_out', [False, True])
+    tf_test_data.generate_tests()
+
+
+@pytest.mark.parametrize("mode", ChecksumEngine.MODES)
+@pytest.mark.parametrize("algorithm", ALGORITHMS.keys())
+@pytest.mark.parametrize("data_w", [32, 64, 256])
+def test_checksum(data_w, algorithm, mode):
+    os.environ['coco_param_algorithm'] = algorithm
+    os.environ['coco_param_mode'] = mode
+    core = ALGORITHMS[algorithm](data_w, mode)
+    ports = core.get_ports()
+    vcd_file = f'./test_checksum_{algorithm}_{mode}_w{data_w}.vcd'
+    run(core, 'cores_nmigen.test.test_checksum', ports=ports, vcd_file=vcd_file)
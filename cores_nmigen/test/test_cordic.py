@@ -0,0 +1,111 @@
+from nmigen_cocotb import run
+from cores_nmigen.test.interfaces import CordicStreamDriver
+from cores_nmigen.cordic import Cordic
+from cores_nmigen.utils.twos_comp import twos_comp_from_int, int_from_twos_comp
+import random
+import math
+import pytest
+import os
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge
+    from cocotb.clock import Clock
+    from cocotb.regression import TestFactory as TF
+except:
+    pass
+
+CLK_PERIOD_BASE = 100
+WIDTH = 16
+Z_WIDTH = 14
+# LSBs
+TOLERANCE = 3
+
+
+@cocotb.coroutine
+def init_test(dut):
+    dut.rst <= 1
+    cocotb.fork(Clock(dut.clk, 10, 'ns').start())
+    yield RisingEdge(dut.clk)
+    dut.rst <= 0
+    yield RisingEdge(dut.clk)
+
+
+def random_sample():
+    x = random.randint(-2**(WIDTH-1), 2**(WIDTH-1)-1)
+    y = random.randint(-2**(WIDTH-1), 2**(WIDTH-1)-1)
+    z = random.randint(-2**(Z_WIDTH-1), 2**(Z_WIDTH-1)-1)
+    return x, y, z
+
+
+def corner_samples():
+    # full scale inputs, turning -2**(WIDTH-1) by pi must not wrap
+    values = [-2**(WIDTH-1), 2**(WIDTH-1)-1, 0]
+    angles = [0, 2**(Z_WIDTH-2), -2**(Z_WIDTH-2), -2**(Z_WIDTH-1), 2**(Z_WIDTH-1)-1]
+    return [(x, y, z) for x in values for y in values for z in angles]
+
+
+def cordic_model(x, y, z, mode, gain):
+    if mode == 'rotation':
+        angle = z / 2**(Z_WIDTH-1) * math.pi
+        return (gain * (x * math.cos(angle) - y * math.sin(angle)),
+                gain * (x * math.sin(angle) + y * math.cos(angle)),
+                0)
+    return gain * math.hypot(x, y), 0, z + math.atan2(y, x) / math.pi * 2**(Z_WIDTH-1)
+
+
+@cocotb.coroutine
+def check_cordic(dut, burps_in, burps_out):
+    test_size = 100
+    mode = os.environ['coco_param_mode']
+    gain = float(os.environ['coco_param_gain'])
+    output_w = int(os.environ['coco_param_output_w'])
+
+    yield init_test(dut)
+
+    m_axis = CordicStreamDriver(dut, 'input_', dut.clk)
+    s_axis = CordicStreamDriver(dut, 'output_', dut.clk)
+
+    data = corner_samples() + [random_sample() for _ in range(test_size)]
+    if mode == 'vectoring':
+        data = [(x, y, 0) for x, y, z in data]
+
+    cocotb.fork(m_axis.send([(twos_comp_from_int(x, WIDTH), twos_comp_from_int(y, WIDTH),
+                              twos_comp_from_int(z, Z_WIDTH)) for x, y, z in data], burps=burps_in))
+    rcv = yield s_axis.recv(burps=burps_out)
+
+    # the errors grow with the gain when it is not compensated
+    tolerance = TOLERANCE * gain
+    assert len(rcv) == len(data)
+    for (x, y, z), (rx, ry, rz) in zip(data, rcv):
+        ex, ey, ez = cordic_model(x, y, z, mode, gain)
+        rx, ry = int_from_twos_comp(rx, output_w), int_from_twos_comp(ry, output_w)
+        # angles wrap around
+        dz = (rz - round(ez) + 2**(Z_WIDTH-1)) % 2**Z_WIDTH - 2**(Z_WIDTH-1)
+        if mode == 'vectoring' and x == 0 and y == 0:
+            # no angle
+            dz = 0
+        assert abs(rx - ex) <= tolerance, f'x: {rx} == {ex}'
+        assert abs(ry - ey) <= tolerance, f'y: {ry} == {ey}'
+        assert abs(dz) <= TOLERANCE, f'z: {rz} == {ez}'
+
+
+if 'coco_param_mode' in os.environ:
+    tf_test_cordic = TF(check_cordic)
+    tf_test_cordic.add_option('burps_in', [False, True])
+    tf_test_cordic.add_option('burps_out', [False, True])
+    tf_test_cordic.generate_tests()
+
+
+@pytest.mark.parametrize("compensate", [True, False])
+@pytest.mark.parametrize("iterations_per_stage", [1, 3])
+@pytest.mark.parametrize("mode", Cordic.MODES)
+def test_cordic(mode, iterations_per_stage, compensate):
+    core = Cordic(width=WIDTH, z_width=Z_WIDTH, mode=mode, iterations_per_stage=iterations_per_stage,
+                  compensate=compensate)
+    os.environ['coco_param_mode'] = mode
+    os.environ['coco_param_gain'] = str(1 if compensate else core.gain)
+    os.environ['coco_param_output_w'] = str(core.output_w)
+    ports = core.get_ports()
+    vcd_file = f'./test_cordic_{mode}_i{iterations_per_stage}_c{int(compensate)}.vcd'
+    run(core, 'cores_nmigen.test.test_cordic', ports=ports, vcd_file=vcd_file)
@@ -0,0 +1,106 @@
+from nmigen_cocotb import run
+from cores_nmigen.test.interfaces import DataStreamDriver
+from cores_nmigen.corner_turn import CornerTurn
+import random
+import pytest
+import os
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge
+    from cocotb.clock import Clock
+    from cocotb.regression import TestFactory as TF
+except:
+    pass
+
+CLK_PERIOD_BASE = 100
+WIDTH = 8
+
+
+@cocotb.coroutine
+def init_test(dut):
+    dut.rst <= 1
+    cocotb.fork(Clock(dut.clk, 10, 'ns').start())
+    yield RisingEdge(dut.clk)
+    dut.rst <= 0
+    yield RisingEdge(dut.clk)
+
+
+def pack(elements):
+    return sum([e << (WIDTH * j) for j, e in enumerate(elements)])
+
+
+@cocotb.coroutine
+def check_data(dut, burps_in, burps_out):
+    test_size = 5
+    rows = int(os.environ['coco_param_rows'])
+    columns = int(os.environ['coco_param_columns'])
+    lanes = int(os.environ['coco_param_lanes'])
+
+    yield init_test(dut)
+
+    m_axis = DataStreamDriver(dut, 'input_', dut.clk)
+    s_axis = DataStreamDriver(dut, 'output_', dut.clk)
+
+    frames = [[[random.getrandbits(WIDTH) for c in range(columns)] for r in range(rows)] for _ in range(test_size)]
+    beats = []
+    for frame in frames:
+        beats += [pack(frame[r][c:c+lanes]) for r in range(rows) for c in range(0, columns, lanes)]
+
+    cocotb.fork(m_axis.send(beats, burps=burps_in))
+    for frame in frames:
+        # recv stops on the last beat of every frame
+        rcv = yield s_axis.recv(burps=burps_out)
+        expected = [pack([frame[r+j][c] for j in range(lanes)]) for c in range(columns) for r in range(0, rows, lanes)]
+        assert rcv == expected, f'{rcv} == {expected}'
+
+
+@cocotb.coroutine
+def check_throughput(dut):
+    test_size = 4
+    rows = int(os.environ['coco_param_rows'])
+    columns = int(os.environ['coco_param_columns'])
+    lanes = int(os.environ['coco_param_lanes'])
+    frame_beats = rows * columns // lanes
+
+    yield init_test(dut)
+
+    m_axis = DataStreamDriver(dut, 'input_', dut.clk)
+    s_axis = DataStreamDriver(dut, 'output_', dut.clk)
+
+    cocotb.fork(m_axis.send([random.getrandbits(WIDTH * lanes) for _ in range(test_size * frame_beats)]))
+    yield s_axis.recv()
+    cycles = 0
+    for _ in range(test_size - 1):
+        s_axis.bus.ready <= 1
+        while True:
+            yield RisingEdge(dut.clk)
+            cycles += 1
+            if s_axis.accepted() and s_axis.read_last():
+                break
+    assert cycles == (test_size - 1) * frame_beats, f'{cycles} == {(test_size - 1) * frame_beats}'
+
+
+if 'coco_param_rows' in os.environ:
+    tf_test_data = TF(check_data)
+    tf_test_data.add_option('burps_in', [False, True])
+    tf_test_data.add_option('burps_out', [False, True])
+    tf_test_data.generate_tests()
+
+    tf_test_throughput = TF(check_throughput)
+    tf_test_throughput.generate_tests()
+
+
+@pytest.mark.parametrize("rows, columns, lanes", [(4, 6, 1),
+                                                  (3, 5, 1),
+                                                  (4, 6, 2),
+                                                  (8, 8, 4),
+                                                 ])
+def test_corner_turn(rows, columns, lanes):
+    os.environ['coco_param_rows'] = str(rows)
+    os.environ['coco_param_columns'] = str(columns)
+    os.environ['coco_param_lanes'] = str(lanes)
+    core = CornerTurn(width=WIDTH, rows=rows, columns=columns, lanes=lanes)
+    ports = core.get_ports()
+    vcd_file = f'./test_corner_turn_r{rows}_c{columns}_l{lanes}.vcd'
+    run(core, 'cores_nmigen.test.test_corner_turn', ports=ports, vcd_file=vcd_file)
@@ -0,0 +1,64 @@
+from nmigen_cocotb import run
+from cores_nmigen.delay import PipelineDelay, DelayLine
+from cores_nmigen.test.interfaces import DataStreamDriver
+import random
+import pytest
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge
+    from cocotb.clock import Clock
+    from cocotb.regression import TestFactory as TF
+except:
+    pass
+
+
+@cocotb.coroutine
+def init_test(dut):
+    dut.output__ready <= 0
+    dut.input__valid <= 0
+    dut.input__data <= 0
+    dut.input__last <= 0
+    dut.rst <= 1
+    cocotb.fork(Clock(dut.clk, 10, 'ns').start())
+    yield RisingEdge(dut.clk)
+    dut.rst <= 0
+    yield RisingEdge(dut.clk)
+
+
+@cocotb.coroutine
+def check_data(dut, burps_in, burps_out):
+    size = 200
+    yield init_test(dut)
+    input_stream = DataStreamDriver(dut, 'input_', dut.clk)
+    output_stream = DataStreamDriver(dut, 'output_', dut.clk)
+    data = [random.getrandbits(len(input_stream.bus.data)) for _ in range(size)]
+    cocotb.fork(input_stream.send(data, burps=burps_in))
+    rcv = yield output_stream.recv(burps=burps_out)
+    assert data == rcv
+
+
+tf_check_data = TF(check_data)
+tf_check_data.add_option('burps_in', [False, True])
+tf_check_data.add_option('burps_out', [False, True])
+tf_check_data.generate_tests()
+
+
+@pytest.mark.parametrize("skid_buffer", [False, True])
+@pytest.mark.parametrize("width, stages", [(8, 1), (16, 5)])
+def test_main(width, stages, skid_buffer):
+    core = PipelineDelay(width, stages, skid_buffer=skid_buffer)
+    ports = [core.input[f] for f in core.input.fields]
+    ports += [core.output[f] for f in core.output.fields]
+    run(core, 'cores_nmigen.test.test_delay', ports=ports, vcd_file=None)
+
+
+@pytest.mark.parametrize("width, depth, implementation", [(8, 2, None),
+                                                          (8, 20, 'srl'),
+                                                          (8, 100, None),
+                                                         ])
+def test_delay_line(width, depth, implementation):
+    core = DelayLine(width, depth, implementation=implementation)
+    ports = [core.input[f] for f in core.input.fields]
+    ports += [core.output[f] for f in core.output.fields]
+    run(core, 'cores_nmigen.test.test_delay', ports=ports, vcd_file=None)
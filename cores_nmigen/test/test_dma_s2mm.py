@@ -0,0 +1,78 @@
+from nmigen_cocotb import run
+from cores_nmigen.dma import DmaS2MM
+import random
+import pytest
+import os
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge
+    from cocotb.clock import Clock
+    from cocotb.regression import TestFactory as TF
+    from .interfaces import *
+except:
+    pass
+
+CLK_PERIOD_BASE = 100
+random.seed()
+
+DATA_W = 64
+BEAT_BYTES = DATA_W // 8
+# (address, beats): aligned, crossing a 4KB boundary, longer than a burst
+transfers = [(0x0000, 40), (0x0F80, 100), (0x1FF0, 600), (0x3000, 1)]
+
+
+@cocotb.coroutine
+def init_test(dut, name):
+    getattr(dut, f'{name}_start') <= 0
+    getattr(dut, f'{name}_address') <= 0
+    getattr(dut, f'{name}_length') <= 0
+    dut.rst <= 1
+    cocotb.fork(Clock(dut.clk, 10, 'ns').start())
+    yield RisingEdge(dut.clk)
+    dut.rst <= 0
+    yield RisingEdge(dut.clk)
+
+
+@cocotb.coroutine
+def run_transfer(dut, name, addr, beats):
+    getattr(dut, f'{name}_address') <= addr
+    getattr(dut, f'{name}_length') <= beats * BEAT_BYTES
+    getattr(dut, f'{name}_start') <= 1
+    yield RisingEdge(dut.clk)
+    getattr(dut, f'{name}_start') <= 0
+    yield RisingEdge(dut.clk)
+    while getattr(dut, f'{name}_busy').value.integer:
+        yield RisingEdge(dut.clk)
+    assert getattr(dut, f'{name}_error').value.integer == 0
+
+
+@cocotb.coroutine
+def check_s2mm(dut, burps_in, burps_mem):
+    yield init_test(dut, 's2mm')
+    memory = Axi4MemoryModel(dut, 'm_axi_', dut.clk, burps=burps_mem)
+    yield memory.run()
+    input_stream = DataStreamDriver(dut, 'input_', dut.clk)
+    max_burst = int(os.environ['coco_param_max_burst'])
+
+    for addr, beats in transfers:
+        data = [random.getrandbits(DATA_W) for _ in range(beats)]
+        cocotb.fork(input_stream.send(data, burps=burps_in))
+        yield run_transfer(dut, 's2mm', addr, beats)
+        rd = [memory.memory.get(addr + i * BEAT_BYTES) for i in range(beats)]
+        assert rd == data
+    assert max([length for _, length in memory.bursts]) <= max_burst
+
+
+tf_test_s2mm = TF(check_s2mm)
+tf_test_s2mm.add_option('burps_in', [False, True])
+tf_test_s2mm.add_option('burps_mem', [False, True])
+tf_test_s2mm.generate_tests()
+
+
+@pytest.mark.parametrize("max_burst", [16, 256])
+def test_dma_s2mm(max_burst):
+    os.environ['coco_param_max_burst'] = str(max_burst)
+    core = DmaS2MM(addr_w=32, data_w=DATA_W, max_burst=max_burst, max_outstanding=4)
+    ports = core.get_ports()
+    run(core, 'cores_nmigen.test.test_dma_s2mm', ports=ports, vcd_file='./test_dma_s2mm.vcd')
@@ -1,5 +1,5 @@
 from nmigen_cocotb import run
-from cores_nmigen.fifo import StreamFifo
+from cores_nmigen.fifo import StreamFifo, StreamFifoPacked
 from cores_nmigen.interfaces import DataStream
 from cores_nmigen.test.interfaces import DataStreamDriver
 import random
@@ -51,3 +51,30 @@ def test_main(width, depth):
     ports = [fifo.input[f] for f in fifo.input.fields]   
     ports += [fifo.output[f] for f in fifo.output.fields]
     run(fifo, 'cores_nmigen.test.test_fifo', ports=ports, vcd_file='test_stream_fifo.vcd')
+
+
+@pytest.mark.parametrize("width, depth, ratio, memory_width", [(9, 64, 4, None), (9, 64, None, 36),
+                                                                (random.randint(2, 20), random.randint(4, 32), 2, None)])
+def test_packed(width, depth, ratio, memory_width):
+    fifo = StreamFifoPacked(input_stream=DataStream(width, 'sink', name='input'),
+                            output_stream=DataStream(width, 'source', name='output'),
+                            depth=depth,
+                            ratio=ratio,
+                            memory_width=memory_width)
+    ports = [fifo.input[f] for f in fifo.input.fields]
+    ports += [fifo.output[f] for f in fifo.output.fields]
+    run(fifo, 'cores_nmigen.test.test_fifo', ports=ports, vcd_file='test_stream_fifo_packed.vcd')
+
+
+@pytest.mark.parametrize("width, ratio, memory_width, word_width", [(8, 4, None, 35), (9, 4, None, 39), (8, None, 36, 35),
+                                                                    (9, None, 36, 29), (9, None, 72, 66)])
+def test_packed_word_width(width, ratio, memory_width, word_width):
+    # one word is the lanes and a tag for last and the lanes in use
+    fifo = StreamFifoPacked(input_stream=DataStream(width, 'sink', name='input'),
+                            output_stream=DataStream(width, 'source', name='output'),
+                            depth=16384,
+                            ratio=ratio,
+                            memory_width=memory_width)
+    assert fifo.word_width == word_width
+    assert fifo.fifo.fifo.width == word_width
+    assert fifo.fifo.fifo.depth >= 16384 // fifo.ratio
@@ -49,6 +49,24 @@ def check_data(dut, period_ns_w, period_ns_r, burps_in, burps_out, dummy=0):
     assert data == rcv, f'\n{data}\n!=\n{rcv}'
 
 
+@cocotb.coroutine
+def check_levels(dut, period_ns_w, period_ns_r):
+    yield init_test(dut, period_ns_w, period_ns_r)
+    input_stream = DataStreamDriver(dut, 'input_', dut.write_clk)
+    length = 2
+    data = [random.getrandbits(len(input_stream.bus.data)) for _ in range(length)]
+    yield input_stream.send(data)
+    yield RisingEdge(dut.write_clk)
+    assert dut.w_level.value.integer == length
+    for _ in range(8):
+        yield RisingEdge(dut.read_clk)
+    assert dut.r_level.value.integer == length
+    # once the first entry has moved to the output register
+    for _ in range(8):
+        yield RisingEdge(dut.write_clk)
+    assert dut.w_level.value.integer == length
+
+
 tf_check = TF(check_data)
 tf_check.add_option('period_ns_w', [10])
 tf_check.add_option('period_ns_r', [10, 22, 3])
@@ -57,14 +75,23 @@ tf_check.add_option('burps_out', [False, True])
 tf_check.add_option('dummy', [0] * 3)
 tf_check.generate_tests(postfix='_cdc')
 
+tf_check_levels = TF(check_levels)
+tf_check_levels.add_option('period_ns_w', [10])
+tf_check_levels.add_option('period_ns_r', [10, 22, 3])
+tf_check_levels.generate_tests(postfix='_cdc')
+
 
+@pytest.mark.parametrize("buffered, sync_stages", [(False, 2), (True, 2), (True, 3)])
 @pytest.mark.parametrize("width, depth", [(random.randint(2, 20), random.randint(2, 10))])
-def test_main(width, depth):
+def test_main(width, depth, buffered, sync_stages):
     fifo = StreamFifoCDC(input_stream=DataStream(width, 'sink', name='input'),
                          output_stream=DataStream(width, 'source', name='output'),
                          depth=depth,
                          r_domain='read',
-                         w_domain='write')
+                         w_domain='write',
+                         buffered=buffered,
+                         sync_stages=sync_stages)
     ports = [fifo.input[f] for f in fifo.input.fields]   
     ports += [fifo.output[f] for f in fifo.output.fields]
+    ports += [fifo.w_level, fifo.r_level]
     run(fifo, 'cores_nmigen.test.test_fifo_cdc', ports=ports, vcd_file='test_stream_fifo_cdc.vcd')
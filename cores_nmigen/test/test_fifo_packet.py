@@ -0,0 +1,127 @@
+from nmigen_cocotb import run
+from cores_nmigen.fifo import StreamFifo
+from cores_nmigen.interfaces import DataStream
+from cores_nmigen.test.interfaces import DataStreamDriver
+import random
+import pytest
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge
+    from cocotb.clock import Clock
+    from cocotb.utils import get_sim_time
+    from cocotb.regression import TestFactory as TF
+except:
+    pass
+
+ALMOST_FULL = 12
+ALMOST_EMPTY = 2
+DEPTH = 16
+CLK_PERIOD_NS = 10
+
+
+@cocotb.coroutine
+def init_test(dut):
+    dut.output__ready <= 0
+    dut.input__valid <= 0
+    dut.input__data <= 0
+    dut.input__last <= 0
+    dut.almost_full_threshold <= ALMOST_FULL
+    dut.almost_empty_threshold <= ALMOST_EMPTY
+    dut.rst <= 1
+    cocotb.fork(Clock(dut.clk, CLK_PERIOD_NS, 'ns').start())
+    yield RisingEdge(dut.clk)
+    dut.rst <= 0
+    yield RisingEdge(dut.clk)
+
+
+@cocotb.coroutine
+def check_store_and_forward(dut, burps_in):
+    """
+    description
+        The output must stay idle until the whole packet has been written,
+        and then deliver it without gaps.
+    """
+    yield init_test(dut)
+    input_stream = DataStreamDriver(dut, 'input_', dut.clk)
+    output_stream = DataStreamDriver(dut, 'output_', dut.clk)
+    length = random.randint(2, 6)
+    data = [random.getrandbits(len(input_stream.bus.data)) for _ in range(length)]
+    dut.output__ready <= 1
+
+    cocotb.fork(input_stream.send(data, burps=burps_in))
+    written = 0
+    while written < length:
+        yield RisingEdge(dut.clk)
+        assert dut.output__valid.value.integer == 0
+        if input_stream.accepted():
+            written += 1
+
+    yield RisingEdge(dut.clk)
+    assert dut.packet_count.value.integer == 1
+    assert dut.level.value.integer == length
+    rcv = yield output_stream.recv()
+    assert data == rcv
+    yield RisingEdge(dut.clk)
+    assert dut.packet_count.value.integer == 0
+    assert dut.level.value.integer == 0
+
+
+@cocotb.coroutine
+def check_oversized(dut):
+    """
+    description
+        A packet longer than the FIFO must go out once the FIFO is full,
+        one beat per cycle up to its last beat.
+    """
+    yield init_test(dut)
+    input_stream = DataStreamDriver(dut, 'input_', dut.clk)
+    output_stream = DataStreamDriver(dut, 'output_', dut.clk)
+    length = 3 * DEPTH
+    data = [random.getrandbits(len(input_stream.bus.data)) for _ in range(length)]
+
+    cocotb.fork(input_stream.send(data))
+    while not dut.output__valid.value.integer:
+        yield RisingEdge(dut.clk)
+    start = get_sim_time('ns')
+    rcv = yield output_stream.recv()
+    cycles = (get_sim_time('ns') - start) // CLK_PERIOD_NS
+    assert data == rcv
+    assert cycles <= length + 1, f'{length} beats took {cycles} cycles'
+
+
+@cocotb.coroutine
+def check_flags(dut):
+    yield init_test(dut)
+    input_stream = DataStreamDriver(dut, 'input_', dut.clk)
+    for length in range(1, ALMOST_FULL + 2):
+        yield input_stream.send([random.getrandbits(len(input_stream.bus.data))])
+        yield RisingEdge(dut.clk)
+        level = dut.level.value.integer
+        assert level == length
+        assert dut.almost_full.value.integer == int(level >= ALMOST_FULL)
+        assert dut.almost_empty.value.integer == int(level <= ALMOST_EMPTY)
+
+
+tf_check_saf = TF(check_store_and_forward)
+tf_check_saf.add_option('burps_in', [False, True])
+tf_check_saf.generate_tests()
+
+tf_check_oversized = TF(check_oversized)
+tf_check_oversized.generate_tests()
+
+tf_check_flags = TF(check_flags)
+tf_check_flags.generate_tests()
+
+
+@pytest.mark.parametrize("width, depth", [(8, DEPTH)])
+def test_main(width, depth):
+    fifo = StreamFifo(input_stream=DataStream(width, 'sink', name='input'),
+                      output_stream=DataStream(width, 'source', name='output'),
+                      depth=depth,
+                      packet_mode=True)
+    ports = [fifo.input[f] for f in fifo.input.fields]
+    ports += [fifo.output[f] for f in fifo.output.fields]
+    ports += [fifo.level, fifo.packet_count, fifo.almost_full, fifo.almost_empty,
+              fifo.almost_full_threshold, fifo.almost_empty_threshold]
+    run(fifo, 'cores_nmigen.test.test_fifo_packet', ports=ports, vcd_file='test_stream_fifo_packet.vcd')
@@ -0,0 +1,138 @@
+from nmigen_cocotb import run
+from cores_nmigen.test.interfaces import DataStreamDriver
+from cores_nmigen.fir import FirFilter
+from cores_nmigen.utils.twos_comp import twos_comp_from_int, int_from_twos_comp
+import random
+import pytest
+import os
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge
+    from cocotb.clock import Clock
+    from cocotb.regression import TestFactory as TF
+except:
+    pass
+
+CLK_PERIOD_BASE = 100
+WIDTH = 8
+COEFFICIENT_W = 10
+
+
+@cocotb.coroutine
+def init_test(dut):
+    dut.rst <= 1
+    cocotb.fork(Clock(dut.clk, 10, 'ns').start())
+    yield RisingEdge(dut.clk)
+    dut.rst <= 0
+    yield RisingEdge(dut.clk)
+
+
+def fir_model(samples, coefficients, decimation, interpolation, output_shift, output_w):
+    upsampled = []
+    for s in samples:
+        upsampled += [s] + [0] * (interpolation - 1)
+    result = [sum([c * upsampled[n - k] for k, c in enumerate(coefficients) if n >= k])
+              for n in range(0, len(upsampled), decimation)]
+    return [min(max(r >> output_shift, -2**(output_w-1)), 2**(output_w-1)-1) for r in result]
+
+
+def random_coefficients(n, symmetric):
+    if symmetric:
+        half = [random.randint(-2**(COEFFICIENT_W-1), 2**(COEFFICIENT_W-1)-1) for _ in range((n + 1) // 2)]
+        return half + (half[:-1] if n % 2 else half)[::-1]
+    return [random.randint(-2**(COEFFICIENT_W-1), 2**(COEFFICIENT_W-1)-1) for _ in range(n)]
+
+
+@cocotb.coroutine
+def check_filter(dut, burps_in, burps_out):
+    test_size = 60
+    coefficients = [int(c) for c in os.environ['coco_param_coefficients'].split(',')]
+    decimation = int(os.environ['coco_param_decimation'])
+    interpolation = int(os.environ['coco_param_interpolation'])
+    output_shift = int(os.environ['coco_param_output_shift'])
+    output_w = int(os.environ['coco_param_output_w'])
+
+    yield init_test(dut)
+
+    m_axis = DataStreamDriver(dut, 'input_', dut.clk)
+    s_axis = DataStreamDriver(dut, 'output_', dut.clk)
+
+    samples = [random.randint(-2**(WIDTH-1), 2**(WIDTH-1)-1) for _ in range(test_size)]
+    expected = fir_model(samples, coefficients, decimation, interpolation, output_shift, output_w)
+
+    cocotb.fork(m_axis.send([twos_comp_from_int(s, WIDTH) for s in samples], burps=burps_in))
+    rcv = yield s_axis.recv(len(expected), burps=burps_out)
+    rcv = [int_from_twos_comp(r, output_w) for r in rcv]
+    assert rcv == expected, f'{rcv} == {expected}'
+
+
+@cocotb.coroutine
+def check_reload(dut):
+    test_size = 40
+    coefficients = random_coefficients(5, symmetric=True)
+    output_w = int(os.environ['coco_param_output_w'])
+
+    yield init_test(dut)
+    dut.fir_load <= 0
+
+    m_axis = DataStreamDriver(dut, 'input_', dut.clk)
+    s_axis = DataStreamDriver(dut, 'output_', dut.clk)
+
+    for k, c in enumerate(coefficients[:3]):
+        getattr(dut, f'fir_coefficient_{k}') <= twos_comp_from_int(c, COEFFICIENT_W)
+    dut.fir_load <= 1
+    yield RisingEdge(dut.clk)
+    dut.fir_load <= 0
+
+    samples = [random.randint(-2**(WIDTH-1), 2**(WIDTH-1)-1) for _ in range(test_size)]
+    cocotb.fork(m_axis.send([twos_comp_from_int(s, WIDTH) for s in samples]))
+    rcv = yield s_axis.recv()
+    rcv = [int_from_twos_comp(r, output_w) for r in rcv]
+    expected = fir_model(samples, coefficients, 1, 1, 0, output_w)
+    assert rcv == expected, f'{rcv} == {expected}'
+
+
+if 'coco_param_coefficients' in os.environ:
+    if os.environ['coco_param_reload'] == '1':
+        tf_test_reload = TF(check_reload)
+        tf_test_reload.generate_tests()
+    else:
+        tf_test_filter = TF(check_filter)
+        tf_test_filter.add_option('burps_in', [False, True])
+        tf_test_filter.add_option('burps_out', [False, True])
+        tf_test_filter.generate_tests()
+
+
+@pytest.mark.parametrize("output_w, output_shift", [(None, 0), (8, 6)])
+@pytest.mark.parametrize("n, symmetric, decimation, interpolation", [(7, False, 1, 1),
+                                                                     (7, True, 1, 1),
+                                                                     (8, True, 1, 1),
+                                                                     (8, False, 3, 1),
+                                                                     (8, False, 1, 3),
+                                                                    ])
+def test_fir(n, symmetric, decimation, interpolation, output_w, output_shift):
+    coefficients = random_coefficients(n, symmetric)
+    core = FirFilter(width=WIDTH, coefficients=coefficients, coefficient_w=COEFFICIENT_W, output_w=output_w,
+                     output_shift=output_shift, symmetric=symmetric, decimation=decimation,
+                     interpolation=interpolation)
+    os.environ['coco_param_coefficients'] = ','.join([str(c) for c in coefficients])
+    os.environ['coco_param_decimation'] = str(decimation)
+    os.environ['coco_param_interpolation'] = str(interpolation)
+    os.environ['coco_param_output_shift'] = str(output_shift)
+    os.environ['coco_param_output_w'] = str(core.output_w)
+    os.environ['coco_param_reload'] = '0'
+    ports = core.get_ports()
+    vcd_file = f'./test_fir_n{n}_s{int(symmetric)}_d{decimation}_i{interpolation}_o{output_shift}.vcd'
+    run(core, 'cores_nmigen.test.test_fir', ports=ports, vcd_file=vcd_file)
+
+
+def test_fir_reload():
+    coefficients = random_coefficients(5, symmetric=True)
+    core = FirFilter(width=WIDTH, coefficients=coefficients, coefficient_w=COEFFICIENT_W, symmetric=True,
+                     reload=True)
+    os.environ['coco_param_coefficients'] = ','.join([str(c) for c in coefficients])
+    os.environ['coco_param_output_w'] = str(core.output_w)
+    os.environ['coco_param_reload'] = '1'
+    ports = core.get_ports()
+    run(core, 'cores_nmigen.test.test_fir', ports=ports, vcd_file='./test_fir_reload.vcd')
@@ -0,0 +1,98 @@
+from nmigen_cocotb import run
+import cores_nmigen.utils.matrix as mat
+from cores_nmigen.test.interfaces import MatrixStreamDriver, DataStreamDriver
+from cores_nmigen.line_buffer import LineBuffer
+import random
+import pytest
+import os
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge
+    from cocotb.clock import Clock
+    from cocotb.regression import TestFactory as TF
+except:
+    pass
+
+CLK_PERIOD_BASE = 100
+WIDTH = 8
+
+
+@cocotb.coroutine
+def init_test(dut):
+    dut.rst <= 1
+    cocotb.fork(Clock(dut.clk, 10, 'ns').start())
+    yield RisingEdge(dut.clk)
+    dut.rst <= 0
+    yield RisingEdge(dut.clk)
+
+
+def windows(image, shape, border):
+    rows, columns = shape
+    result = []
+    for y in range(len(image)):
+        for x in range(len(image[0])):
+            if border == 'valid' and (y < rows - 1 or x < columns - 1):
+                continue
+            window = mat.create_empty_matrix(shape)
+            for i, j in mat.matrix_indexes(shape):
+                yy, xx = y - (rows - 1 - i), x - (columns - 1 - j)
+                mat.set_matrix_element(window, (i, j), image[yy][xx] if yy >= 0 and xx >= 0 else 0)
+            result.append(window)
+    return result
+
+
+@cocotb.coroutine
+def send_frames(driver, images, burps):
+    for image in images:
+        yield driver.send([pixel for line in image for pixel in line], burps=burps)
+
+
+@cocotb.coroutine
+def check_windows(dut, burps_in, burps_out):
+    test_size = 3
+    line_w = int(os.environ['coco_param_line_w'])
+    lines = int(os.environ['coco_param_lines'])
+    shape = string_to_tuple(os.environ['coco_param_shape'])
+    border = os.environ['coco_param_border']
+
+    yield init_test(dut)
+
+    m_axis = DataStreamDriver(dut, 'input_', dut.clk)
+    s_axis = MatrixStreamDriver(dut, name='output_', clock=dut.clk, shape=shape)
+    s_axis.init_source()
+
+    images = [[[random.getrandbits(WIDTH) for x in range(line_w)] for y in range(lines)] for _ in range(test_size)]
+    cocotb.fork(send_frames(m_axis, images, burps_in))
+    for image in images:
+        # recv stops on the window of the frame's last pixel
+        rcv = yield s_axis.recv(burps=burps_out)
+        expected = windows(image, shape, border)
+        assert rcv == expected, f'{rcv} == {expected}'
+
+
+string_to_tuple = lambda string: tuple([int(i) for i in string.replace('(', '').replace(')', '').split(',') if i])
+
+if 'coco_param_line_w' in os.environ:
+    tf_test_windows = TF(check_windows)
+    tf_test_windows.add_option('burps_in', [False, True])
+    tf_test_windows.add_option('burps_out', [False, True])
+    tf_test_windows.generate_tests()
+
+
+@pytest.mark.parametrize("border", LineBuffer.BORDERS)
+@pytest.mark.parametrize("line_w, lines, shape", [(6, 5, (3, 3)),
+                                                  (5, 4, (2, 3)),
+                                                  (4, 4, (1, 3)),
+                                                  (7, 6, (5, 5)),
+                                                 ])
+def test_line_buffer(line_w, lines, shape, border):
+    os.environ['coco_param_line_w'] = str(line_w)
+    os.environ['coco_param_lines'] = str(lines)
+    os.environ['coco_param_shape'] = str(shape)
+    os.environ['coco_param_border'] = border
+    core = LineBuffer(width=WIDTH, line_w=line_w, shape=shape, border=border)
+    ports = core.get_ports()
+    printable_shape = '_'.join([str(i) for i in shape])
+    vcd_file = f'./test_line_buffer_w{line_w}_shape{printable_shape}_{border}.vcd'
+    run(core, 'cores_nmigen.test.test_line_buffer', ports=ports, vcd_file=vcd_file)
@@ -0,0 +1,118 @@
+from nmigen_cocotb import run
+import cores_nmigen.utils.matrix as mat
+from cores_nmigen.utils.twos_comp import twos_comp_from_int, int_from_twos_comp
+from cores_nmigen.test.interfaces import MatrixStreamDriver
+from cores_nmigen.matrix_multiplier import MatrixMultiplier
+import numpy as np
+import random
+import pytest
+import os
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge
+    from cocotb.clock import Clock
+    from cocotb.regression import TestFactory as TF
+except:
+    pass
+
+CLK_PERIOD_BASE = 100
+WIDTH = 8
+
+
+@cocotb.coroutine
+def init_test(dut):
+    dut.rst <= 1
+    cocotb.fork(Clock(dut.clk, 10, 'ns').start())
+    yield RisingEdge(dut.clk)
+    dut.rst <= 0
+    yield RisingEdge(dut.clk)
+
+
+def random_matrix(shape, signed):
+    low, high = (-2**(WIDTH-1), 2**(WIDTH-1)-1) if signed else (0, 2**WIDTH-1)
+    return np.array([random.randint(low, high) for _ in range(mat.get_n_elements(shape))]).reshape(shape)
+
+
+def to_port(matrix, signed, width):
+    port = mat.create_empty_matrix(matrix.shape)
+    for idx in mat.matrix_indexes(matrix.shape):
+        value = int(matrix[idx])
+        mat.set_matrix_element(port, idx, twos_comp_from_int(value, width) if signed else value)
+    return port
+
+
+def from_port(port, shape, signed, width):
+    matrix = np.zeros(shape, dtype=object)
+    for idx in mat.matrix_indexes(shape):
+        value = mat.get_matrix_element(port, idx)
+        matrix[idx] = int_from_twos_comp(value, width) if signed else value
+    return matrix
+
+
+def expected_product(a, b, shape_out, signed, output_w, output_shift):
+    result = np.array(np.dot(a, b), dtype=object).reshape(shape_out) // 2**output_shift
+    if signed:
+        return np.clip(result, -2**(output_w-1), 2**(output_w-1)-1)
+    return np.clip(result, 0, 2**output_w-1)
+
+
+@cocotb.coroutine
+def check_product(dut, burps_in, burps_out):
+    test_size = 20
+    shape_a = string_to_tuple(os.environ['coco_param_shape_a'])
+    shape_b = string_to_tuple(os.environ['coco_param_shape_b'])
+    shape_out = string_to_tuple(os.environ['coco_param_shape_out'])
+    signed = int(os.environ['coco_param_signed'])
+    output_w = int(os.environ['coco_param_output_w'])
+    output_shift = int(os.environ['coco_param_output_shift'])
+
+    yield init_test(dut)
+
+    input_a = MatrixStreamDriver(dut, name='input_a_', clock=dut.clk, shape=shape_a)
+    input_b = MatrixStreamDriver(dut, name='input_b_', clock=dut.clk, shape=shape_b)
+    output = MatrixStreamDriver(dut, name='output_', clock=dut.clk, shape=shape_out)
+    input_a.init_sink()
+    input_b.init_sink()
+    output.init_source()
+
+    a = [random_matrix(shape_a, signed) for _ in range(test_size)]
+    b = [random_matrix(shape_b, signed) for _ in range(test_size)]
+
+    cocotb.fork(input_a.send([to_port(x, signed, WIDTH) for x in a], burps=burps_in))
+    cocotb.fork(input_b.send([to_port(x, signed, WIDTH) for x in b], burps=burps_in))
+    rcv = yield output.recv(burps=burps_out)
+
+    assert len(rcv) == test_size
+    for x, y, port in zip(a, b, rcv):
+        expected = expected_product(x, y, shape_out, signed, output_w, output_shift)
+        result = from_port(port, shape_out, signed, output_w)
+        assert (result == expected).all(), f'{result} == {expected}'
+
+
+string_to_tuple = lambda string: tuple([int(i) for i in string.replace('(', '').replace(')', '').split(',') if i])
+
+if 'coco_param_shape_a' in os.environ:
+    tf_test_product = TF(check_product)
+    tf_test_product.add_option('burps_in', [False, True])
+    tf_test_product.add_option('burps_out', [False, True])
+    tf_test_product.generate_tests()
+
+
+@pytest.mark.parametrize("output_w, output_shift", [(None, 0), (8, 4)])
+@pytest.mark.parametrize("signed", [True, False])
+@pytest.mark.parametrize("shape_a, shape_b", [((3, 4), (4, 2)),
+                                              ((4, 5), (5,)),
+                                              ((6,), (6,)),
+                                             ])
+def test_matrix_multiplier(shape_a, shape_b, signed, output_w, output_shift):
+    core = MatrixMultiplier(width=WIDTH, shape_a=shape_a, shape_b=shape_b, signed=signed,
+                            output_w=output_w, output_shift=output_shift)
+    os.environ['coco_param_shape_a'] = str(shape_a)
+    os.environ['coco_param_shape_b'] = str(shape_b)
+    os.environ['coco_param_shape_out'] = str(core.shape_out)
+    os.environ['coco_param_signed'] = str(int(signed))
+    os.environ['coco_param_output_w'] = str(core.output_w)
+    os.environ['coco_param_output_shift'] = str(output_shift)
+    ports = core.get_ports()
+    run(core, 'cores_nmigen.test.test_matrix_multiplier', ports=ports, vcd_file='./test_matrix_multiplier.vcd')
@@ -0,0 +1,127 @@
+from nmigen_cocotb import run
+import cores_nmigen.utils.matrix as mat
+from cores_nmigen.test.interfaces import MatrixStreamDriver, DataStreamDriver
+from cores_nmigen.matrix_serdes import MatrixSerializer, MatrixDeserializer
+import random
+import pytest
+import os
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge
+    from cocotb.clock import Clock
+    from cocotb.regression import TestFactory as TF
+except:
+    pass
+
+CLK_PERIOD_BASE = 100
+WIDTH = 8
+
+
+@cocotb.coroutine
+def init_test(dut):
+    dut.rst <= 1
+    cocotb.fork(Clock(dut.clk, 10, 'ns').start())
+    yield RisingEdge(dut.clk)
+    dut.rst <= 0
+    yield RisingEdge(dut.clk)
+
+
+def random_matrix(shape):
+    matrix = mat.create_empty_matrix(shape)
+    for idx in mat.matrix_indexes(shape):
+        mat.set_matrix_element(matrix, idx, random.getrandbits(WIDTH))
+    return matrix
+
+
+def serialize(matrix, shape, lanes, order):
+    elements = [mat.get_matrix_element(matrix, idx) for idx in mat.matrix_indexes(shape, order)]
+    elements += [0] * (-len(elements) % lanes)
+    return [sum([e << (WIDTH * j) for j, e in enumerate(elements[i:i+lanes])])
+            for i in range(0, len(elements), lanes)]
+
+
+@cocotb.coroutine
+def check_serializer(dut, shape, lanes, order, burps_in, burps_out):
+    test_size = 10
+    yield init_test(dut)
+
+    m_axis = MatrixStreamDriver(dut, name='input_', clock=dut.clk, shape=shape)
+    s_axis = DataStreamDriver(dut, 'output_', dut.clk)
+    m_axis.init_sink()
+    dut.output__ready <= 0
+
+    data = [random_matrix(shape) for _ in range(test_size)]
+    expected = []
+    for matrix in data:
+        expected += serialize(matrix, shape, lanes, order)
+
+    cocotb.fork(m_axis.send(data, burps=burps_in))
+    rcv = yield s_axis.recv(burps=burps_out)
+    assert rcv == expected, f'{rcv} == {expected}'
+
+
+@cocotb.coroutine
+def check_deserializer(dut, shape, lanes, order, burps_in, burps_out):
+    test_size = 10
+    yield init_test(dut)
+
+    m_axis = DataStreamDriver(dut, 'input_', dut.clk)
+    s_axis = MatrixStreamDriver(dut, name='output_', clock=dut.clk, shape=shape)
+    s_axis.init_source()
+    dut.input__valid <= 0
+
+    data = [random_matrix(shape) for _ in range(test_size)]
+    beats = []
+    for matrix in data:
+        beats += serialize(matrix, shape, lanes, order)
+
+    cocotb.fork(s_axis.monitor())
+    cocotb.fork(s_axis.recv(test_size, burps=burps_out))
+    yield m_axis.send(beats, burps=burps_in)
+    while len(s_axis.buffer) < test_size:
+        yield RisingEdge(dut.clk)
+    assert s_axis.buffer == data, f'{s_axis.buffer} == {data}'
+
+
+try:
+    string_to_tuple = lambda string: tuple([int(i) for i in string.replace('(', '').replace(')', '').split(',') if i])
+    running_cocotb = True
+    shape = string_to_tuple(os.environ['coco_param_shape'])
+    lanes = int(os.environ['coco_param_lanes'])
+    order = os.environ['coco_param_order']
+    core_name = os.environ['coco_param_core']
+except KeyError as e:
+    running_cocotb = False
+
+if running_cocotb:
+    tf_test_data = TF(check_serializer if core_name == 'serializer' else check_deserializer)
+    tf_test_data.add_option('shape', [shape])
+    tf_test_data.add_option('lanes', [lanes])
+    tf_test_data.add_option('order', [order])
+    tf_test_data.add_option('burps_in', [False, True])
+    tf_test_data.add_option('burps_out', [False, True])
+    tf_test_data.generate_tests()
+
+
+@pytest.mark.parametrize("order", ['row', 'column'])
+@pytest.mark.parametrize("shape, lanes", [((4, 2), 1),
+                                          ((4, 2), 2),
+                                          ((4, 2), 3),
+                                          ((4, 2), 8),
+                                          ((4, 3, 2), 4),
+                                         ])
+@pytest.mark.parametrize("core_name", ['serializer', 'deserializer'])
+def test_matrix_serdes(core_name, shape, lanes, order):
+    os.environ['coco_param_shape'] = str(shape)
+    os.environ['coco_param_lanes'] = str(lanes)
+    os.environ['coco_param_order'] = order
+    os.environ['coco_param_core'] = core_name
+    if core_name == 'serializer':
+        core = MatrixSerializer(width=WIDTH, shape=shape, lanes=lanes, order=order)
+    else:
+        core = MatrixDeserializer(width=WIDTH, shape=shape, lanes=lanes, order=order)
+    ports = core.get_ports()
+    printable_shape = '_'.join([str(i) for i in shape])
+    vcd_file = f'./test_matrix_{core_name}_shape{printable_shape}_l{lanes}_{order}.vcd'
+    run(core, 'cores_nmigen.test.test_matrix_serdes', ports=ports, vcd_file=vcd_file)
@@ -0,0 +1,101 @@
+from nmigen_cocotb import run
+import cores_nmigen.utils.matrix as mat
+from cores_nmigen.test.interfaces import MatrixStreamDriver, DataStreamDriver
+from cores_nmigen.reduction_tree import ReductionTree, OPERATORS
+from cores_nmigen.utils.twos_comp import int_from_twos_comp
+from functools import reduce
+import random
+import pytest
+import os
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge
+    from cocotb.clock import Clock
+    from cocotb.regression import TestFactory as TF
+except:
+    pass
+
+CLK_PERIOD_BASE = 100
+WIDTH = 8
+
+
+@cocotb.coroutine
+def init_test(dut):
+    dut.rst <= 1
+    cocotb.fork(Clock(dut.clk, 10, 'ns').start())
+    yield RisingEdge(dut.clk)
+    dut.rst <= 0
+    yield RisingEdge(dut.clk)
+
+
+def random_matrix(shape):
+    matrix = mat.create_empty_matrix(shape)
+    for idx in mat.matrix_indexes(shape):
+        mat.set_matrix_element(matrix, idx, random.getrandbits(WIDTH))
+    return matrix
+
+
+def expected_result(matrix, shape, operator, signed, output_w):
+    elements = [mat.get_matrix_element(matrix, idx) for idx in mat.matrix_indexes(shape)]
+    values = [int_from_twos_comp(e, WIDTH) for e in elements] if signed else elements
+    if operator == 'and':
+        return reduce(lambda a, b: a & b, elements)
+    if operator == 'or':
+        return reduce(lambda a, b: a | b, elements)
+    if operator == 'xor':
+        return reduce(lambda a, b: a ^ b, elements)
+    if operator == 'add':
+        return sum(values) % 2**output_w
+    if operator in ('min', 'max'):
+        return elements[values.index(min(values) if operator == 'min' else max(values))]
+    index = values.index(min(values) if operator == 'argmin' else max(values))
+    return index | (elements[index] << (output_w - WIDTH))
+
+
+@cocotb.coroutine
+def check_reduction(dut, burps_in, burps_out):
+    test_size = 20
+    shape = string_to_tuple(os.environ['coco_param_shape'])
+    operator = os.environ['coco_param_operator']
+    signed = int(os.environ['coco_param_signed'])
+    output_w = int(os.environ['coco_param_output_w'])
+
+    yield init_test(dut)
+
+    m_axis = MatrixStreamDriver(dut, name='input_', clock=dut.clk, shape=shape)
+    s_axis = DataStreamDriver(dut, 'output_', dut.clk)
+    m_axis.init_sink()
+    dut.output__ready <= 0
+
+    data = [random_matrix(shape) for _ in range(test_size)]
+    expected = [expected_result(matrix, shape, operator, signed, output_w) for matrix in data]
+
+    cocotb.fork(m_axis.send(data, burps=burps_in))
+    rcv = yield s_axis.recv(burps=burps_out)
+    assert rcv == expected, f'{rcv} == {expected}'
+
+
+string_to_tuple = lambda string: tuple([int(i) for i in string.replace('(', '').replace(')', '').split(',') if i])
+
+if 'coco_param_shape' in os.environ:
+    tf_test_reduction = TF(check_reduction)
+    tf_test_reduction.add_option('burps_in', [False, True])
+    tf_test_reduction.add_option('burps_out', [False, True])
+    tf_test_reduction.generate_tests()
+
+
+@pytest.mark.parametrize("register_every", [1, 2])
+@pytest.mark.parametrize("signed", [False, True])
+@pytest.mark.parametrize("operator", OPERATORS)
+@pytest.mark.parametrize("shape", [(7,), (4, 4)])
+def test_reduction_tree(shape, operator, signed, register_every):
+    core = ReductionTree(width=WIDTH, shape=shape, operator=operator, signed=signed, register_every=register_every)
+    os.environ['coco_param_shape'] = str(shape)
+    os.environ['coco_param_operator'] = operator
+    os.environ['coco_param_signed'] = str(int(signed))
+    os.environ['coco_param_output_w'] = str(core.output_w)
+    ports = core.get_ports()
+    printable_shape = '_'.join([str(i) for i in shape])
+    vcd_file = f'./test_reduction_tree_shape{printable_shape}_{operator}_s{int(signed)}_r{register_every}.vcd'
+    run(core, 'cores_nmigen.test.test_reduction_tree', ports=ports, vcd_file=vcd_file)
@@ -55,9 +55,10 @@ tf_test.add_option('burps_out', [False, True])
 tf_test.generate_tests()
 
 
+@pytest.mark.parametrize("skid_buffer", [False, True])
 @pytest.mark.parametrize("width", [12, 24, 48])
-def test_main(width):
-    shifter = PipelinedBarrelShifter(width)
+def test_main(width, skid_buffer):
+    shifter = PipelinedBarrelShifter(width, skid_buffer=skid_buffer)
     ports = [shifter.input[f] for f in shifter.input.fields]   
     ports += [shifter.output[f] for f in shifter.output.fields]
     run(shifter, 'cores_nmigen.test.test_shifter', ports=ports, vcd_file=None)
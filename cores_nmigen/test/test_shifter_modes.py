@@ -0,0 +1,84 @@
+from nmigen_cocotb import run
+from cores_nmigen.shifters import PipelinedBarrelShifter
+from cores_nmigen.shifters import ROTATE_LEFT, ROTATE_RIGHT, SHIFT_LEFT, SHIFT_RIGHT, SHIFT_RIGHT_ARITH
+from cores_nmigen.utils.twos_comp import int_from_twos_comp
+import random
+import pytest
+from .interfaces import *
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge
+    from cocotb.clock import Clock
+    from cocotb.regression import TestFactory as TF
+except:
+    pass
+
+MODES = [ROTATE_LEFT, ROTATE_RIGHT, SHIFT_LEFT, SHIFT_RIGHT, SHIFT_RIGHT_ARITH]
+
+
+def expected_result(data, shift, mode, width):
+    mask = 2**width - 1
+    if mode == ROTATE_LEFT:
+        shift = shift % width
+        return ((data << shift) | (data >> (width - shift))) & mask
+    elif mode == ROTATE_RIGHT:
+        shift = shift % width
+        return ((data >> shift) | (data << (width - shift))) & mask
+    elif mode == SHIFT_LEFT:
+        return (data << shift) & mask
+    elif mode == SHIFT_RIGHT:
+        return data >> shift
+    elif mode == SHIFT_RIGHT_ARITH:
+        return (int_from_twos_comp(data, width) >> shift) & mask
+
+
+@cocotb.coroutine
+def init_test(dut):
+    dut.output__ready <= 0
+    dut.input__valid <= 0
+    dut.input__data <= 0
+    dut.input__shift <= 0
+    dut.input__mode <= 0
+    dut.input__last <= 0
+    dut.rst <= 1
+    cocotb.fork(Clock(dut.clk, 10, 'ns').start())
+    yield RisingEdge(dut.clk)
+    dut.rst <= 0
+    yield RisingEdge(dut.clk)
+
+
+@cocotb.coroutine
+def check_data(dut, burps_in, burps_out):
+    yield init_test(dut)
+    input_stream = ShifterModeStreamDriver(dut, 'input_', dut.clk)
+    output_stream = ShifterModeStreamDriver(dut, 'output_', dut.clk)
+    width = len(input_stream.bus.data)
+    size = 200
+
+    data = [(random.getrandbits(width),
+             random.randint(0, width),
+             random.choice(MODES)) for _ in range(size)]
+    cocotb.fork(input_stream.send(data, burps=burps_in))
+    rcv = yield output_stream.recv(burps=burps_out)
+
+    assert len(rcv) == size, f'{len(rcv)} == {size}'
+    for (i_data, i_shift, i_mode), (o_data, o_shift, o_mode) in zip(data, rcv):
+        expected = expected_result(i_data, i_shift, i_mode, width)
+        assert o_data == expected, f'mode {i_mode}, shift {i_shift}: {hex(o_data)} == {hex(expected)}'
+        assert (o_shift, o_mode) == (i_shift, i_mode)
+
+
+tf_test = TF(check_data)
+tf_test.add_option('burps_in', [False, True])
+tf_test.add_option('burps_out', [False, True])
+tf_test.generate_tests()
+
+
+@pytest.mark.parametrize("levels_per_stage", [1, 2, 6])
+@pytest.mark.parametrize("width", [16, 48])
+def test_main(width, levels_per_stage):
+    shifter = PipelinedBarrelShifter(width, levels_per_stage=levels_per_stage, mode=True)
+    ports = [shifter.input[f] for f in shifter.input.fields]
+    ports += [shifter.output[f] for f in shifter.output.fields]
+    run(shifter, 'cores_nmigen.test.test_shifter_modes', ports=ports, vcd_file=None)
@@ -0,0 +1,92 @@
+from nmigen_cocotb import run
+from cores_nmigen.stream_monitor import StreamMonitor
+from cores_nmigen.interfaces import DataStream
+import random
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge
+    from cocotb.clock import Clock
+    from cocotb.regression import TestFactory as TF
+except:
+    pass
+
+CYCLES = 500
+
+
+@cocotb.coroutine
+def init_test(dut):
+    dut.input__valid <= 0
+    dut.input__ready <= 0
+    dut.input__last <= 0
+    dut.input__data <= 0
+    dut.monitor_snapshot <= 0
+    dut.monitor_clear <= 0
+    dut.rst <= 1
+    cocotb.fork(Clock(dut.clk, 10, 'ns').start())
+    yield RisingEdge(dut.clk)
+    dut.rst <= 0
+
+
+@cocotb.coroutine
+def pulse(signal, clk):
+    signal <= 1
+    yield RisingEdge(clk)
+    signal <= 0
+    yield RisingEdge(clk)
+
+
+@cocotb.coroutine
+def check_counters(dut):
+    yield init_test(dut)
+    yield pulse(dut.monitor_clear, dut.clk)
+
+    cycles = beats = packets = stalls = starves = max_packet = length = 0
+    for _ in range(CYCLES):
+        valid, ready, last = [random.randint(0, 1) for _ in range(3)]
+        dut.input__valid <= valid
+        dut.input__ready <= ready
+        dut.input__last <= last
+        yield RisingEdge(dut.clk)
+        cycles += 1
+        if valid and ready:
+            beats += 1
+            if last:
+                packets += 1
+                max_packet = max(max_packet, length + 1)
+                length = 0
+            else:
+                length += 1
+        stalls += valid and not ready
+        starves += ready and not valid
+
+    dut.input__valid <= 0
+    dut.input__ready <= 0
+    # the cycle after the clear pulse is counted too
+    cycles += 1
+    yield pulse(dut.monitor_snapshot, dut.clk)
+
+    expected = {'cycles': cycles, 'beats': beats, 'packets': packets, 'stalls': stalls,
+                'starves': starves, 'max_packet': max_packet}
+    for counter, value in expected.items():
+        rd = getattr(dut, 'monitor_' + counter).value.integer
+        assert rd == value, f'{counter}: {rd} == {value}'
+
+    # clear does not touch the snapshot until the next one
+    yield pulse(dut.monitor_clear, dut.clk)
+    assert dut.monitor_beats.value.integer == beats
+    yield pulse(dut.monitor_snapshot, dut.clk)
+    assert dut.monitor_beats.value.integer == 0
+    assert dut.monitor_cycles.value.integer == 1
+
+
+tf_test_counters = TF(check_counters)
+tf_test_counters.generate_tests()
+
+
+def test_stream_monitor():
+    stream = DataStream(8, 'sink', name='input')
+    core = StreamMonitor(stream, addr_w=8)
+    ports = [stream[f] for f in stream.fields]
+    ports += [core.registers[f] for f in core.registers.fields]
+    run(core, 'cores_nmigen.test.test_stream_monitor', ports=ports, vcd_file='./test_stream_monitor.vcd')
@@ -22,7 +22,9 @@ def convertion_ratio(dut):
     return maximo // minimo
 
 def calculate_expected_result(data, width_in, width_out):
-    if width_in > width_out:
+    if width_in % width_out != 0 and width_out % width_in != 0:
+        return [x for x in regroup(data, width_in, width_out)]
+    elif width_in > width_out:
         return [x for x in unpack(data, width_in // width_out, width_out)]
     elif width_in < width_out:
         return [x for x in pack(data, width_out // width_in, width_in)]
@@ -70,6 +72,25 @@ def unpack(buffer, elements, element_width):
             yield (b & mask)
             b = b >> element_width
 
+def regroup(buffer, width_in, width_out):
+    """
+        regroup generator concatenates the buffer items of "width_in" bit
+        length and splits the result in items of "width_out" bit length,
+        filling the last one with zeros if needed.
+
+        example:
+            a = [0x321, 0x654]
+            b = [p for p in regroup(a, 12, 8)]
+            result: [0x21, 0x43, 0x65]
+    """
+    value = 0
+    for i, b in enumerate(buffer):
+        value |= b << (i * width_in)
+    mask = (1 << width_out) - 1
+    for _ in range(ceil(len(buffer) * width_in / width_out)):
+        yield (value & mask)
+        value = value >> width_out
+
 @cocotb.coroutine
 def init_test(dut):
     dut.OUTPUT__ready <= 0
@@ -105,7 +126,7 @@ def check_data(dut, multiple, burps_in, burps_out):
     ratio = convertion_ratio(dut)
     
     input_len = 100 * ratio + int(not(multiple))
-    output_len = ceil(input_len / ratio)
+    output_len = ceil(input_len * width_in / width_out)
     data = [random.randint(0, 2**width_in-1) for _ in range(input_len)]
 
     cocotb.fork(input_stream.send(data, burps=burps_in))
@@ -124,7 +145,7 @@ tf_test.add_option('burps_out', [False, True])
 tf_test.generate_tests()
 
 
-@pytest.mark.parametrize("width_in, width_out", [(8, 24), (24, 24), (24, 8)])
+@pytest.mark.parametrize("width_in, width_out", [(8, 24), (24, 24), (24, 8), (24, 32), (32, 24), (40, 64)])
 def test_width_converter(width_in, width_out):
     core = WidthConverter(width_in=width_in,
                           width_out=width_out)
@@ -0,0 +1,202 @@
+from nmigen_cocotb import run
+from cores_nmigen.width_converter import WidthConverterUpKeep, WidthConverterDownKeep
+from cores_nmigen.test.interfaces import DataStreamDriver, KeepStreamDriver
+import pytest
+import random
+
+try:
+    import cocotb
+    from cocotb.triggers import RisingEdge
+    from cocotb.clock import Clock
+    from cocotb.regression import TestFactory as TF
+except:
+    pass
+
+random.seed()
+
+
+def lanes(value, keep, ratio, width):
+    mask = (1 << width) - 1
+    return [(value >> (i * width)) & mask for i in range(ratio) if (keep >> i) & 1]
+
+
+@cocotb.coroutine
+def init_test(dut):
+    dut.OUTPUT__ready <= 0
+    dut.INPUT__valid <= 0
+    dut.INPUT__data <= 0
+    dut.INPUT__last <= 0
+    if hasattr(dut, 'INPUT__keep'):
+        dut.INPUT__keep <= 0
+    dut.rst <= 1
+    cocotb.fork(Clock(dut.clk, 10, 'ns').start())
+    yield RisingEdge(dut.clk)
+    dut.rst <= 0
+    yield RisingEdge(dut.clk)
+
+
+@cocotb.coroutine
+def check_data(dut, burps_in, burps_out):
+    """
+    description
+        Down conversion: only the lanes flagged in INPUT_keep must show up
+        in the output, in order, with OUTPUT_last on the last kept lane.
+        Up conversion: OUTPUT_keep must flag exactly the populated lanes of
+        each output word, including the short one closed by INPUT_last.
+    """
+    yield init_test(dut)
+    width_in = len(dut.INPUT__data)
+    width_out = len(dut.OUTPUT__data)
+
+    if width_in > width_out:
+        ratio = width_in // width_out
+        input_stream = KeepStreamDriver(dut, 'INPUT_', dut.clk)
+        output_stream = DataStreamDriver(dut, 'OUTPUT_', dut.clk)
+        data = [(random.getrandbits(width_in), random.randint(1, 2**ratio-1)) for _ in range(100)]
+        expected = []
+        for value, keep in data:
+            expected += lanes(value, keep, ratio, width_out)
+    else:
+        ratio = width_out // width_in
+        input_stream = DataStreamDriver(dut, 'INPUT_', dut.clk)
+        output_stream = KeepStreamDriver(dut, 'OUTPUT_', dut.clk)
+        data = [random.getrandbits(width_in) for _ in range(100 * ratio + 1)]
+        expected = []
+        for i in range(0, len(data), ratio):
+            chunk = data[i:i+ratio]
+            expected.append((sum([x << (j * width_in) for j, x in enumerate(chunk)]), 2**len(chunk)-1))
+
+    cocotb.fork(input_stream.send(data, burps=burps_in))
+    rcv = yield output_stream.recv(burps=burps_out)
+    yield RisingEdge(dut.clk)
+
+    assert rcv == expected, f'rcv=\n{rcv}\n\nexpected=\n{expected}\n'
+
+
+@cocotb.coroutine
+def check_null_beats(dut, burps_in, burps_out):
+    """
+    description
+        Down conversion: null beats (INPUT_keep == 0) are dropped, and one
+        with INPUT_last must still put OUTPUT_last on the last kept lane
+        before it.
+    """
+    yield init_test(dut)
+    width_in = len(dut.INPUT__data)
+    width_out = len(dut.OUTPUT__data)
+    if width_in < width_out:
+        return
+
+    ratio = width_in // width_out
+    input_stream = KeepStreamDriver(dut, 'INPUT_', dut.clk)
+    output_stream = DataStreamDriver(dut, 'OUTPUT_', dut.clk)
+
+    packets = []
+    for _ in range(20):
+        packet = [(random.getrandbits(width_in), random.randint(0, 2**ratio-1)) for _ in range(random.randint(0, 4))]
+        packet.append((random.getrandbits(width_in), random.randint(1, 2**ratio-1)))
+        packet += [(random.getrandbits(width_in), 0) for _ in range(random.randint(0, 2))]
+        packets.append(packet)
+
+    @cocotb.coroutine
+    def send_packets():
+        for packet in packets:
+            yield input_stream.send(packet, burps=burps_in)
+    cocotb.fork(send_packets())
+
+    for packet in packets:
+        expected = []
+        for value, keep in packet:
+            expected += lanes(value, keep, ratio, width_out)
+        # recv stops on the last beat of every packet
+        rcv = yield output_stream.recv(burps=burps_out)
+        assert rcv == expected, f'rcv=\n{rcv}\n\nexpected=\n{expected}\n'
+
+
+@cocotb.coroutine
+def send_beat(dut, value, keep, last):
+    dut.INPUT__valid <= 1
+    dut.INPUT__data <= value
+    dut.INPUT__keep <= keep
+    dut.INPUT__last <= last
+    while True:
+        yield RisingEdge(dut.clk)
+        if dut.INPUT__ready.value.integer:
+            break
+    dut.INPUT__valid <= 0
+    dut.INPUT__last <= 0
+
+
+@cocotb.coroutine
+def collect(dut, output):
+    while True:
+        yield RisingEdge(dut.clk)
+        if dut.OUTPUT__valid.value.integer and dut.OUTPUT__ready.value.integer:
+            output.append((dut.OUTPUT__data.value.integer, dut.OUTPUT__last.value.integer))
+
+
+@cocotb.coroutine
+def check_idle(dut):
+    """
+    description
+        Down conversion with the input going idle after a word: the final
+        lane of a word without INPUT_last waits for the next beat, which
+        decides OUTPUT_last, and a word with INPUT_last goes out whole.
+    """
+    yield init_test(dut)
+    width_in = len(dut.INPUT__data)
+    width_out = len(dut.OUTPUT__data)
+    if width_in < width_out:
+        return
+
+    ratio = width_in // width_out
+    output = []
+    dut.OUTPUT__ready <= 1
+    cocotb.fork(collect(dut, output))
+
+    value = random.getrandbits(width_in)
+    expected = lanes(value, 2**ratio - 1, ratio, width_out)
+    yield send_beat(dut, value, 2**ratio - 1, 0)
+    for _ in range(2 * ratio):
+        yield RisingEdge(dut.clk)
+    assert output == [(lane, 0) for lane in expected[:-1]]
+    assert dut.OUTPUT__valid.value.integer == 0
+
+    # a null beat with last closes the packet on the held lane
+    yield send_beat(dut, random.getrandbits(width_in), 0, 1)
+    for _ in range(2):
+        yield RisingEdge(dut.clk)
+    assert output[ratio - 1:] == [(expected[-1], 1)]
+
+    # a word with last does not wait for more input
+    value, keep = random.getrandbits(width_in), random.randint(1, 2**ratio - 1)
+    expected = lanes(value, keep, ratio, width_out)
+    yield send_beat(dut, value, keep, 1)
+    for _ in range(ratio + 1):
+        yield RisingEdge(dut.clk)
+    assert output[ratio:] == [(lane, int(i == len(expected) - 1)) for i, lane in enumerate(expected)]
+
+
+tf_test = TF(check_data)
+tf_test.add_option('burps_in', [False, True])
+tf_test.add_option('burps_out', [False, True])
+tf_test.generate_tests()
+
+tf_test_null = TF(check_null_beats)
+tf_test_null.add_option('burps_in', [False, True])
+tf_test_null.add_option('burps_out', [False, True])
+tf_test_null.generate_tests()
+
+tf_test_idle = TF(check_idle)
+tf_test_idle.generate_tests()
+
+
+@pytest.mark.parametrize("width_in, width_out", [(8, 32), (32, 8), (64, 16)])
+def test_width_converter_keep(width_in, width_out):
+    if width_in > width_out:
+        core = WidthConverterDownKeep(width_in=width_in, width_out=width_out)
+    else:
+        core = WidthConverterUpKeep(width_in=width_in, width_out=width_out)
+    ports = [core.input[f] for f in core.input.fields]
+    ports += [core.output[f] for f in core.output.fields]
+    run(core, 'cores_nmigen.test.test_width_converter_keep', ports=ports, vcd_file=f'./output_keep_i{width_in}_o{width_out}.vcd')
@@ -9,7 +9,12 @@ def create_empty_matrix(shape):
     return matrix
 
 
-def matrix_indexes(shape):
+def matrix_indexes(shape, order='row'):
+    """Indexes of all the elements. `order` is 'row' (last index changes
+    fastest) or 'column' (first index changes fastest)."""
+    assert order in ('row', 'column')
+    if order == 'column':
+        return (idx[::-1] for idx in _recursive_iter(shape[::-1]))
     return _recursive_iter(shape)
 
 
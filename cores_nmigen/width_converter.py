@@ -1,5 +1,6 @@
 from nmigen import *
-from cores_nmigen.interfaces import DataStream
+from nmigen.lib.coding import PriorityEncoder
+from cores_nmigen.interfaces import DataStream, KeepStream
 from math import ceil
 
 class WidthConverterDown(Elaboratable):
@@ -94,6 +95,128 @@ class WidthConverterUp(Elaboratable):
 
         return m
 
+class WidthConverterDownKeep(Elaboratable):
+    """Down converter that only emits the lanes flagged in `input.keep`.
+
+    Empty lanes are skipped instead of being sent as padding, so a word with
+    n lanes kept takes exactly n output beats. Null beats (keep == 0) are
+    dropped, but a null beat with `last` still ends the packet.
+
+    For that, the final lane of a word without `last` is held until the
+    next input beat arrives. If that beat is a null beat with `last`, the
+    held lane goes out as the last of the packet. If the input goes idle in
+    the middle of a packet, the held lane waits with it. While the lane is
+    held, `output.valid` follows `input.valid` combinationally. The lanes
+    of a word with `last` are never held, so the end of a packet does not
+    wait for the next one. With continuous input there is no bubble. A
+    packet made only of null beats is dropped.
+    """
+    def __init__(self, width_in, width_out, domain='sync'):
+        assert width_in % width_out == 0
+        self.width_in = width_in
+        self.width_out = width_out
+        self.domain = domain
+        self.ratio = self.width_in // self.width_out
+        self.input = KeepStream(self.width_in, self.ratio, 'sink', name='INPUT')
+        self.output = DataStream(self.width_out, 'source', name='OUTPUT')
+
+    def elaborate(self, platform):
+        m = Module()
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        m.submodules.lane_encoder = lane_encoder = PriorityEncoder(self.ratio)
+
+        data_buffer = Signal(self.width_in)
+        keep_buffer = Signal(self.ratio)
+        last_buffer = Signal()
+        keep_remaining = Signal(self.ratio)
+        lanes = Array([data_buffer[i*self.width_out:(i+1)*self.width_out] for i in range(self.ratio)])
+
+        # clearing the lowest set bit leaves the lanes still to be sent
+        comb += keep_remaining.eq(keep_buffer & (keep_buffer - 1))
+        comb += lane_encoder.i.eq(keep_buffer)
+
+        final = Signal()
+        hold = Signal()
+        null = Signal()
+        skip = Signal()
+        comb += final.eq(~lane_encoder.n & (keep_remaining == 0))
+        comb += hold.eq(final & ~last_buffer)
+        comb += null.eq(self.input.keep == 0)
+        # a null beat without last is dropped while the final lane waits
+        comb += skip.eq(hold & self.input.valid & null & ~self.input.last)
+
+        comb += self.output.valid.eq(~lane_encoder.n & (~hold | (self.input.valid & ~skip)))
+        comb += self.output.data.eq(lanes[lane_encoder.o])
+        comb += self.output.last.eq(final & (last_buffer | (null & self.input.last)))
+
+        comb += self.input.ready.eq(lane_encoder.n | skip | (self.output.accepted() & final))
+
+        with m.If(self.input.accepted() & ~skip):
+            sync += data_buffer.eq(self.input.data)
+            sync += keep_buffer.eq(self.input.keep)
+            sync += last_buffer.eq(self.input.last)
+        with m.Elif(self.output.accepted()):
+            sync += keep_buffer.eq(keep_remaining)
+
+        return m
+
+
+class WidthConverterUpKeep(Elaboratable):
+    """Up converter that flags in `output.keep` the lanes actually written.
+
+    An output word closed early by `last` is still zero padded, but only the
+    populated lanes are marked in `keep`.
+    """
+    def __init__(self, width_in, width_out, domain='sync'):
+        assert width_out % width_in == 0
+        self.width_in = width_in
+        self.width_out = width_out
+        self.domain = domain
+        self.ratio = self.width_out // self.width_in
+        self.input = DataStream(self.width_in, 'sink', name='INPUT')
+        self.output = KeepStream(self.width_out, self.ratio, 'source', name='OUTPUT')
+
+    def elaborate(self, platform):
+        m = Module()
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        data_counter = Signal(range(0, self.ratio+1))
+        data_buffer = Array([Signal(self.width_in) for _ in range(self.ratio)])
+        keep_buffer = Array([Signal() for _ in range(self.ratio)])
+
+        for i in range(self.ratio):
+            comb += self.output.data[i*self.width_in:(i+1)*self.width_in].eq(data_buffer[i])
+            comb += self.output.keep[i].eq(keep_buffer[i])
+
+        with m.If(self.output.accepted()):
+            sync += self.output.valid.eq(0)
+            sync += self.output.last.eq(0)
+            for i in range(self.ratio):
+                sync += data_buffer[i].eq(0)
+                sync += keep_buffer[i].eq(0)
+        with m.If(self.input.accepted()):
+            sync += data_buffer[data_counter].eq(self.input.data)
+            sync += keep_buffer[data_counter].eq(1)
+            with m.If(self.input.last):
+                sync += self.output.valid.eq(1)
+                sync += self.output.last.eq(1)
+                sync += data_counter.eq(0)
+            with m.Elif(data_counter < self.ratio - 1):
+                sync += data_counter.eq(data_counter + 1)
+                sync += self.output.last.eq(0)
+            with m.Else():
+                sync += self.output.valid.eq(1)
+                sync += self.output.last.eq(0)
+                sync += data_counter.eq(0)
+
+        comb += self.input.ready.eq((~self.output.valid) | (self.output.accepted()))
+
+        return m
+
+
 class WidthConverterUnity(Elaboratable):
     def __init__(self, width_in, width_out, domain='sync'):
         assert width_in == width_out
@@ -117,8 +240,74 @@ class WidthConverterUnity(Elaboratable):
         return m
 
 
+class WidthConverterGearbox(Elaboratable):
+    def __init__(self, width_in, width_out, domain='sync'):
+        self.width_in = width_in
+        self.width_out = width_out
+        self.domain = domain
+        self.buffer_w = self.width_in + self.width_out
+        self.input = DataStream(self.width_in, 'sink', name='INPUT')
+        self.output = DataStream(self.width_out, 'source', name='OUTPUT')
+
+    def elaborate(self, platform):
+        m = Module()
+        sync = m.d[self.domain]
+        comb = m.d.comb
+
+        # Residue buffer: valid bits are always packed at the bottom and
+        # everything above `level` is kept at zero, so a partial word
+        # flushed on `last` comes out zero padded.
+        data_buffer = Signal(self.buffer_w)
+        level = Signal(range(self.buffer_w+1))
+        last_buffer = Signal()
+        full_word = Signal()
+        level_next = Signal(range(self.buffer_w+1))
+        data_next = Signal(self.buffer_w)
+
+        comb += full_word.eq(level >= self.width_out)
+
+        with m.If(full_word):
+            comb += self.output.valid.eq(1)
+            comb += self.output.last.eq(last_buffer & (level == self.width_out))
+        with m.Elif(last_buffer & (level > 0)):
+            comb += self.output.valid.eq(1)
+            comb += self.output.last.eq(1)
+        with m.Else():
+            comb += self.output.valid.eq(0)
+            comb += self.output.last.eq(0)
+        comb += self.output.data.eq(data_buffer[0:self.width_out])
+
+        with m.If(self.output.accepted()):
+            with m.If(full_word):
+                comb += level_next.eq(level - self.width_out)
+            with m.Else():
+                comb += level_next.eq(0)
+            comb += data_next.eq(data_buffer >> self.width_out)
+        with m.Else():
+            comb += level_next.eq(level)
+            comb += data_next.eq(data_buffer)
+
+        # A new packet is not merged with the tail of the previous one: the
+        # input is held until the buffered `last` has been flushed.
+        comb += self.input.ready.eq(~last_buffer & (level_next <= self.buffer_w - self.width_in))
+
+        with m.If(self.input.accepted()):
+            sync += data_buffer.eq(data_next | (self.input.data << level_next))
+            sync += level.eq(level_next + self.width_in)
+            sync += last_buffer.eq(self.input.last)
+        with m.Else():
+            sync += data_buffer.eq(data_next)
+            sync += level.eq(level_next)
+            with m.If(self.output.accepted() & self.output.last):
+                sync += last_buffer.eq(0)
+
+        return m
+
+
 def WidthConverter(width_in, width_out, domain='sync'):
-    if width_in > width_out:
+    if width_in % width_out != 0 and width_out % width_in != 0:
+        return WidthConverterGearbox(width_in, width_out, domain)
+    elif width_in > width_out:
         return WidthConverterDown(width_in, width_out, domain)
     elif width_in < width_out:
         return WidthConverterUp(width_in, width_out, domain)